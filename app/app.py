@@ -3,32 +3,41 @@ Retail BI Web Application - Flask Backend
 Provides REST API endpoints for the BI Dashboard
 """
 
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for, Response
+from flask import Flask, render_template, jsonify, request, session, redirect, url_for, Response, make_response, stream_with_context, send_file, g, has_request_context
 from flask_cors import CORS
 from functools import wraps
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
 import mysql.connector
 from mysql.connector import Error, IntegrityError
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, timedelta
 import json
 import jwt
 from werkzeug.security import generate_password_hash, check_password_hash
-from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import PolynomialFeatures, StandardScaler
 from sklearn.cluster import KMeans
 from io import StringIO, BytesIO
+import tempfile
 from fpdf import FPDF
 import os
-try:
-    from prophet import Prophet
-except Exception:
-    Prophet = None
-try:
-    from statsmodels.tsa.arima.model import ARIMA
-except Exception:
-    ARIMA = None
+from result_cache import ResultCache
+from dashboard_panels import build_dashboard_panels, build_seasonal_insights
+from exports import (
+    build_export_query, build_export_count_query, iter_row_chunks, iter_csv,
+    track_progress, write_excel_workbook
+)
+from export_jobs import ExportJobManager
+from notifications import NotificationWriter
+from inventory_policy import (
+    compute_optimization_items, compute_auto_orders, compute_reorder_suggestions,
+    bulk_upsert_inventory_levels
+)
+from forecast_service import ForecastService, predict_forecast, Prophet, ARIMA
+from customer_segments import SegmentModelStore
+from query_builder import SqlConditions, get_statement_cache, fetch_frame, prepared_statement_stats
 
 app = Flask(__name__)
 CORS(app)
@@ -44,105 +53,282 @@ DB_CONFIG = {
     'charset': os.environ.get('DB_CHARSET', 'utf8mb4')
 }
 
-# SQLAlchemy engine (for pandas read_sql)
+# SQLAlchemy engine (connection pool for queries and raw mysql.connector cursors)
 SQLALCHEMY_DB_URI = (
     f"mysql+mysqlconnector://{DB_CONFIG['user']}:{DB_CONFIG['password']}"
     f"@{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset={DB_CONFIG['charset']}"
 )
-_sqlalchemy_engine = create_engine(SQLALCHEMY_DB_URI, pool_pre_ping=True)
+
+# Shared connection pool - used by pandas queries and by raw mysql.connector cursors
+DB_POOL_CONFIG = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 20)),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+}
+_sqlalchemy_engine = create_engine(SQLALCHEMY_DB_URI, **DB_POOL_CONFIG)
+_pool_metrics = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'invalidations': 0}
+
+@event.listens_for(_sqlalchemy_engine, 'connect')
+def _on_pool_connect(dbapi_connection, connection_record):
+    _pool_metrics['connects'] += 1
+
+@event.listens_for(_sqlalchemy_engine, 'checkout')
+def _on_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    _pool_metrics['checkouts'] += 1
+
+@event.listens_for(_sqlalchemy_engine, 'checkin')
+def _on_pool_checkin(dbapi_connection, connection_record):
+    _pool_metrics['checkins'] += 1
+
+@event.listens_for(_sqlalchemy_engine, 'invalidate')
+def _on_pool_invalidate(dbapi_connection, connection_record, exception):
+    _pool_metrics['invalidations'] += 1
+
+def mark_query_failed():
+    """Flag the current request as served from a failed query (its response is not cached)"""
+    if has_request_context():
+        g.query_failed = True
+
+def skip_result_cache():
+    """Keep the current response out of the result cache (partial data that will change)"""
+    if has_request_context():
+        g.skip_result_cache = True
 
 def get_db_connection():
-    """Create database connection"""
+    """Check out a mysql.connector connection from the shared pool (close() returns it)"""
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
-    except Error as e:
+        return _sqlalchemy_engine.raw_connection()
+    except (Error, SQLAlchemyError) as e:
         print(f"Database connection error: {e}")
+        mark_query_failed()
         return None
 
-def execute_query(query):
-    """Execute SQL query and return DataFrame"""
+@contextmanager
+def db_connection():
+    """Context manager that checks out a pooled connection and always returns it"""
+    connection = get_db_connection()
     try:
-        with _sqlalchemy_engine.connect() as connection:
-            return pd.read_sql(query, connection)
-    except Exception as e:
-        print(f"Query error: {e}")
-        return pd.DataFrame()
+        yield connection
+    finally:
+        if connection:
+            connection.close()
+
+def get_pool_stats():
+    """Get connection pool utilization metrics"""
+    pool = _sqlalchemy_engine.pool
+    checked_out = pool.checkedout()
+    capacity = DB_POOL_CONFIG['pool_size'] + DB_POOL_CONFIG['max_overflow']
+    return {
+        'pool_size': pool.size(),
+        'max_overflow': DB_POOL_CONFIG['max_overflow'],
+        'checked_out': checked_out,
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'utilization': checked_out / capacity * 100 if capacity else 0.0,
+        **_pool_metrics,
+        'prepared_statements': dict(prepared_statement_stats)
+    }
+
+# Server-side prepared statements kept per pooled connection (LRU by SQL template)
+PREPARED_STATEMENT_CACHE_SIZE = int(os.environ.get('PREPARED_STATEMENT_CACHE_SIZE', 64))
+
+def execute_query(query, params=None):
+    """Execute a SQL template with %s placeholders bound to params and return DataFrame"""
+    with db_connection() as connection:
+        if not connection:
+            return pd.DataFrame()
+        try:
+            cursor = get_statement_cache(connection, PREPARED_STATEMENT_CACHE_SIZE).execute(query, params)
+            return fetch_frame(cursor)
+        except Error as e:
+            # Database errors degrade to an empty result; anything else is a bug and propagates (500)
+            print(f"Query error: {e}")
+            mark_query_failed()
+            return pd.DataFrame()
+
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 5000))
 
 def get_export_sales_df(date_start, date_end, stores, categories, regions):
     """Fetch sales data for export based on filters."""
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
-    query = f"""
-    SELECT 
-        d.date,
-        s.store_name,
-        s.city,
-        s.region,
-        p.product_name,
-        p.category,
-        c.customer_name,
-        c.age_group,
-        f.quantity,
-        f.revenue,
-        f.profit
-    FROM fact_sales f
-    JOIN dim_date d ON f.date_id = d.date_id
-    JOIN dim_store s ON f.store_id = s.store_id
-    JOIN dim_product p ON f.product_id = p.product_id
-    JOIN dim_customer c ON f.customer_id = c.customer_id
-    WHERE 1=1 {where_clause}
-    ORDER BY d.date DESC
-    LIMIT 10000
-    """
-    return execute_query(query)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    return execute_query(build_export_query(where_clause, limit=10000), params)
+
+def iter_export_sales_chunks(where_clause, params, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream all filtered sales rows in chunks over a pooled connection (no row cap)."""
+    with db_connection() as connection:
+        if not connection:
+            return
+        yield from iter_row_chunks(connection, build_export_query(where_clause), chunk_size, params)
 
 def table_exists(table_name):
     """Check if a table exists in the database."""
-    connection = get_db_connection()
-    if not connection:
-        return False
-    try:
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*)
-            FROM information_schema.tables
-            WHERE table_schema = %s AND table_name = %s
-            """,
-            (DB_CONFIG['database'], table_name)
-        )
-        exists = cursor.fetchone()[0] > 0
-        cursor.close()
-        connection.close()
-        return exists
-    except Error as e:
-        print(f"Table check error: {e}")
-        connection.close()
-        return False
+    with db_connection() as connection:
+        if not connection:
+            return False
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT COUNT(*)
+                FROM information_schema.tables
+                WHERE table_schema = %s AND table_name = %s
+                """,
+                (DB_CONFIG['database'], table_name)
+            )
+            exists = cursor.fetchone()[0] > 0
+            cursor.close()
+            return exists
+        except Error as e:
+            print(f"Table check error: {e}")
+            mark_query_failed()
+            return False
 
 def column_exists(table_name, column_name):
     """Check if a column exists in a table."""
-    connection = get_db_connection()
-    if not connection:
-        return False
-    try:
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            SELECT COUNT(*)
-            FROM information_schema.columns
-            WHERE table_schema = %s AND table_name = %s AND column_name = %s
-            """,
-            (DB_CONFIG['database'], table_name, column_name)
-        )
-        exists = cursor.fetchone()[0] > 0
-        cursor.close()
-        connection.close()
-        return exists
-    except Error as e:
-        print(f"Column check error: {e}")
-        connection.close()
-        return False
+    with db_connection() as connection:
+        if not connection:
+            return False
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                """
+                SELECT COUNT(*)
+                FROM information_schema.columns
+                WHERE table_schema = %s AND table_name = %s AND column_name = %s
+                """,
+                (DB_CONFIG['database'], table_name, column_name)
+            )
+            exists = cursor.fetchone()[0] > 0
+            cursor.close()
+            return exists
+        except Error as e:
+            print(f"Column check error: {e}")
+            mark_query_failed()
+            return False
+
+# ==================== AGGREGATE ROUTING ====================
+
+SALES_ROLLUP_TABLE = 'agg_sales_daily_store_product'
+ROLLUP_CHECK_SECONDS = int(os.environ.get('ROLLUP_CHECK_SECONDS', 60))
+_rollup_state = {'ready': False, 'checked_at': None}
+
+def rollup_available():
+    """Check whether the daily sales rollup exists and is populated (re-checked every ROLLUP_CHECK_SECONDS)."""
+    now = datetime.now()
+    checked_at = _rollup_state['checked_at']
+    if checked_at and (now - checked_at).total_seconds() < ROLLUP_CHECK_SECONDS:
+        return _rollup_state['ready']
+
+    ready = False
+    if table_exists(SALES_ROLLUP_TABLE):
+        df = execute_query(f"SELECT 1 AS has_rows FROM {SALES_ROLLUP_TABLE} LIMIT 1")
+        ready = not df.empty
+    _rollup_state['ready'] = ready
+    _rollup_state['checked_at'] = now
+    return ready
+
+def route_sales_source(needs_sale_grain=False):
+    """Pick the sales table and measure expressions for an aggregate query.
+
+    The rollup has the same date/store/product keys and measures as fact_sales,
+    so queries keep the `f` alias, the dimension joins and build_where_clause.
+    Queries that need per-sale or per-customer detail stay on fact_sales.
+    """
+    if not needs_sale_grain and rollup_available():
+        return {
+            'table': SALES_ROLLUP_TABLE,
+            'transactions': 'SUM(f.transactions)',
+            'avg_revenue': 'SUM(f.revenue) / SUM(f.transactions)'
+        }
+    return {
+        'table': 'fact_sales',
+        'transactions': 'COUNT(DISTINCT f.sale_id)',
+        'avg_revenue': 'AVG(f.revenue)'
+    }
+
+# ==================== RESULT CACHE ====================
+
+# Warehouse data only changes when the ETL runs, so analytical responses are cached
+# per endpoint + normalized filters + user scope + warehouse data version.
+RESULT_CACHE_MAX_MB = int(os.environ.get('RESULT_CACHE_MAX_MB', 64))
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get('RESULT_CACHE_TTL_SECONDS', 900))
+DATA_VERSION_CHECK_SECONDS = int(os.environ.get('DATA_VERSION_CHECK_SECONDS', 5))
+CACHE_LIST_PARAMS = ('stores', 'categories', 'regions')
+
+_result_cache = ResultCache(RESULT_CACHE_MAX_MB * 1024 * 1024, RESULT_CACHE_TTL_SECONDS)
+_data_version_state = {'version': None, 'checked_at': None}
+
+def get_data_version():
+    """Get the warehouse data version written by the ETL (re-checked every DATA_VERSION_CHECK_SECONDS)"""
+    now = datetime.now()
+    checked_at = _data_version_state['checked_at']
+    if checked_at and (now - checked_at).total_seconds() < DATA_VERSION_CHECK_SECONDS:
+        return _data_version_state['version']
+
+    version = '0'
+    if table_exists('etl_state'):
+        df = execute_query("SELECT state_value FROM etl_state WHERE state_key = 'data_version'")
+        if not df.empty:
+            version = str(df['state_value'].iloc[0])
+
+    if _data_version_state['version'] is not None and version != _data_version_state['version']:
+        # New data landed - cached results are stale
+        _result_cache.clear()
+        _rollup_state['checked_at'] = None
+    forecast_service.on_data_version(version)
+    _data_version_state['version'] = version
+    _data_version_state['checked_at'] = now
+    return version
+
+def normalize_filters(args):
+    """Normalize request args into a hashable, order-independent filter key"""
+    filters = {
+        'date_start': args.get('date_start', '2023-01-01'),
+        'date_end': args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
+    }
+    for name in args.keys():
+        if name in filters:
+            continue
+        value = args.get(name, '')
+        if name in CACHE_LIST_PARAMS:
+            value = ','.join(sorted(v.strip() for v in value.split(',') if v.strip()))
+        filters[name] = value
+    return tuple(sorted(filters.items()))
+
+def build_cache_key(endpoint_name):
+    """Build the result cache key for the current request"""
+    return (
+        endpoint_name,
+        get_data_version(),
+        get_current_user_role(),
+        get_current_user_store_id(),
+        normalize_filters(request.args)
+    )
+
+def cached_endpoint(endpoint_name):
+    """Cache successful JSON responses of an analytical endpoint.
+
+    Responses built while a query failed (empty fallbacks) or flagged by
+    skip_result_cache() are not cached.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = build_cache_key(endpoint_name)
+            cached_body = _result_cache.get(key)
+            if cached_body is not None:
+                return Response(cached_body, mimetype='application/json')
+
+            response = make_response(f(*args, **kwargs))
+            if (response.status_code == 200 and response.mimetype == 'application/json'
+                    and not g.get('query_failed') and not g.get('skip_result_cache')):
+                body = response.get_data()
+                _result_cache.set(key, body, len(body))
+            return response
+        return decorated_function
+    return decorator
 
 # ==================== AUTHENTICATION ====================
 
@@ -327,17 +513,19 @@ def admin_users():
     return render_template('admin_users.html')
 
 @app.route('/api/business-insights', methods=['GET'])
+@cached_endpoint('business-insights')
 def get_business_insights():
     """Get dynamic business insights"""
     date_start = request.args.get('date_start', '2023-01-01')
     date_end = request.args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
     
-    where_clause = build_where_clause(date_start, date_end, '', '', '', restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, '', '', '', restrict_to_store=True)
+    source = route_sales_source()
     
     # Get top performing store
     top_store_query = f"""
     SELECT s.store_name, SUM(f.revenue) AS revenue, SUM(f.profit) AS profit
-    FROM fact_sales f
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_store s ON f.store_id = s.store_id
     WHERE 1=1 {where_clause}
@@ -349,7 +537,7 @@ def get_business_insights():
     # Get top category
     top_category_query = f"""
     SELECT p.category, SUM(f.revenue) AS revenue
-    FROM fact_sales f
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_product p ON f.product_id = p.product_id
     WHERE 1=1 {where_clause}
@@ -358,8 +546,8 @@ def get_business_insights():
     LIMIT 1
     """
     
-    df_top_store = execute_query(top_store_query)
-    df_top_category = execute_query(top_category_query)
+    df_top_store = execute_query(top_store_query, params)
+    df_top_category = execute_query(top_category_query, params)
     
     insights = []
     
@@ -388,6 +576,20 @@ def export_csv():
     stores = request.args.get('stores', '')
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
+    stream = request.args.get('stream', 'false').lower() == 'true'
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+
+    if stream:
+        # Full export streamed chunk by chunk - constant memory, no row cap
+        where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+        filename = f'retail_bi_export_{datetime.now().strftime("%Y%m%d")}.csv'
+        if compress:
+            filename += '.gz'
+        return Response(
+            stream_with_context(iter_csv(iter_export_sales_chunks(where_clause, params), compress=compress)),
+            mimetype='application/gzip' if compress else 'text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
 
     df = get_export_sales_df(date_start, date_end, stores, categories, regions)
     
@@ -414,6 +616,30 @@ def export_excel():
     stores = request.args.get('stores', '')
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
+    stream = request.args.get('stream', 'false').lower() == 'true'
+    include_summaries = request.args.get('summaries', 'true').lower() == 'true'
+    filename = f'retail_bi_report_{datetime.now().strftime("%Y%m%d")}.xlsx'
+
+    if stream:
+        # Write-only workbook built from a chunked cursor into a temp file - memory bounded by chunk size
+        where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+        fd, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        try:
+            write_excel_workbook(path, iter_export_sales_chunks(where_clause, params), include_summaries=include_summaries)
+        except Exception:
+            os.remove(path)
+            raise
+        response = send_file(
+            path,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=filename
+        )
+        # Let werkzeug close the file iterator itself so the temp file is removed afterwards
+        response.direct_passthrough = False
+        response.call_on_close(lambda: os.remove(path))
+        return response
 
     df = get_export_sales_df(date_start, date_end, stores, categories, regions)
     if df.empty:
@@ -430,20 +656,10 @@ def export_excel():
         headers={'Content-Disposition': f'attachment; filename=retail_bi_report_{datetime.now().strftime("%Y%m%d")}.xlsx'}
     )
 
-@app.route('/api/export-pdf', methods=['GET'])
-@login_required
-def export_pdf():
-    """Export data to PDF"""
-    date_start = request.args.get('date_start', '2023-01-01')
-    date_end = request.args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
-    stores = request.args.get('stores', '')
-    categories = request.args.get('categories', '')
-    regions = request.args.get('regions', '')
-
-    df = get_export_sales_df(date_start, date_end, stores, categories, regions)
-    if df.empty:
-        return jsonify({'error': 'No data to export'}), 400
+PDF_MAX_ROWS = 200
 
+def build_pdf_report(df):
+    """Render the first PDF_MAX_ROWS export rows as a simple PDF report (bytes)"""
     pdf = FPDF()
     pdf.set_auto_page_break(auto=True, margin=15)
     pdf.add_page()
@@ -452,22 +668,227 @@ def export_pdf():
     pdf.ln(5)
     pdf.set_font("Arial", size=9)
 
-    max_rows = 200
-    for _, row in df.head(max_rows).iterrows():
+    for _, row in df.head(PDF_MAX_ROWS).iterrows():
         pdf.cell(0, 6, txt=f"{row['date']} | {row['store_name']} | {row['product_name']} | {row['quantity']} | ₪{row['revenue']}", ln=True)
 
     output = BytesIO()
     pdf.output(output)
-    output.seek(0)
+    return output.getvalue()
+
+@app.route('/api/export-pdf', methods=['GET'])
+@login_required
+def export_pdf():
+    """Export data to PDF"""
+    date_start = request.args.get('date_start', '2023-01-01')
+    date_end = request.args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
+    stores = request.args.get('stores', '')
+    categories = request.args.get('categories', '')
+    regions = request.args.get('regions', '')
+
+    df = get_export_sales_df(date_start, date_end, stores, categories, regions)
+    if df.empty:
+        return jsonify({'error': 'No data to export'}), 400
 
     return Response(
-        output.getvalue(),
+        build_pdf_report(df),
         mimetype='application/pdf',
         headers={'Content-Disposition': f'attachment; filename=retail_bi_report_{datetime.now().strftime("%Y%m%d")}.pdf'}
     )
 
+# ==================== BACKGROUND EXPORT JOBS ====================
+
+EXPORT_JOB_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf')
+}
+export_jobs = ExportJobManager(
+    export_dir=os.environ.get('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'retail_bi_exports')),
+    max_workers=int(os.environ.get('EXPORT_JOB_WORKERS', 2)),
+    ttl_seconds=int(os.environ.get('EXPORT_JOB_TTL_SECONDS', 3600)),
+    sweep_interval=int(os.environ.get('EXPORT_JOB_SWEEP_SECONDS', 60))
+)
+
+def run_export_job(path, job_id, export_format, where_clause, params):
+    """Build an export artifact on disk (runs in the export worker pool)"""
+    if export_format == 'pdf':
+        df = execute_query(build_export_query(where_clause, limit=PDF_MAX_ROWS), params)
+        export_jobs.set_total_rows(job_id, len(df))
+        with open(path, 'wb') as f:
+            f.write(build_pdf_report(df))
+        export_jobs.update_progress(job_id, len(df))
+        return
+
+    df_count = execute_query(build_export_count_query(where_clause), params)
+    export_jobs.set_total_rows(job_id, int(df_count['total_rows'].iloc[0]) if not df_count.empty else 0)
+    chunks = track_progress(
+        iter_export_sales_chunks(where_clause, params),
+        lambda rows_written: export_jobs.update_progress(job_id, rows_written)
+    )
+
+    if export_format == 'csv':
+        with open(path, 'wb') as f:
+            for data in iter_csv(chunks):
+                f.write(data)
+    else:
+        write_excel_workbook(path, chunks)
+
+@app.route('/api/export-jobs', methods=['POST'])
+@login_required
+def create_export_job():
+    """Queue a background export job"""
+    data = request.get_json(silent=True) or {}
+    export_format = (data.get('format') or 'csv').lower()
+    if export_format not in EXPORT_JOB_FORMATS:
+        return jsonify({'error': 'פורמט ייצוא לא נתמך'}), 400
+
+    where_clause, params = build_where_clause(
+        data.get('date_start', '2023-01-01'),
+        data.get('date_end', datetime.now().strftime('%Y-%m-%d')),
+        data.get('stores', ''),
+        data.get('categories', ''),
+        data.get('regions', ''),
+        restrict_to_store=True
+    )
+    extension, _ = EXPORT_JOB_FORMATS[export_format]
+    filename = f'retail_bi_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+
+    job = export_jobs.submit(
+        get_current_user_id(),
+        export_format,
+        filename,
+        lambda path, job_id: run_export_job(path, job_id, export_format, where_clause, params)
+    )
+    job['status_url'] = url_for('get_export_job', job_id=job['job_id'])
+    job['download_url'] = url_for('download_export_job', job_id=job['job_id'])
+    return jsonify(job), 202
+
+@app.route('/api/export-jobs/<job_id>', methods=['GET'])
+@login_required
+def get_export_job(job_id):
+    """Get export job status and progress"""
+    job = export_jobs.get(job_id, get_current_user_id())
+    if not job:
+        return jsonify({'error': 'משימת ייצוא לא נמצאה'}), 404
+    return jsonify(export_jobs.describe(job))
+
+@app.route('/api/export-jobs/<job_id>/download', methods=['GET'])
+@login_required
+def download_export_job(job_id):
+    """Download a finished export artifact"""
+    job = export_jobs.get(job_id, get_current_user_id())
+    if not job:
+        return jsonify({'error': 'משימת ייצוא לא נמצאה'}), 404
+    if job['status'] != 'completed':
+        return jsonify({'error': 'הייצוא עדיין לא הסתיים', 'status': job['status']}), 409
+
+    # The file is not cleaned up while it is streamed
+    job = export_jobs.open_download(job_id, get_current_user_id())
+    if not job:
+        return jsonify({'error': 'משימת ייצוא לא נמצאה'}), 404
+    try:
+        _, mimetype = EXPORT_JOB_FORMATS[job['format']]
+        response = send_file(job['path'], mimetype=mimetype, as_attachment=True, download_name=job['filename'])
+    except Exception:
+        export_jobs.finish_download(job_id)
+        raise
+    response.call_on_close(lambda: export_jobs.finish_download(job_id))
+    return response
+
+def build_product_performance_query(source, where_clause, limit=20):
+    """Top products by revenue over the routed sales source"""
+    return f"""
+    SELECT 
+        p.category,
+        p.brand,
+        p.product_name,
+        SUM(f.quantity) AS total_quantity,
+        SUM(f.revenue) AS revenue,
+        SUM(f.profit) AS profit,
+        {source['transactions']} AS sales_count
+    FROM {source['table']} f
+    JOIN dim_date d ON f.date_id = d.date_id
+    JOIN dim_store s ON f.store_id = s.store_id
+    JOIN dim_product p ON f.product_id = p.product_id
+    WHERE 1=1 {where_clause}
+    GROUP BY p.category, p.brand, p.product_name, p.product_id
+    ORDER BY revenue DESC
+    LIMIT {int(limit)}
+    """
+
+def build_customer_insights_query(where_clause):
+    """Sales by customer age group and gender.
+
+    Distinct customer counts are not additive across the rollup, so this stays on fact_sales.
+    """
+    return f"""
+    SELECT 
+        c.age_group,
+        c.gender,
+        COUNT(DISTINCT c.customer_id) AS customer_count,
+        SUM(f.revenue) AS revenue,
+        AVG(f.revenue) AS avg_revenue_per_customer
+    FROM fact_sales f
+    JOIN dim_date d ON f.date_id = d.date_id
+    JOIN dim_store s ON f.store_id = s.store_id
+    JOIN dim_product p ON f.product_id = p.product_id
+    JOIN dim_customer c ON f.customer_id = c.customer_id
+    WHERE 1=1 {where_clause}
+    GROUP BY c.age_group, c.gender
+    ORDER BY c.age_group, c.gender
+    """
+
+@app.route('/api/dashboard', methods=['GET'])
+@login_required
+@cached_endpoint('dashboard')
+def get_dashboard():
+    """Get all dashboard panels from grouped queries (rollup when available)"""
+    date_start = request.args.get('date_start', '2023-01-01')
+    date_end = request.args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
+    stores = request.args.get('stores', '')
+    categories = request.args.get('categories', '')
+    regions = request.args.get('regions', '')
+    
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    source = route_sales_source()
+    
+    # KPI, trend, store, category and seasonal panels are re-aggregated from this
+    # month x store x category grain (transactions are additive across it)
+    sales_query = f"""
+    SELECT 
+        d.year,
+        d.quarter,
+        d.quarter_name,
+        d.month,
+        d.month_name,
+        s.store_id,
+        s.store_name,
+        s.city,
+        s.region,
+        p.category,
+        SUM(f.quantity) AS quantity,
+        SUM(f.revenue) AS revenue,
+        SUM(f.profit) AS profit,
+        {source['transactions']} AS transactions
+    FROM {source['table']} f
+    JOIN dim_date d ON f.date_id = d.date_id
+    JOIN dim_store s ON f.store_id = s.store_id
+    JOIN dim_product p ON f.product_id = p.product_id
+    WHERE 1=1 {where_clause}
+    GROUP BY d.year, d.quarter, d.quarter_name, d.month, d.month_name,
+             s.store_id, s.store_name, s.city, s.region, p.category
+    """
+    
+    df_sales = execute_query(sales_query, params)
+    if df_sales.empty:
+        return jsonify(build_dashboard_panels(df_sales, df_sales, df_sales))
+    df_products = execute_query(build_product_performance_query(source, where_clause), params)
+    df_customers = execute_query(build_customer_insights_query(where_clause), params)
+    return jsonify(build_dashboard_panels(df_sales, df_products, df_customers))
+
 @app.route('/api/kpis', methods=['GET'])
 @login_required
+@cached_endpoint('kpis')
 def get_kpis():
     """Get KPI metrics"""
     date_start = request.args.get('date_start', '2023-01-01')
@@ -476,30 +897,32 @@ def get_kpis():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    source = route_sales_source()
     
     query = f"""
     SELECT 
-        COUNT(DISTINCT f.sale_id) AS total_transactions,
+        {source['transactions']} AS total_transactions,
         SUM(f.revenue) AS total_revenue,
         SUM(f.profit) AS total_profit,
         SUM(f.profit) / SUM(f.revenue) * 100 AS profit_margin,
-        AVG(f.revenue) AS avg_order_value,
+        {source['avg_revenue']} AS avg_order_value,
         SUM(f.quantity) AS total_quantity
-    FROM fact_sales f
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_store s ON f.store_id = s.store_id
     JOIN dim_product p ON f.product_id = p.product_id
     WHERE 1=1 {where_clause}
     """
     
-    df = execute_query(query)
+    df = execute_query(query, params)
     if not df.empty and df['total_revenue'].iloc[0] is not None:
         return jsonify(df.iloc[0].to_dict())
     return jsonify({})
 
 @app.route('/api/sales-trend', methods=['GET'])
 @login_required
+@cached_endpoint('sales-trend')
 def get_sales_trend():
     """Get monthly sales trend"""
     date_start = request.args.get('date_start', '2023-01-01')
@@ -508,7 +931,8 @@ def get_sales_trend():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    source = route_sales_source()
     
     query = f"""
     SELECT 
@@ -517,8 +941,8 @@ def get_sales_trend():
         d.month_name,
         SUM(f.revenue) AS revenue,
         SUM(f.profit) AS profit,
-        COUNT(DISTINCT f.sale_id) AS transactions
-    FROM fact_sales f
+        {source['transactions']} AS transactions
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_store s ON f.store_id = s.store_id
     JOIN dim_product p ON f.product_id = p.product_id
@@ -527,11 +951,12 @@ def get_sales_trend():
     ORDER BY d.year, d.month
     """
     
-    df = execute_query(query)
+    df = execute_query(query, params)
     return jsonify(df.to_dict(orient='records'))
 
 @app.route('/api/store-performance', methods=['GET'])
 @login_required
+@cached_endpoint('store-performance')
 def get_store_performance():
     """Get store performance data"""
     date_start = request.args.get('date_start', '2023-01-01')
@@ -540,7 +965,8 @@ def get_store_performance():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    source = route_sales_source()
     
     query = f"""
     SELECT 
@@ -551,8 +977,8 @@ def get_store_performance():
         SUM(f.revenue) AS revenue,
         SUM(f.profit) AS profit,
         SUM(f.profit) / SUM(f.revenue) * 100 AS profit_margin,
-        COUNT(DISTINCT f.sale_id) AS transactions
-    FROM fact_sales f
+        {source['transactions']} AS transactions
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_store s ON f.store_id = s.store_id
     JOIN dim_product p ON f.product_id = p.product_id
@@ -562,11 +988,12 @@ def get_store_performance():
     LIMIT 15
     """
     
-    df = execute_query(query)
+    df = execute_query(query, params)
     return jsonify(df.to_dict(orient='records'))
 
 @app.route('/api/product-performance', methods=['GET'])
 @login_required
+@cached_endpoint('product-performance')
 def get_product_performance():
     """Get product performance data"""
     date_start = request.args.get('date_start', '2023-01-01')
@@ -575,32 +1002,14 @@ def get_product_performance():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
-    
-    query = f"""
-    SELECT 
-        p.category,
-        p.brand,
-        p.product_name,
-        SUM(f.quantity) AS total_quantity,
-        SUM(f.revenue) AS revenue,
-        SUM(f.profit) AS profit,
-        COUNT(DISTINCT f.sale_id) AS sales_count
-    FROM fact_sales f
-    JOIN dim_date d ON f.date_id = d.date_id
-    JOIN dim_store s ON f.store_id = s.store_id
-    JOIN dim_product p ON f.product_id = p.product_id
-    WHERE 1=1 {where_clause}
-    GROUP BY p.category, p.brand, p.product_name, p.product_id
-    ORDER BY revenue DESC
-    LIMIT 20
-    """
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
     
-    df = execute_query(query)
+    df = execute_query(build_product_performance_query(route_sales_source(), where_clause), params)
     return jsonify(df.to_dict(orient='records'))
 
 @app.route('/api/category-revenue', methods=['GET'])
 @login_required
+@cached_endpoint('category-revenue')
 def get_category_revenue():
     """Get revenue by category"""
     date_start = request.args.get('date_start', '2023-01-01')
@@ -609,7 +1018,8 @@ def get_category_revenue():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    source = route_sales_source()
     
     query = f"""
     SELECT 
@@ -617,7 +1027,7 @@ def get_category_revenue():
         SUM(f.revenue) AS revenue,
         SUM(f.profit) AS profit,
         SUM(f.quantity) AS quantity
-    FROM fact_sales f
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_store s ON f.store_id = s.store_id
     JOIN dim_product p ON f.product_id = p.product_id
@@ -626,11 +1036,12 @@ def get_category_revenue():
     ORDER BY revenue DESC
     """
     
-    df = execute_query(query)
+    df = execute_query(query, params)
     return jsonify(df.to_dict(orient='records'))
 
 @app.route('/api/customer-insights', methods=['GET'])
 @login_required
+@cached_endpoint('customer-insights')
 def get_customer_insights():
     """Get customer insights"""
     date_start = request.args.get('date_start', '2023-01-01')
@@ -639,26 +1050,9 @@ def get_customer_insights():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
     
-    query = f"""
-    SELECT 
-        c.age_group,
-        c.gender,
-        COUNT(DISTINCT c.customer_id) AS customer_count,
-        SUM(f.revenue) AS revenue,
-        AVG(f.revenue) AS avg_revenue_per_customer
-    FROM fact_sales f
-    JOIN dim_date d ON f.date_id = d.date_id
-    JOIN dim_store s ON f.store_id = s.store_id
-    JOIN dim_product p ON f.product_id = p.product_id
-    JOIN dim_customer c ON f.customer_id = c.customer_id
-    WHERE 1=1 {where_clause}
-    GROUP BY c.age_group, c.gender
-    ORDER BY c.age_group, c.gender
-    """
-    
-    df = execute_query(query)
+    df = execute_query(build_customer_insights_query(where_clause), params)
     return jsonify(df.to_dict(orient='records'))
 
 @app.route('/api/users', methods=['GET'])
@@ -910,8 +1304,9 @@ def user_settings():
 
     user_id = get_current_user_id()
     if request.method == 'GET':
-        connection = get_db_connection()
-        if connection:
+        with db_connection() as connection:
+            if not connection:
+                return jsonify({'error': 'שגיאה בהתחברות'}), 500
             try:
                 cursor = connection.cursor(dictionary=True)
                 cursor.execute(
@@ -920,15 +1315,12 @@ def user_settings():
                 )
                 row = cursor.fetchone()
                 cursor.close()
-                connection.close()
                 if not row:
                     return jsonify({'theme': 'light', 'chart_style': 'default'})
                 return jsonify(row)
             except Error as e:
                 print(f"Database error: {e}")
-                connection.close()
                 return jsonify({'error': 'שגיאה בשליפת הגדרות'}), 500
-        return jsonify({'error': 'שגיאה בהתחברות'}), 500
 
     data = request.get_json() or {}
     theme = (data.get('theme') or 'light').lower()
@@ -936,8 +1328,9 @@ def user_settings():
     if theme not in ['light', 'dark']:
         return jsonify({'error': 'ערך theme לא תקין'}), 400
 
-    connection = get_db_connection()
-    if connection:
+    with db_connection() as connection:
+        if not connection:
+            return jsonify({'error': 'שגיאה בהתחברות'}), 500
         try:
             cursor = connection.cursor()
             cursor.execute(
@@ -953,13 +1346,52 @@ def user_settings():
             )
             connection.commit()
             cursor.close()
-            connection.close()
             return jsonify({'success': True, 'theme': theme, 'chart_style': chart_style})
         except Error as e:
             print(f"Database error: {e}")
-            connection.close()
             return jsonify({'error': 'שגיאה בעדכון הגדרות'}), 500
-    return jsonify({'error': 'שגיאה בהתחברות'}), 500
+
+@app.route('/api/pool-stats', methods=['GET'])
+@login_required
+@admin_required
+def get_connection_pool_stats():
+    """Get database connection pool statistics (admin only)"""
+    return jsonify(get_pool_stats())
+
+@app.route('/api/cache-stats', methods=['GET'])
+@login_required
+@admin_required
+def get_cache_stats():
+    """Get result cache statistics (admin only)"""
+    stats = _result_cache.stats()
+    stats['data_version'] = get_data_version()
+    stats['forecast_models'] = forecast_service.stats()
+    return jsonify(stats)
+
+@app.route('/api/data-quality', methods=['GET'])
+@login_required
+@admin_required
+def get_data_quality():
+    """Get the latest ETL data quality reports (admin only)"""
+    limit = max(1, min(int(request.args.get('limit', 10)), 100))
+    
+    if not table_exists('etl_quality_runs'):
+        return jsonify({'runs': [], 'note': 'טבלת etl_quality_runs לא קיימת. יש להריץ את תהליך ה-ETL.'})
+    
+    df = execute_query(f"""
+    SELECT run_id, run_at, load_mode, quality_score, rows_checked, rows_removed, report
+    FROM etl_quality_runs
+    ORDER BY run_id DESC
+    LIMIT %s
+    """, [limit])
+    
+    runs = []
+    for run in df.to_dict(orient='records'):
+        run['run_at'] = run['run_at'].strftime('%Y-%m-%d %H:%M:%S')
+        run['report'] = json.loads(run['report']) if run['report'] else None
+        runs.append(run)
+    
+    return jsonify({'runs': runs})
 
 @app.route('/api/notifications', methods=['GET'])
 @login_required
@@ -969,8 +1401,9 @@ def get_notifications():
     user_role = session.get('role')
     user_store_id = session.get('store_id')
     
-    connection = get_db_connection()
-    if connection:
+    with db_connection() as connection:
+        if not connection:
+            return jsonify({'error': 'שגיאה בהתחברות'}), 500
         try:
             cursor = connection.cursor(dictionary=True)
             
@@ -1025,7 +1458,6 @@ def get_notifications():
             unread_count = sum(1 for n in notifications if not n['is_read'])
             
             cursor.close()
-            connection.close()
             
             return jsonify({
                 'notifications': notifications,
@@ -1034,16 +1466,15 @@ def get_notifications():
             })
         except Error as e:
             print(f"Database error: {e}")
-            connection.close()
             return jsonify({'error': 'שגיאה בטעינת התראות'}), 500
-    return jsonify({'error': 'שגיאה בהתחברות'}), 500
 
 @app.route('/api/notifications/<int:notification_id>/read', methods=['PUT'])
 @login_required
 def mark_notification_read(notification_id):
     """Mark notification as read"""
-    connection = get_db_connection()
-    if connection:
+    with db_connection() as connection:
+        if not connection:
+            return jsonify({'error': 'שגיאה בהתחברות'}), 500
         try:
             cursor = connection.cursor()
             cursor.execute(
@@ -1052,14 +1483,11 @@ def mark_notification_read(notification_id):
             )
             connection.commit()
             cursor.close()
-            connection.close()
             
             return jsonify({'success': True})
         except Error as e:
             print(f"Database error: {e}")
-            connection.close()
             return jsonify({'error': 'שגיאה בעדכון התראה'}), 500
-    return jsonify({'error': 'שגיאה בהתחברות'}), 500
 
 @app.route('/api/notifications/read-all', methods=['PUT'])
 @login_required
@@ -1067,8 +1495,9 @@ def mark_all_notifications_read():
     """Mark all notifications as read"""
     user_id = session.get('user_id')
     
-    connection = get_db_connection()
-    if connection:
+    with db_connection() as connection:
+        if not connection:
+            return jsonify({'error': 'שגיאה בהתחברות'}), 500
         try:
             cursor = connection.cursor()
             cursor.execute(
@@ -1077,23 +1506,99 @@ def mark_all_notifications_read():
             )
             connection.commit()
             cursor.close()
-            connection.close()
             
             return jsonify({'success': True})
         except Error as e:
             print(f"Database error: {e}")
-            connection.close()
             return jsonify({'error': 'שגיאה בעדכון התראות'}), 500
-    return jsonify({'error': 'שגיאה בהתחברות'}), 500
+
+def read_sales_anomalies(slice_key, date_start, date_end, per_store=False):
+    """Anomalies of a slice from sales_anomalies (scored by the ETL), or None before its baselines exist.
+
+    per_store lists the store-level anomalies of every store instead of the chain total.
+    """
+    if slice_key is None or not table_exists('anomaly_baselines'):
+        return None
+    store_id, category = slice_key
+    baseline = execute_query("""
+    SELECT SUM(observations) AS observations, MAX(last_date_id) AS last_date_id
+    FROM anomaly_baselines
+    WHERE store_id = %s AND category = %s
+    """, [store_id, category])
+    if baseline.empty or pd.isna(baseline['last_date_id'].iloc[0]):
+        return None
+    
+    where = SqlConditions()
+    if per_store and store_id == 0:
+        where.add("a.store_id <> 0")
+    else:
+        where.add("a.store_id = %s", store_id)
+    where.add("a.category = %s", category)
+    date_id_start, date_id_end = to_date_id(date_start), to_date_id(date_end)
+    if date_id_start and date_id_end:
+        where.add("a.date_id BETWEEN %s AND %s", date_id_start, date_id_end)
+    df = execute_query(f"""
+    SELECT 
+        a.store_id,
+        s.store_name,
+        a.category,
+        a.sale_date,
+        a.revenue,
+        a.expected_revenue,
+        a.std_revenue,
+        a.z_score,
+        a.deviation_pct,
+        a.anomaly_type,
+        a.severity
+    FROM sales_anomalies a
+    LEFT JOIN dim_store s ON a.store_id = s.store_id
+    WHERE 1=1 {where.clause()}
+    ORDER BY a.date_id, a.store_id
+    """, where.params)
+    
+    anomalies = [
+        {
+            'date': pd.Timestamp(row['sale_date']).strftime('%Y-%m-%d'),
+            'store_id': int(row['store_id']),
+            'store_name': row['store_name'],
+            'category': row['category'],
+            'revenue': float(row['revenue']),
+            'expected_revenue': float(row['expected_revenue']),
+            'deviation': float(row['deviation_pct']),
+            'z_score': float(row['z_score']),
+            'type': row['anomaly_type'],
+            'severity': row['severity']
+        }
+        for row in df.to_dict(orient='records')
+    ]
+    last_date_id = str(int(baseline['last_date_id'].iloc[0]))
+    return {
+        'anomalies': anomalies,
+        'statistics': {
+            'anomalies_count': len(anomalies),
+            'baseline_days': int(baseline['observations'].iloc[0]),
+            'last_scored_date': f"{last_date_id[:4]}-{last_date_id[4:6]}-{last_date_id[6:]}"
+        },
+        'source': 'baseline'
+    }
 
 @app.route('/api/anomaly-detection', methods=['GET'])
 @login_required
+@cached_endpoint('anomaly-detection')
 def detect_anomalies():
-    """Detect anomalies in sales data"""
+    """Sales anomalies against the ETL's day-of-week EWMA baselines, global mean/std scan until they exist"""
     date_start = request.args.get('date_start', '2023-01-01')
     date_end = request.args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
+    stores = request.args.get('stores', '')
+    categories = request.args.get('categories', '')
+    regions = request.args.get('regions', '')
+    per_store = request.args.get('level') == 'store'
+    
+    result = read_sales_anomalies(get_batch_forecast_slice(stores, categories, regions), date_start, date_end, per_store)
+    if result:
+        return jsonify(result)
     
-    where_clause = build_where_clause(date_start, date_end, '', '', '', restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
     
     # Get daily sales data
     query = f"""
@@ -1111,29 +1616,27 @@ def detect_anomalies():
     ORDER BY d.date
     """
     
-    df = execute_query(query)
+    df = execute_query(query, params)
     
     if df.empty or len(df) < 7:
         return jsonify({'anomalies': [], 'message': 'לא מספיק נתונים לזיהוי אנומליות'})
     
-    anomalies = []
-    
     # Calculate statistics
     mean_revenue = df['daily_revenue'].mean()
     std_revenue = df['daily_revenue'].std()
     
     # Detect outliers (beyond 2 standard deviations)
-    threshold = 2 * std_revenue
-    
-    for _, row in df.iterrows():
-        if abs(row['daily_revenue'] - mean_revenue) > threshold:
-            anomalies.append({
-                'date': row['date'].strftime('%Y-%m-%d'),
-                'revenue': float(row['daily_revenue']),
-                'expected_revenue': float(mean_revenue),
-                'deviation': float((row['daily_revenue'] - mean_revenue) / mean_revenue * 100),
-                'type': 'high' if row['daily_revenue'] > mean_revenue else 'low'
-            })
+    outliers = df[(df['daily_revenue'] - mean_revenue).abs() > 2 * std_revenue]
+    anomalies = [
+        {
+            'date': row['date'].strftime('%Y-%m-%d'),
+            'revenue': float(row['daily_revenue']),
+            'expected_revenue': float(mean_revenue),
+            'deviation': float((row['daily_revenue'] - mean_revenue) / mean_revenue * 100),
+            'type': 'high' if row['daily_revenue'] > mean_revenue else 'low'
+        }
+        for row in outliers.to_dict(orient='records')
+    ]
     
     return jsonify({
         'anomalies': anomalies,
@@ -1141,18 +1644,112 @@ def detect_anomalies():
             'mean_revenue': float(mean_revenue),
             'std_revenue': float(std_revenue),
             'total_days': len(df)
-        }
+        },
+        'source': 'live'
     })
 
+# ==================== CUSTOMER SEGMENTS ====================
+
+CUSTOMER_SEGMENT_MODEL = os.environ.get('CUSTOMER_SEGMENT_MODEL', 'data/models/customer_segments.pkl')
+SEGMENT_PAGE_SIZE_MAX = 1000
+segment_models = SegmentModelStore(CUSTOMER_SEGMENT_MODEL)
+
+def get_model_segments(model, page, page_size, segment):
+    """Segments from customer_features and the persisted model (None if features are not built yet).
+
+    Read-only: customers changed since training keep segment NULL until
+    scripts/train_customer_segments.py --assign-pending runs after the ETL.
+    """
+    if not table_exists('customer_features'):
+        return None
+    
+    # Store managers see customers whose latest purchase was in their store
+    where = SqlConditions().add("cf.segment IS NOT NULL")
+    user_role = get_current_user_role()
+    user_store_id = get_current_user_store_id()
+    if user_role != 'admin' and user_store_id:
+        where.add("cf.last_store_id = %s", int(user_store_id))
+    
+    summary = execute_query(f"""
+    SELECT 
+        cf.segment,
+        COUNT(*) AS customers_count,
+        AVG(cf.transactions) AS avg_transactions,
+        AVG(cf.total_revenue) AS avg_revenue,
+        AVG(cf.total_revenue / NULLIF(cf.transactions, 0)) AS avg_order_value,
+        AVG(cf.total_quantity) AS avg_quantity
+    FROM customer_features cf
+    WHERE 1=1 {where.clause()}
+    GROUP BY cf.segment
+    ORDER BY cf.segment
+    """, where.params)
+    if summary.empty:
+        return None
+    
+    pending = execute_query("SELECT COUNT(*) AS pending FROM customer_features WHERE segment IS NULL")
+    pending = int(pending['pending'].iloc[0]) if not pending.empty else 0
+    if pending:
+        # Counts are partial until the pending customers are assigned
+        skip_result_cache()
+    
+    if segment is not None:
+        where.add("cf.segment = %s", segment)
+        total = int(summary.loc[summary['segment'] == segment, 'customers_count'].sum())
+    else:
+        total = int(summary['customers_count'].sum())
+    
+    customers = execute_query(f"""
+    SELECT cf.customer_id, c.age_group, c.gender, cf.segment
+    FROM customer_features cf
+    JOIN dim_customer c ON cf.customer_id = c.customer_id
+    WHERE 1=1 {where.clause()}
+    ORDER BY cf.customer_id
+    LIMIT %s OFFSET %s
+    """, where.params + [page_size, (page - 1) * page_size])
+    
+    return {
+        'segments': summary.to_dict(orient='records'),
+        'customers': customers.to_dict(orient='records'),
+        'pagination': {
+            'page': page,
+            'page_size': page_size,
+            'total_customers': total,
+            'total_pages': (total + page_size - 1) // page_size
+        },
+        'model': {
+            'n_clusters': model['n_clusters'],
+            'trained_at': model['trained_at'],
+            'reference_date': model['reference_date'],
+            'pending_customers': pending
+        },
+        'source': 'model'
+    }
+
 @app.route('/api/customer-segments', methods=['GET'])
 @login_required
+@cached_endpoint('customer-segments')
 def get_customer_segments():
-    """Segment customers using KMeans clustering"""
+    """Customer segments: persisted MiniBatchKMeans model over customer_features, live KMeans until one is trained"""
     date_start = request.args.get('date_start', '2023-01-01')
     date_end = request.args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
-    n_clusters = int(request.args.get('clusters', 4))
-
-    where_clause = build_where_clause(date_start, date_end, '', '', '', restrict_to_store=True)
+    clusters = request.args.get('clusters')
+    n_clusters = int(clusters) if clusters not in (None, '') else 4
+    page = max(1, int(request.args.get('page', 1)))
+    page_size = min(SEGMENT_PAGE_SIZE_MAX, max(1, int(request.args.get('page_size', 100))))
+    segment = request.args.get('segment')
+    segment = int(segment) if segment not in (None, '') else None
+
+    # All-time RFM features; the date range only applies to the live fallback
+    model = segment_models.get()
+    if model is not None:
+        # The trained model fixes the number of segments; clusters only drives the live fallback
+        if clusters not in (None, '') and n_clusters != model['n_clusters']:
+            return jsonify({'error': f"המודל המאומן מחולק ל-{model['n_clusters']} קבוצות"}), 400
+        result = get_model_segments(model, page, page_size, segment)
+        if result:
+            return jsonify(result)
+
+    where_clause, params = build_where_clause(date_start, date_end, '', '', '', restrict_to_store=True)
 
     query = f"""
     SELECT 
@@ -1172,7 +1769,7 @@ def get_customer_segments():
     GROUP BY c.customer_id, c.age_group, c.gender
     """
 
-    df = execute_query(query)
+    df = execute_query(query, params)
 
     if df.empty or len(df) < n_clusters:
         return jsonify({
@@ -1204,37 +1801,53 @@ def get_customer_segments():
         'total_quantity': 'avg_quantity'
     }, inplace=True)
 
+    customers = df[['customer_id', 'age_group', 'gender', 'segment']]
+    if segment is not None:
+        customers = customers[customers['segment'] == segment]
+    total = len(customers)
+
     return jsonify({
         'segments': segment_summary.to_dict(orient='records'),
-        'customers': df[['customer_id', 'age_group', 'gender', 'segment']].to_dict(orient='records')
+        'customers': customers.iloc[(page - 1) * page_size:page * page_size].to_dict(orient='records'),
+        'pagination': {
+            'page': page,
+            'page_size': page_size,
+            'total_customers': total,
+            'total_pages': (total + page_size - 1) // page_size
+        },
+        'model': None,
+        'source': 'live'
     })
 
 @app.route('/api/filters', methods=['GET'])
 @login_required
+@cached_endpoint('filters')
 def get_filters():
     """Get filter options"""
     user_role = get_current_user_role()
     user_store_id = get_current_user_store_id()
 
+    params = []
     if user_role != 'admin' and user_store_id:
-        stores_query = f"""
+        params = [user_store_id]
+        stores_query = """
         SELECT DISTINCT store_id, store_name, city
         FROM dim_store
-        WHERE store_id = {user_store_id}
+        WHERE store_id = %s
         ORDER BY store_name
         """
-        categories_query = f"""
+        categories_query = """
         SELECT DISTINCT p.category
         FROM fact_sales f
         JOIN dim_product p ON f.product_id = p.product_id
         JOIN dim_store s ON f.store_id = s.store_id
-        WHERE s.store_id = {user_store_id}
+        WHERE s.store_id = %s
         ORDER BY p.category
         """
-        regions_query = f"""
+        regions_query = """
         SELECT DISTINCT region
         FROM dim_store
-        WHERE store_id = {user_store_id}
+        WHERE store_id = %s
         ORDER BY region
         """
     else:
@@ -1242,9 +1855,9 @@ def get_filters():
         categories_query = "SELECT DISTINCT category FROM dim_product ORDER BY category"
         regions_query = "SELECT DISTINCT region FROM dim_store ORDER BY region"
     
-    df_stores = execute_query(stores_query)
-    df_categories = execute_query(categories_query)
-    df_regions = execute_query(regions_query)
+    df_stores = execute_query(stores_query, params)
+    df_categories = execute_query(categories_query, params)
+    df_regions = execute_query(regions_query, params)
     
     return jsonify({
         'stores': df_stores.to_dict(orient='records'),
@@ -1252,6 +1865,31 @@ def get_filters():
         'regions': df_regions['region'].tolist()
     })
 
+INVENTORY_UPSERT_BATCH_SIZE = int(os.environ.get('INVENTORY_UPSERT_BATCH_SIZE', 1000))
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 500))
+
+def write_order_notifications(suggestions, notification_type, message_prefix):
+    """Queue one notification per suggested order; the writer flushes every NOTIFICATION_BATCH_SIZE (open duplicates are skipped)"""
+    with_product_id = column_exists('notifications', 'product_id')
+    with db_connection() as connection:
+        if not connection:
+            return {'error': 'שגיאה בהתחברות'}
+        writer = NotificationWriter(connection, NOTIFICATION_BATCH_SIZE, with_product_id)
+        try:
+            for item in suggestions:
+                writer.add(
+                    notification_type,
+                    f'הזמנה אוטומטית - {item["product_name"]}',
+                    f'{message_prefix} של {item["suggested_order_qty"]} יחידות עבור {item["product_name"]} בסניף {item["store_name"]}.',
+                    'warning',
+                    item['store_id'],
+                    item['product_id']
+                )
+            return writer.flush()
+        except Error as e:
+            print(f"Database error: {e}")
+            return {'error': 'שגיאה ביצירת התראות'}
+
 @app.route('/api/inventory-optimization', methods=['GET'])
 @login_required
 def inventory_optimization():
@@ -1261,13 +1899,16 @@ def inventory_optimization():
     holding_cost_rate = float(request.args.get('holding_cost_rate', 0.2))  # % of unit cost per year
     ordering_cost = float(request.args.get('ordering_cost', 50))  # fixed cost per order
     update_levels = request.args.get('update', 'false').lower() == 'true'
+    batch_size = max(1, int(request.args.get('batch_size', INVENTORY_UPSERT_BATCH_SIZE)))
 
     user_role = get_current_user_role()
     user_store_id = get_current_user_store_id()
 
     store_filter = ""
+    params = [days_back]
     if user_role != 'admin' and user_store_id:
-        store_filter = f"AND s.store_id = {user_store_id}"
+        store_filter = "AND s.store_id = %s"
+        params.append(user_store_id)
 
     inventory_table_ready = table_exists('inventory_levels') and column_exists('inventory_levels', 'current_quantity')
 
@@ -1288,7 +1929,7 @@ def inventory_optimization():
         JOIN dim_date d ON f.date_id = d.date_id
         LEFT JOIN inventory_levels i 
             ON i.store_id = s.store_id AND i.product_id = p.product_id
-        WHERE d.date >= DATE_SUB(CURDATE(), INTERVAL {days_back} DAY)
+        WHERE d.date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
         {store_filter}
         GROUP BY s.store_id, s.store_name, p.product_id, p.product_name, p.cost, i.current_quantity
         """
@@ -1307,84 +1948,46 @@ def inventory_optimization():
         JOIN dim_store s ON f.store_id = s.store_id
         JOIN dim_product p ON f.product_id = p.product_id
         JOIN dim_date d ON f.date_id = d.date_id
-        WHERE d.date >= DATE_SUB(CURDATE(), INTERVAL {days_back} DAY)
+        WHERE d.date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
         {store_filter}
         GROUP BY s.store_id, s.store_name, p.product_id, p.product_name, p.cost
         """
 
-    df = execute_query(query)
+    df = execute_query(query, params)
 
     if df.empty:
         return jsonify({'items': [], 'message': 'אין נתונים לחישוב מלאי'}), 200
 
-    results = []
     if update_levels and not inventory_table_ready:
         update_levels = False
 
-    connection = get_db_connection() if update_levels else None
-    cursor = connection.cursor() if connection else None
-
-    for _, row in df.iterrows():
-        if row['sales_days'] == 0:
-            continue
-
-        daily_demand = row['total_qty'] / max(row['sales_days'], 1)
-        annual_demand = daily_demand * 365
-        holding_cost = max(row['unit_cost'], 1) * holding_cost_rate
-
-        # EOQ formula
-        eoq = int(max(1, (2 * annual_demand * ordering_cost / max(holding_cost, 1)) ** 0.5))
-
-        # Reorder point (basic): demand during lead time + safety stock (10% buffer)
-        reorder_point = int(daily_demand * lead_time_days * 1.1)
-
-        # Suggested min/max levels
-        min_level = max(1, int(reorder_point * 0.8))
-        max_level = int(reorder_point + eoq)
-
-        results.append({
-            'store_id': int(row['store_id']),
-            'store_name': row['store_name'],
-            'product_id': int(row['product_id']),
-            'product_name': row['product_name'],
-            'current_stock': int(row['current_stock']),
-            'daily_demand': round(daily_demand, 2),
-            'eoq': eoq,
-            'reorder_point': reorder_point,
-            'min_level': min_level,
-            'max_level': max_level
-        })
-
-        if update_levels and cursor:
-            cursor.execute("""
-                INSERT INTO inventory_levels (store_id, product_id, current_quantity, min_quantity, max_quantity, reorder_point)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                    min_quantity = VALUES(min_quantity),
-                    max_quantity = VALUES(max_quantity),
-                    reorder_point = VALUES(reorder_point)
-            """, (
-                int(row['store_id']),
-                int(row['product_id']),
-                int(row['current_stock']),
-                min_level,
-                max_level,
-                reorder_point
-            ))
-
-    if update_levels and connection:
-        connection.commit()
-        cursor.close()
-        connection.close()
+    items = compute_optimization_items(df, lead_time_days, holding_cost_rate, ordering_cost)
+    results = items.to_dict(orient='records')
+
+    write_back = None
+    if update_levels:
+        with db_connection() as connection:
+            if connection:
+                try:
+                    write_back = bulk_upsert_inventory_levels(connection, items, batch_size)
+                except Error as e:
+                    print(f"Database error: {e}")
+                    write_back = {'error': 'שגיאה בעדכון רמות מלאי'}
+            else:
+                write_back = {'error': 'שגיאה בהתחברות'}
 
     response = {'items': results, 'parameters': {
         'days_back': days_back,
         'lead_time_days': lead_time_days,
         'holding_cost_rate': holding_cost_rate,
         'ordering_cost': ordering_cost,
-        'updated': update_levels
+        'updated': update_levels,
+        'batch_size': batch_size
     }}
 
+    if write_back is not None:
+        response['write_back'] = write_back
+
     if not inventory_table_ready:
         response['note'] = 'טבלת inventory_levels לא קיימת או חסרה עמודה. החישוב בוצע ללא מלאי נוכחי.'
 
@@ -1402,8 +2005,10 @@ def inventory_reorder_suggestions():
         return jsonify({'suggestions': [], 'note': 'טבלת inventory_levels לא קיימת או חסרה עמודה.'})
 
     store_filter = ""
+    params = []
     if user_role != 'admin' and user_store_id:
-        store_filter = f"WHERE i.store_id = {user_store_id}"
+        store_filter = "WHERE i.store_id = %s"
+        params.append(user_store_id)
 
     query = f"""
     SELECT 
@@ -1420,45 +2025,17 @@ def inventory_reorder_suggestions():
     {store_filter}
     """
 
-    df = execute_query(query)
+    df = execute_query(query, params)
     if df.empty:
         return jsonify({'suggestions': []})
 
-    suggestions = []
-    connection = get_db_connection() if auto_order else None
-    cursor = connection.cursor() if connection else None
-
-    for _, row in df.iterrows():
-        if row['current_quantity'] <= row['reorder_point']:
-            reorder_qty = max(0, int(row['max_quantity']) - int(row['current_quantity']))
-            suggestions.append({
-                'store_id': int(row['store_id']),
-                'store_name': row['store_name'],
-                'product_id': int(row['product_id']),
-                'product_name': row['product_name'],
-                'current_stock': int(row['current_quantity']),
-                'reorder_point': int(row['reorder_point']),
-                'suggested_order_qty': reorder_qty
-            })
-
-            if auto_order and cursor:
-                cursor.execute("""
-                    INSERT INTO notifications (type, title, message, severity, store_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    'low_stock',
-                    f'הזמנה אוטומטית - {row["product_name"]}',
-                    f'נוצרה הצעת הזמנה אוטומטית של {reorder_qty} יחידות עבור {row["product_name"]} בסניף {row["store_name"]}.',
-                    'warning',
-                    int(row['store_id'])
-                ))
+    suggestions = compute_reorder_suggestions(df).to_dict(orient='records')
+    response = {'suggestions': suggestions, 'auto_order': auto_order}
 
-    if auto_order and connection:
-        connection.commit()
-        cursor.close()
-        connection.close()
+    if auto_order:
+        response['notifications'] = write_order_notifications(suggestions, 'low_stock', 'נוצרה הצעת הזמנה אוטומטית')
 
-    return jsonify({'suggestions': suggestions, 'auto_order': auto_order})
+    return jsonify(response)
 
 @app.route('/api/inventory-auto-orders', methods=['GET'])
 @login_required
@@ -1476,8 +2053,10 @@ def inventory_auto_orders():
     user_role = get_current_user_role()
     user_store_id = get_current_user_store_id()
     store_filter = ""
+    params = [days_back]
     if user_role != 'admin' and user_store_id:
-        store_filter = f"AND s.store_id = {user_store_id}"
+        store_filter = "AND s.store_id = %s"
+        params.append(user_store_id)
 
     query = f"""
     SELECT 
@@ -1497,60 +2076,17 @@ def inventory_auto_orders():
     JOIN dim_date d ON f.date_id = d.date_id
     LEFT JOIN inventory_levels i
         ON i.store_id = s.store_id AND i.product_id = p.product_id
-    WHERE d.date >= DATE_SUB(CURDATE(), INTERVAL {days_back} DAY)
+    WHERE d.date >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
     {store_filter}
     GROUP BY s.store_id, s.store_name, p.product_id, p.product_name, p.cost, i.current_quantity, i.reorder_point, i.max_quantity
     """
 
-    df = execute_query(query)
+    df = execute_query(query, params)
     if df.empty:
         return jsonify({'suggestions': []})
 
-    suggestions = []
-    connection = get_db_connection() if auto_order else None
-    cursor = connection.cursor() if connection else None
-
-    for _, row in df.iterrows():
-        if row['sales_days'] == 0:
-            continue
-
-        daily_demand = row['total_qty'] / max(row['sales_days'], 1)
-        annual_demand = daily_demand * 365
-        holding_cost = max(row['unit_cost'], 1) * holding_cost_rate
-        eoq = int(max(1, (2 * annual_demand * ordering_cost / max(holding_cost, 1)) ** 0.5))
-
-        reorder_point = int(row['reorder_point']) if int(row['reorder_point']) > 0 else int(daily_demand * lead_time_days * 1.1)
-        max_level = int(row['max_quantity']) if int(row['max_quantity']) > 0 else int(reorder_point + eoq)
-
-        if int(row['current_quantity']) <= reorder_point:
-            suggested_qty = max(eoq, max_level - int(row['current_quantity']))
-            suggestions.append({
-                'store_id': int(row['store_id']),
-                'store_name': row['store_name'],
-                'product_id': int(row['product_id']),
-                'product_name': row['product_name'],
-                'current_stock': int(row['current_quantity']),
-                'reorder_point': reorder_point,
-                'eoq': eoq,
-                'suggested_order_qty': int(suggested_qty)
-            })
-
-            if auto_order and cursor:
-                cursor.execute("""
-                    INSERT INTO notifications (type, title, message, severity, store_id)
-                    VALUES (%s, %s, %s, %s, %s)
-                """, (
-                    'auto_order',
-                    f'הזמנה אוטומטית - {row["product_name"]}',
-                    f'הומלצה הזמנה אוטומטית של {int(suggested_qty)} יחידות עבור {row["product_name"]} בסניף {row["store_name"]}.',
-                    'warning',
-                    int(row['store_id'])
-                ))
-
-    if auto_order and connection:
-        connection.commit()
-        cursor.close()
-        connection.close()
+    suggestions = compute_auto_orders(df, lead_time_days, holding_cost_rate, ordering_cost).to_dict(orient='records')
+    notifications = write_order_notifications(suggestions, 'auto_order', 'הומלצה הזמנה אוטומטית') if auto_order else None
 
     return jsonify({
         'suggestions': suggestions,
@@ -1560,7 +2096,8 @@ def inventory_auto_orders():
             'holding_cost_rate': holding_cost_rate,
             'ordering_cost': ordering_cost,
             'auto_order': auto_order
-        }
+        },
+        'notifications': notifications
     })
 
 @app.route('/api/inventory-availability', methods=['GET'])
@@ -1574,8 +2111,10 @@ def inventory_availability():
         return jsonify({'availability': [], 'note': 'טבלת inventory_levels לא קיימת או חסרה עמודה.'})
 
     store_filter = ""
+    params = []
     if user_role != 'admin' and user_store_id:
-        store_filter = f"WHERE i.store_id = {user_store_id}"
+        store_filter = "WHERE i.store_id = %s"
+        params.append(user_store_id)
 
     central_ready = table_exists('central_inventory') and column_exists('central_inventory', 'current_stock')
 
@@ -1609,7 +2148,7 @@ def inventory_availability():
         {store_filter}
         """
 
-    df = execute_query(query)
+    df = execute_query(query, params)
     response = {'availability': df.to_dict(orient='records')}
     if not central_ready:
         response['note'] = 'טבלת central_inventory לא קיימת. מוצג מלאי סניפים בלבד.'
@@ -1626,8 +2165,10 @@ def get_inventory_levels():
         return jsonify({'inventory': [], 'note': 'טבלת inventory_levels לא קיימת או חסרה עמודה.'})
 
     store_filter = ""
+    params = []
     if user_role != 'admin' and user_store_id:
-        store_filter = f"WHERE i.store_id = {user_store_id}"
+        store_filter = "WHERE i.store_id = %s"
+        params.append(user_store_id)
 
     query = f"""
     SELECT 
@@ -1648,11 +2189,12 @@ def get_inventory_levels():
     LIMIT 500
     """
 
-    df = execute_query(query)
+    df = execute_query(query, params)
     return jsonify({'inventory': df.to_dict(orient='records')})
 
 @app.route('/api/seasonal-analysis', methods=['GET'])
 @login_required
+@cached_endpoint('seasonal-analysis')
 def get_seasonal_analysis():
     """Get seasonal analysis - quarterly and monthly patterns"""
     date_start = request.args.get('date_start', '2023-01-01')
@@ -1661,7 +2203,8 @@ def get_seasonal_analysis():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    source = route_sales_source()
     
     # Quarterly analysis
     quarterly_query = f"""
@@ -1671,9 +2214,9 @@ def get_seasonal_analysis():
         d.quarter_name,
         SUM(f.revenue) AS revenue,
         SUM(f.profit) AS profit,
-        COUNT(DISTINCT f.sale_id) AS transactions,
-        AVG(f.revenue) AS avg_revenue
-    FROM fact_sales f
+        {source['transactions']} AS transactions,
+        {source['avg_revenue']} AS avg_revenue
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_store s ON f.store_id = s.store_id
     JOIN dim_product p ON f.product_id = p.product_id
@@ -1697,7 +2240,7 @@ def get_seasonal_analysis():
             d.month_name,
             SUM(f.revenue) AS monthly_revenue,
             SUM(f.profit) AS monthly_profit
-        FROM fact_sales f
+        FROM {source['table']} f
         JOIN dim_date d ON f.date_id = d.date_id
         JOIN dim_store s ON f.store_id = s.store_id
         JOIN dim_product p ON f.product_id = p.product_id
@@ -1708,29 +2251,11 @@ def get_seasonal_analysis():
     ORDER BY monthly_data.month
     """
     
-    df_quarterly = execute_query(quarterly_query)
-    df_monthly = execute_query(monthly_query)
+    df_quarterly = execute_query(quarterly_query, params)
+    df_monthly = execute_query(monthly_query, params)
     
     # Calculate seasonal insights
-    insights = []
-    if not df_monthly.empty:
-        max_month = df_monthly.loc[df_monthly['avg_revenue'].idxmax()]
-        min_month = df_monthly.loc[df_monthly['avg_revenue'].idxmin()]
-        avg_revenue = df_monthly['avg_revenue'].mean()
-        
-        insights.append({
-            'type': 'peak_month',
-            'month': max_month['month_name'],
-            'revenue': float(max_month['avg_revenue']),
-            'percentage_above_avg': float((max_month['avg_revenue'] / avg_revenue - 1) * 100)
-        })
-        
-        insights.append({
-            'type': 'low_month',
-            'month': min_month['month_name'],
-            'revenue': float(min_month['avg_revenue']),
-            'percentage_below_avg': float((1 - min_month['avg_revenue'] / avg_revenue) * 100)
-        })
+    insights = build_seasonal_insights(df_monthly)
     
     return jsonify({
         'quarterly': df_quarterly.to_dict(orient='records'),
@@ -1738,10 +2263,93 @@ def get_seasonal_analysis():
         'insights': insights
     })
 
+# ==================== FORECAST MODELS ====================
+
+def load_forecast_series(spec):
+    """Monthly series for a forecast spec (fallback query when the range has under 3 months)"""
+    df = execute_query(spec['query'], spec['params'])
+    if len(df) < 3:
+        df = execute_query(spec['fallback_query'], spec['fallback_params'])
+    return df
+
+def get_batch_forecast_slice(stores, categories, regions):
+    """(store_id, category) of the forecast_results series matching the filters.
+
+    store_id 0 / category 'ALL' mean no filter; returns None for filters the
+    batch grid does not cover (several stores or categories, regions).
+    """
+    if regions:
+        return None
+    user_role = get_current_user_role()
+    user_store_id = get_current_user_store_id()
+    store_list = [v for v in stores.split(',') if v.strip()]
+    category_list = [v for v in categories.split(',') if v.strip()]
+    if len(category_list) > 1:
+        return None
+    if user_role != 'admin' and user_store_id:
+        store_id = int(user_store_id)
+    elif not store_list:
+        store_id = 0
+    elif len(store_list) == 1 and store_list[0].strip().isdigit():
+        store_id = int(store_list[0])
+    else:
+        return None
+    return store_id, category_list[0].strip() if category_list else 'ALL'
+
+def read_batch_forecast(slice_key, model_type, arima_order, forecast_months, date_start, date_end, force=False):
+    """Forecast response from forecast_results (scripts/batch_forecast.py), or None.
+
+    Used when the batch ran on the current data version, its horizon covers
+    the request and the date range covers the whole history (or force).
+    """
+    if slice_key is None or not table_exists('forecast_results'):
+        return None
+    store_id, category = slice_key
+    df = execute_query("""
+    SELECT year, month, month_name, revenue, profit, is_forecast, revenue_r2, profit_r2
+    FROM forecast_results
+    WHERE store_id = %s AND category = %s
+      AND model_type = %s AND arima_order = %s
+      AND data_version = %s
+    ORDER BY year, month
+    """, [store_id, category, model_type, arima_order, get_data_version()])
+    if df.empty:
+        return None
+    
+    is_forecast = df['is_forecast'].astype(bool)
+    history = df[~is_forecast]
+    forecast = df[is_forecast].head(forecast_months)
+    if history.empty or len(forecast) < forecast_months:
+        return None
+    first_month = f"{int(history['year'].iloc[0]):04d}-{int(history['month'].iloc[0]):02d}-01"
+    last_month = f"{int(history['year'].iloc[-1]):04d}-{int(history['month'].iloc[-1]):02d}-01"
+    if not force and not (date_start[:10] <= first_month and date_end[:10] >= last_month):
+        return None
+    
+    columns = ['year', 'month', 'month_name', 'revenue', 'profit']
+    return {
+        'historical': history[columns].to_dict(orient='records'),
+        'forecast': forecast[columns].assign(is_forecast=True).to_dict(orient='records'),
+        'model_accuracy': {
+            'revenue_r2': None if pd.isna(df['revenue_r2'].iloc[0]) else float(df['revenue_r2'].iloc[0]),
+            'profit_r2': None if pd.isna(df['profit_r2'].iloc[0]) else float(df['profit_r2'].iloc[0])
+        },
+        'model_type': model_type,
+        'model_cache': 'batch'
+    }
+
+forecast_service = ForecastService(
+    model_dir=os.environ.get('FORECAST_MODEL_DIR', os.path.join(tempfile.gettempdir(), 'retail_bi_forecast_models')),
+    series_loader=load_forecast_series,
+    memory_size=int(os.environ.get('FORECAST_MODEL_CACHE_SIZE', 32)),
+    refit_workers=int(os.environ.get('FORECAST_REFIT_WORKERS', 1))
+)
+
 @app.route('/api/sales-forecast', methods=['GET'])
 @login_required
+@cached_endpoint('sales-forecast')
 def get_sales_forecast():
-    """Predict future sales using simple linear regression"""
+    """Predict future sales (linear regression, Prophet or ARIMA) from cached fitted models"""
     date_start = request.args.get('date_start', '2023-01-01')
     date_end = request.args.get('date_end', datetime.now().strftime('%Y-%m-%d'))
     forecast_months = int(request.args.get('months', 6))  # Default 6 months ahead
@@ -1751,9 +2359,35 @@ def get_sales_forecast():
     categories = request.args.get('categories', '')
     regions = request.args.get('regions', '')
     
-    where_clause = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    order = None
+    if model_type == 'prophet':
+        if Prophet is None:
+            return jsonify({'error': 'Prophet is not installed. Install prophet to use this model.'}), 400
+    elif model_type == 'arima':
+        if ARIMA is None:
+            return jsonify({'error': 'statsmodels is not installed. Install statsmodels to use ARIMA.'}), 400
+        try:
+            order = [int(x.strip()) for x in arima_order.split(',')]
+            if len(order) != 3:
+                raise ValueError("Invalid ARIMA order")
+        except Exception:
+            return jsonify({'error': 'Invalid ARIMA order. Use format p,d,q (e.g., 1,1,1).'}), 400
+    else:
+        model_type = 'linear'
+    
+    # Nightly batch results for single store / category slices (source=batch ignores the date range)
+    batch = read_batch_forecast(
+        get_batch_forecast_slice(stores, categories, regions), model_type,
+        ','.join(str(x) for x in order) if order else '', forecast_months,
+        date_start, date_end, force=request.args.get('source') == 'batch'
+    )
+    if batch:
+        return jsonify(batch)
+    
+    where_clause, params = build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=True)
+    source = route_sales_source()
     
-    # Get historical monthly data
+    # Historical monthly data
     query = f"""
     SELECT 
         d.year,
@@ -1761,7 +2395,7 @@ def get_sales_forecast():
         d.month_name,
         SUM(f.revenue) AS revenue,
         SUM(f.profit) AS profit
-    FROM fact_sales f
+    FROM {source['table']} f
     JOIN dim_date d ON f.date_id = d.date_id
     JOIN dim_store s ON f.store_id = s.store_id
     JOIN dim_product p ON f.product_id = p.product_id
@@ -1770,168 +2404,93 @@ def get_sales_forecast():
     ORDER BY d.year, d.month
     """
     
-    df = execute_query(query)
+    # All available data if the date range has too little
+    # But still restrict to user's store if not admin
+    user_role = get_current_user_role()
+    user_store_id = get_current_user_store_id()
+    store_restriction = ""
+    fallback_params = []
+    if user_role != 'admin' and user_store_id:
+        store_restriction = "AND s.store_id = %s"
+        fallback_params = [user_store_id]
     
-    if df.empty or len(df) < 3:
-        # Try to get all available data if the date range has no data
-        # But still restrict to user's store if not admin
-        user_role = get_current_user_role()
-        user_store_id = get_current_user_store_id()
-        store_restriction = ""
-        if user_role != 'admin' and user_store_id:
-            store_restriction = f"AND s.store_id = {user_store_id}"
-        
-        fallback_query = f"""
-        SELECT 
-            d.year,
-            d.month,
-            d.month_name,
-            SUM(f.revenue) AS revenue,
-            SUM(f.profit) AS profit
-        FROM fact_sales f
-        JOIN dim_date d ON f.date_id = d.date_id
-        JOIN dim_store s ON f.store_id = s.store_id
-        JOIN dim_product p ON f.product_id = p.product_id
-        WHERE 1=1 {store_restriction}
-        GROUP BY d.year, d.month, d.month_name
-        ORDER BY d.year, d.month
-        """
-        df = execute_query(fallback_query)
-        
-        if df.empty or len(df) < 3:
-            return jsonify({'error': 'Not enough data for forecasting. Need at least 3 months of data.'}), 400
-
-    # Prepare data for forecasting
-    df['date'] = pd.to_datetime(df['year'].astype(str) + '-' + df['month'].astype(str) + '-01')
-    df = df.sort_values('date')
-    df['period'] = range(len(df))
-    X = df[['period']].values
-    y_revenue = df['revenue'].values
-    y_profit = df['profit'].values
-
-    # Generate future dates based on last available data
-    last_date = df['date'].max()
-    forecast_dates = pd.date_range(last_date + pd.offsets.MonthBegin(1), periods=forecast_months, freq='MS')
-
-    forecast_revenue = None
-    forecast_profit = None
-    model_accuracy = {'revenue_r2': None, 'profit_r2': None}
-
-    if model_type == 'prophet':
-        if Prophet is None:
-            return jsonify({'error': 'Prophet is not installed. Install prophet to use this model.'}), 400
-        if len(df) < 3:
-            return jsonify({'error': 'Not enough data for Prophet. Need at least 3 months of data.'}), 400
-
-        prophet_df = df[['date', 'revenue']].rename(columns={'date': 'ds', 'revenue': 'y'})
-        prophet_profit_df = df[['date', 'profit']].rename(columns={'date': 'ds', 'profit': 'y'})
-
-        model_revenue = Prophet()
-        model_revenue.fit(prophet_df)
-        model_profit = Prophet()
-        model_profit.fit(prophet_profit_df)
-
-        future = model_revenue.make_future_dataframe(periods=forecast_months, freq='MS')
-        revenue_forecast = model_revenue.predict(future).tail(forecast_months)
-        profit_forecast = model_profit.predict(future).tail(forecast_months)
-
-        forecast_revenue = revenue_forecast['yhat'].values
-        forecast_profit = profit_forecast['yhat'].values
-    elif model_type == 'arima':
-        if ARIMA is None:
-            return jsonify({'error': 'statsmodels is not installed. Install statsmodels to use ARIMA.'}), 400
-        try:
-            order = tuple(int(x.strip()) for x in arima_order.split(','))
-            if len(order) != 3:
-                raise ValueError("Invalid ARIMA order")
-        except Exception:
-            return jsonify({'error': 'Invalid ARIMA order. Use format p,d,q (e.g., 1,1,1).'}), 400
-
-        model_revenue = ARIMA(y_revenue, order=order).fit()
-        model_profit = ARIMA(y_profit, order=order).fit()
-        forecast_revenue = model_revenue.forecast(steps=forecast_months)
-        forecast_profit = model_profit.forecast(steps=forecast_months)
-    else:
-        # Simple linear regression for revenue
-        model_revenue = LinearRegression()
-        model_revenue.fit(X, y_revenue)
-
-        # Forecast future periods
-        last_period = len(df) - 1
-        future_periods = range(last_period + 1, last_period + 1 + forecast_months)
-        future_X = np.array([[p] for p in future_periods])
-
-        # Predict revenue
-        forecast_revenue = model_revenue.predict(future_X)
-
-        # Predict profit (using same trend as revenue)
-        model_profit = LinearRegression()
-        model_profit.fit(X, y_profit)
-        forecast_profit = model_profit.predict(future_X)
-
-        model_accuracy = {
-            'revenue_r2': float(model_revenue.score(X, y_revenue)),
-            'profit_r2': float(model_profit.score(X, y_profit))
-        }
-
-    # Combine historical and forecast
-    historical = df[['year', 'month', 'month_name', 'revenue', 'profit']].to_dict(orient='records')
-    
-    forecast = []
-    for i, date_val in enumerate(forecast_dates):
-        year = date_val.year
-        month = date_val.month
-        month_names = ['ינואר', 'פברואר', 'מרץ', 'אפריל', 'מאי', 'יוני',
-                      'יולי', 'אוגוסט', 'ספטמבר', 'אוקטובר', 'נובמבר', 'דצמבר']
-        forecast.append({
-            'year': int(year),
-            'month': int(month),
-            'month_name': month_names[int(month) - 1],
-            'revenue': float(forecast_revenue[i]),
-            'profit': float(forecast_profit[i]),
-            'is_forecast': True
-        })
+    fallback_query = f"""
+    SELECT 
+        d.year,
+        d.month,
+        d.month_name,
+        SUM(f.revenue) AS revenue,
+        SUM(f.profit) AS profit
+    FROM {source['table']} f
+    JOIN dim_date d ON f.date_id = d.date_id
+    JOIN dim_store s ON f.store_id = s.store_id
+    JOIN dim_product p ON f.product_id = p.product_id
+    WHERE 1=1 {store_restriction}
+    GROUP BY d.year, d.month, d.month_name
+    ORDER BY d.year, d.month
+    """
+    
+    spec = {
+        'query': query, 'params': params,
+        'fallback_query': fallback_query, 'fallback_params': fallback_params,
+        'model_type': model_type, 'order': order
+    }
+    bundle, model_source = forecast_service.get_model(spec, get_data_version())
+    if bundle is None:
+        return jsonify({'error': 'Not enough data for forecasting. Need at least 3 months of data.'}), 400
     
     return jsonify({
-        'historical': historical,
-        'forecast': forecast,
-        'model_accuracy': model_accuracy,
-        'model_type': model_type
+        'historical': bundle['historical'].to_dict(orient='records'),
+        'forecast': predict_forecast(bundle, forecast_months),
+        'model_accuracy': bundle['model_accuracy'],
+        'model_type': model_type,
+        'model_cache': model_source,
+        'fitted_at': bundle['fitted_at']
     })
 
+def to_date_id(value):
+    """yyyymmdd date_id of a YYYY-MM-DD filter value (None if it does not parse)"""
+    try:
+        return int(datetime.strptime(str(value)[:10], '%Y-%m-%d').strftime('%Y%m%d'))
+    except ValueError:
+        return None
+
 def build_where_clause(date_start, date_end, stores, categories, regions, restrict_to_store=False):
-    """Build WHERE clause from filter parameters"""
-    where_conditions = [f"d.date BETWEEN '{date_start}' AND '{date_end}'"]
+    """Build WHERE clause template and bound parameters from filter parameters.
+
+    Values are never interpolated, so the SQL text only depends on which
+    filters are set and the (bucketed) IN-list sizes.
+    """
+    where = SqlConditions()
+    where.add("d.date BETWEEN %s AND %s", date_start, date_end)
+    
+    # Same range on the fact table's own key, so MySQL can prune fact_sales
+    # partitions and range-scan the date-leading indexes
+    date_id_start, date_id_end = to_date_id(date_start), to_date_id(date_end)
+    if date_id_start and date_id_end:
+        where.add("f.date_id BETWEEN %s AND %s", date_id_start, date_id_end)
     
     # Restrict to user's store if not admin
     user_role = get_current_user_role()
     user_store_id = get_current_user_store_id()
+    store_list = [v.strip() for v in stores.split(',') if v.strip()] if stores else []
     
     if restrict_to_store and user_role != 'admin' and user_store_id:
-        where_conditions.append(f"s.store_id = {user_store_id}")
-    elif stores:
+        where.add("s.store_id = %s", user_store_id)
+    elif store_list:
         # If user is not admin, only allow their store
-        if user_role != 'admin' and user_store_id:
-            if str(user_store_id) not in stores.split(','):
-                where_conditions.append(f"s.store_id = {user_store_id}")
-            else:
-                store_list = stores.split(',')
-                where_conditions.append(f"s.store_id IN ({','.join(store_list)})")
+        if user_role != 'admin' and user_store_id and str(user_store_id) not in store_list:
+            where.add("s.store_id = %s", user_store_id)
         else:
-            store_list = stores.split(',')
-            where_conditions.append(f"s.store_id IN ({','.join(store_list)})")
+            where.add_in("s.store_id", [int(v) if v.isdigit() else v for v in store_list])
     
     if categories:
-        cat_list = categories.split(',')
-        cat_list = [f"'{cat}'" for cat in cat_list]
-        where_conditions.append(f"p.category IN ({','.join(cat_list)})")
+        where.add_in("p.category", [v.strip() for v in categories.split(',') if v.strip()] or [''])
     
     if regions:
-        reg_list = regions.split(',')
-        reg_list = [f"'{reg}'" for reg in reg_list]
-        where_conditions.append(f"s.region IN ({','.join(reg_list)})")
+        where.add_in("s.region", [v.strip() for v in regions.split(',') if v.strip()] or [''])
     
-    return " AND " + " AND ".join(where_conditions) if where_conditions else ""
+    return where.clause(), where.params
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,126 @@
+"""
+Customer Segmentation for the Retail BI Web Application
+RFM features from the customer_features table (maintained by the ETL),
+MiniBatchKMeans training and a persisted scaler + centroids model that
+assigns segments with a cheap predict
+"""
+
+from datetime import datetime
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+FEATURE_COLUMNS = ['recency_days', 'transactions', 'total_revenue', 'avg_order_value', 'total_quantity']
+
+
+def build_feature_matrix(df, reference_date):
+    """RFM feature matrix from customer_features rows (recency relative to reference_date)"""
+    transactions = pd.to_numeric(df['transactions'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    revenue = pd.to_numeric(df['total_revenue'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    last_purchase = pd.to_datetime(df['last_purchase_date'], errors='coerce')
+    recency = (pd.Timestamp(reference_date) - last_purchase).dt.days.fillna(0).to_numpy(dtype=float)
+
+    return np.column_stack([
+        np.maximum(recency, 0),
+        transactions,
+        revenue,
+        revenue / np.maximum(transactions, 1),
+        pd.to_numeric(df['total_quantity'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    ])
+
+
+def train_segment_model(df, n_clusters=4, batch_size=4096, random_state=42):
+    """Fit the scaler and MiniBatchKMeans on all customer feature rows"""
+    reference_date = pd.to_datetime(df['last_purchase_date']).max().normalize()
+    X = build_feature_matrix(df, reference_date)
+    scaler = StandardScaler().fit(X)
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=random_state, n_init=3)
+    kmeans.fit(scaler.transform(X))
+    return {
+        'scaler': scaler,
+        'centroids': kmeans.cluster_centers_,
+        'n_clusters': n_clusters,
+        'feature_columns': FEATURE_COLUMNS,
+        'reference_date': reference_date.strftime('%Y-%m-%d'),
+        'customers': len(df),
+        'trained_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def predict_segments(model, df):
+    """Nearest centroid of each customer row"""
+    X = model['scaler'].transform(build_feature_matrix(df, model['reference_date']))
+    distances = ((X[:, None, :] - model['centroids'][None, :, :]) ** 2).sum(axis=2)
+    return distances.argmin(axis=1)
+
+
+def save_segment_model(model, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, path)
+
+
+class SegmentModelStore:
+    """Loads the persisted segment model and reloads it when the file changes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._model = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if mtime != self._mtime:
+                try:
+                    with open(self.path, 'rb') as f:
+                        self._model = pickle.load(f)
+                    self._mtime = mtime
+                except Exception as e:
+                    print(f"Segment model could not be loaded: {e}")
+                    return None
+            return self._model
+
+
+def assign_pending_segments(connection, model, limit=50000, batch_size=1000):
+    """Predict segments for customers whose features changed since training (segment IS NULL).
+
+    Returns the number of customers assigned.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT customer_id, last_purchase_date, transactions, total_revenue, total_quantity
+            FROM customer_features
+            WHERE segment IS NULL
+            LIMIT %s
+        """, (limit,))
+        df = pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+        if df.empty:
+            return 0
+
+        values = np.column_stack([df['customer_id'].to_numpy(dtype=np.int64), predict_segments(model, df)])
+        for i in range(0, len(values), batch_size):
+            batch = values[i:i + batch_size]
+            cursor.execute(f"""
+                INSERT INTO customer_features (customer_id, segment)
+                VALUES {', '.join(['(%s, %s)'] * len(batch))}
+                ON DUPLICATE KEY UPDATE segment = VALUES(segment)
+            """, batch.ravel().tolist())
+        connection.commit()
+        return len(values)
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
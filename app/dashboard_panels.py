@@ -0,0 +1,150 @@
+"""
+Dashboard Panels for the Retail BI Web Application
+Builds every dashboard panel from grouped SQL results: one month x store x
+category aggregate of the sales source plus the product and customer panels
+"""
+
+import pandas as pd
+
+MEASURE_COLUMNS = ['quantity', 'revenue', 'profit', 'transactions']
+
+
+def prepare_slice(df):
+    """Convert the summed measures of a grouped aggregate to numbers"""
+    df = df.copy()
+    for col in MEASURE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    return df
+
+
+def records(df):
+    """DataFrame -> JSON-ready list of dicts (categoricals back to plain values)"""
+    return df.astype({col: 'object' for col in df.select_dtypes('category').columns}).to_dict(orient='records')
+
+
+def _group(df, keys):
+    return df.groupby(keys, observed=True, sort=False)
+
+
+def _sum_measures(df, keys):
+    return _group(df, keys)[['revenue', 'profit', 'quantity', 'transactions']].sum().reset_index()
+
+
+def build_kpis(df):
+    """KPI metrics (same fields as /api/kpis)"""
+    total_revenue = float(df['revenue'].sum())
+    total_profit = float(df['profit'].sum())
+    transactions = int(df['transactions'].sum())
+    return {
+        'total_transactions': transactions,
+        'total_revenue': total_revenue,
+        'total_profit': total_profit,
+        'profit_margin': total_profit / total_revenue * 100 if total_revenue else None,
+        'avg_order_value': total_revenue / transactions if transactions else None,
+        'total_quantity': int(df['quantity'].sum())
+    }
+
+
+def build_sales_trend(df):
+    """Monthly revenue/profit/transactions (same fields as /api/sales-trend)"""
+    trend = _sum_measures(df, ['year', 'month', 'month_name'])
+    return trend[['year', 'month', 'month_name', 'revenue', 'profit', 'transactions']].sort_values(['year', 'month'])
+
+
+def build_store_performance(df, limit=15):
+    """Top stores by revenue (same fields as /api/store-performance)"""
+    stores = _sum_measures(df, ['store_id', 'store_name', 'city', 'region'])
+    stores['profit_margin'] = stores['profit'] / stores['revenue'] * 100
+    stores = stores[['store_id', 'store_name', 'city', 'region', 'revenue', 'profit', 'profit_margin', 'transactions']]
+    return stores.nlargest(limit, 'revenue')
+
+
+def build_product_performance(df_products, limit=20):
+    """Top products by revenue (same fields as /api/product-performance) from the grouped product query"""
+    df_products = prepare_slice(df_products)
+    products = df_products.nlargest(limit, 'revenue')
+    return products[['category', 'brand', 'product_name', 'total_quantity', 'revenue', 'profit', 'sales_count']]
+
+
+def build_category_revenue(df):
+    """Revenue by category (same fields as /api/category-revenue)"""
+    categories = _sum_measures(df, ['category'])
+    return categories[['category', 'revenue', 'profit', 'quantity']].sort_values('revenue', ascending=False)
+
+
+def build_customer_insights(df_customers):
+    """Customer demographics (same fields as /api/customer-insights) from the grouped customer query"""
+    return df_customers.sort_values(['age_group', 'gender'])
+
+
+def build_seasonal_insights(df_monthly):
+    """Peak/low month insights from the average-by-month table"""
+    insights = []
+    if df_monthly.empty:
+        return insights
+
+    max_month = df_monthly.loc[df_monthly['avg_revenue'].idxmax()]
+    min_month = df_monthly.loc[df_monthly['avg_revenue'].idxmin()]
+    avg_revenue = df_monthly['avg_revenue'].mean()
+
+    insights.append({
+        'type': 'peak_month',
+        'month': max_month['month_name'],
+        'revenue': float(max_month['avg_revenue']),
+        'percentage_above_avg': float((max_month['avg_revenue'] / avg_revenue - 1) * 100)
+    })
+
+    insights.append({
+        'type': 'low_month',
+        'month': min_month['month_name'],
+        'revenue': float(min_month['avg_revenue']),
+        'percentage_below_avg': float((1 - min_month['avg_revenue'] / avg_revenue) * 100)
+    })
+    return insights
+
+
+def build_seasonal_analysis(df):
+    """Quarterly and average-by-month patterns (same fields as /api/seasonal-analysis)"""
+    quarterly = _sum_measures(df, ['year', 'quarter', 'quarter_name'])
+    quarterly['avg_revenue'] = quarterly['revenue'] / quarterly['transactions']
+    quarterly = quarterly[['year', 'quarter', 'quarter_name', 'revenue', 'profit', 'transactions', 'avg_revenue']]
+    quarterly = quarterly.sort_values(['year', 'quarter'])
+
+    monthly_data = _sum_measures(df, ['year', 'month', 'month_name'])
+    monthly = _group(monthly_data, ['month', 'month_name']).agg(
+        avg_revenue=('revenue', 'mean'),
+        avg_profit=('profit', 'mean'),
+        year_count=('year', 'size')
+    ).reset_index().sort_values('month').reset_index(drop=True)
+
+    return {
+        'quarterly': records(quarterly),
+        'monthly': records(monthly),
+        'insights': build_seasonal_insights(monthly)
+    }
+
+
+def build_dashboard_panels(df_sales, df_products, df_customers):
+    """Build every dashboard panel from the grouped sales, product and customer aggregates"""
+    if df_sales.empty:
+        return {
+            'kpis': {},
+            'sales_trend': [],
+            'store_performance': [],
+            'product_performance': [],
+            'category_revenue': [],
+            'customer_insights': [],
+            'seasonal_analysis': {'quarterly': [], 'monthly': [], 'insights': []}
+        }
+
+    df_sales = prepare_slice(df_sales)
+    return {
+        'kpis': build_kpis(df_sales),
+        'sales_trend': records(build_sales_trend(df_sales)),
+        'store_performance': records(build_store_performance(df_sales)),
+        'product_performance': records(build_product_performance(df_products)) if not df_products.empty else [],
+        'category_revenue': records(build_category_revenue(df_sales)),
+        'customer_insights': records(build_customer_insights(df_customers)) if not df_customers.empty else [],
+        'seasonal_analysis': build_seasonal_analysis(df_sales)
+    }
@@ -0,0 +1,145 @@
+"""
+Background Export Jobs for the Retail BI Web Application
+Runs heavy exports in a worker pool, writes artifacts to local disk and tracks progress.
+A background sweeper deletes expired artifacts that are not being downloaded.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import threading
+import time
+import traceback
+import uuid
+
+
+class ExportJobManager:
+    """Registry of export jobs executed by a bounded thread pool"""
+
+    def __init__(self, export_dir, max_workers, ttl_seconds, sweep_interval=60):
+        self.export_dir = export_dir
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+        os.makedirs(export_dir, exist_ok=True)
+        self._sweeper = threading.Thread(target=self._sweep, args=(sweep_interval,),
+                                         name='export-job-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                print(f"Export job cleanup failed: {e}")
+
+    def submit(self, owner_id, export_format, filename, writer):
+        """Queue a job. writer(path, job_id) writes the artifact and reports progress via update_progress."""
+        self.cleanup_expired()
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.export_dir, f'{job_id}_{filename}')
+        job = {
+            'job_id': job_id,
+            'owner_id': owner_id,
+            'format': export_format,
+            'filename': filename,
+            'path': path,
+            'status': 'queued',
+            'rows_written': 0,
+            'total_rows': None,
+            'error': None,
+            'created_at': datetime.now(),
+            'finished_at': None,
+            'expires_at': None,
+            'downloads': 0
+        }
+        description = self.describe(job)
+        with self._lock:
+            self._jobs[job_id] = job
+        self._executor.submit(self._run, job_id, path, writer)
+        return description
+
+    def _run(self, job_id, path, writer):
+        self._update(job_id, status='running')
+        try:
+            writer(path, job_id)
+            self._update(job_id, status='completed', finished_at=datetime.now(), expires_at=time.time() + self.ttl_seconds)
+        except Exception as e:
+            print(f"Export job {job_id} failed: {e}")
+            traceback.print_exc()
+            if os.path.exists(path):
+                os.remove(path)
+            self._update(job_id, status='failed', error=str(e), finished_at=datetime.now(), expires_at=time.time() + self.ttl_seconds)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def set_total_rows(self, job_id, total_rows):
+        self._update(job_id, total_rows=total_rows)
+
+    def update_progress(self, job_id, rows_written):
+        self._update(job_id, rows_written=rows_written)
+
+    def get(self, job_id, owner_id):
+        """Return the raw job record if it exists and belongs to owner_id"""
+        self.cleanup_expired()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['owner_id'] != owner_id:
+                return None
+            return dict(job)
+
+    def open_download(self, job_id, owner_id):
+        """Register a download of a completed job (its file is kept until finish_download)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['owner_id'] != owner_id or job['status'] != 'completed':
+                return None
+            job['downloads'] += 1
+            return dict(job)
+
+    def finish_download(self, job_id):
+        """End a download; the TTL restarts from the end of the last download"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job['downloads'] -= 1
+                job['expires_at'] = time.time() + self.ttl_seconds
+
+    def describe(self, job):
+        """Return the public (JSON-ready) view of a job record"""
+        total_rows = job['total_rows']
+        if job['status'] == 'completed':
+            percent = 100.0
+        elif total_rows:
+            percent = min(99.0, job['rows_written'] / total_rows * 100)
+        else:
+            percent = 0.0
+        return {
+            'job_id': job['job_id'],
+            'format': job['format'],
+            'filename': job['filename'],
+            'status': job['status'],
+            'rows_written': job['rows_written'],
+            'total_rows': total_rows,
+            'percent_complete': round(percent, 1),
+            'error': job['error'],
+            'created_at': job['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
+            'finished_at': job['finished_at'].strftime('%Y-%m-%d %H:%M:%S') if job['finished_at'] else None
+        }
+
+    def cleanup_expired(self):
+        """Delete finished jobs (and their files) older than the TTL, except jobs being downloaded"""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job['expires_at'] and job['expires_at'] < now and not job['downloads']]
+            for job in expired:
+                del self._jobs[job['job_id']]
+        for job in expired:
+            if os.path.exists(job['path']):
+                os.remove(job['path'])
@@ -0,0 +1,176 @@
+"""
+Export helpers for the Retail BI Web Application
+Streams filtered sales rows from the warehouse in chunks for large exports
+"""
+
+import csv
+import zlib
+from io import StringIO
+from mysql.connector import Error
+from openpyxl import Workbook
+
+EXPORT_COLUMNS = [
+    'date', 'store_name', 'city', 'region', 'product_name', 'category',
+    'customer_name', 'age_group', 'quantity', 'revenue', 'profit'
+]
+
+# Excel sheet limit is 1,048,576 rows including the header
+EXCEL_MAX_DATA_ROWS = 1048575
+SUMMARY_COLUMNS = ['transactions', 'quantity', 'revenue', 'profit']
+
+
+def build_export_query(where_clause, limit=None):
+    """Build the sales export query for a WHERE clause template from build_where_clause"""
+    limit_clause = f"LIMIT {int(limit)}" if limit else ""
+    return f"""
+    SELECT
+        d.date,
+        s.store_name,
+        s.city,
+        s.region,
+        p.product_name,
+        p.category,
+        c.customer_name,
+        c.age_group,
+        f.quantity,
+        f.revenue,
+        f.profit
+    FROM fact_sales f
+    JOIN dim_date d ON f.date_id = d.date_id
+    JOIN dim_store s ON f.store_id = s.store_id
+    JOIN dim_product p ON f.product_id = p.product_id
+    JOIN dim_customer c ON f.customer_id = c.customer_id
+    WHERE 1=1 {where_clause}
+    ORDER BY d.date DESC
+    {limit_clause}
+    """
+
+
+def build_export_count_query(where_clause):
+    """Build a row count query matching build_export_query (used for progress reporting)"""
+    return f"""
+    SELECT COUNT(*) AS total_rows
+    FROM fact_sales f
+    JOIN dim_date d ON f.date_id = d.date_id
+    JOIN dim_store s ON f.store_id = s.store_id
+    JOIN dim_product p ON f.product_id = p.product_id
+    JOIN dim_customer c ON f.customer_id = c.customer_id
+    WHERE 1=1 {where_clause}
+    """
+
+
+def track_progress(row_chunks, on_progress):
+    """Pass row chunks through, calling on_progress with the running row count"""
+    rows_seen = 0
+    for rows in row_chunks:
+        yield rows
+        rows_seen += len(rows)
+        on_progress(rows_seen)
+
+
+def iter_row_chunks(connection, query, chunk_size, params=None):
+    """Yield lists of row tuples from an unbuffered (server-side) cursor"""
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        try:
+            cursor.close()
+        except Error:
+            # Abandoned mid-stream (client disconnected) - the pool discards the connection
+            pass
+
+
+def iter_csv(row_chunks, columns=EXPORT_COLUMNS, compress=False):
+    """Encode row chunks as UTF-8 CSV (with BOM for Excel), optionally gzip-compressed"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+
+    data = buffer.getvalue().encode('utf-8')
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def _add_to_summary(totals, key, quantity, revenue, profit):
+    entry = totals.get(key)
+    if entry is None:
+        entry = totals[key] = [0, 0, 0, 0]
+    entry[0] += 1
+    entry[1] += quantity
+    entry[2] += revenue
+    entry[3] += profit
+
+
+def _append_summary_sheet(workbook, title, key_column, totals):
+    sheet = workbook.create_sheet(title)
+    sheet.append([key_column] + SUMMARY_COLUMNS)
+    for key, (transactions, quantity, revenue, profit) in sorted(totals.items(), key=lambda item: item[1][2], reverse=True):
+        sheet.append([key, transactions, quantity, revenue, profit])
+
+
+def write_excel_workbook(output, row_chunks, columns=EXPORT_COLUMNS, include_summaries=True):
+    """Write row chunks to an xlsx file using openpyxl's write-only (streaming) mode.
+
+    Rows go straight to the sheet XML, so memory does not grow with the row
+    count. Raw sales roll over to a new sheet at the Excel row limit. The
+    per-store and per-category summaries are accumulated during the same pass.
+    Returns the number of data rows written.
+    """
+    workbook = Workbook(write_only=True)
+    store_idx = columns.index('store_name')
+    category_idx = columns.index('category')
+    quantity_idx = columns.index('quantity')
+    revenue_idx = columns.index('revenue')
+    profit_idx = columns.index('profit')
+
+    store_totals = {}
+    category_totals = {}
+    sheet = None
+    sheet_rows = 0
+    total_rows = 0
+
+    for rows in row_chunks:
+        for row in rows:
+            if sheet is None or sheet_rows >= EXCEL_MAX_DATA_ROWS:
+                sheet_number = total_rows // EXCEL_MAX_DATA_ROWS + 1
+                sheet = workbook.create_sheet('Sales Report' if sheet_number == 1 else f'Sales Report ({sheet_number})')
+                sheet.append(columns)
+                sheet_rows = 0
+            sheet.append(row)
+            sheet_rows += 1
+            total_rows += 1
+
+            if include_summaries:
+                quantity, revenue, profit = row[quantity_idx], row[revenue_idx], row[profit_idx]
+                _add_to_summary(store_totals, row[store_idx], quantity, revenue, profit)
+                _add_to_summary(category_totals, row[category_idx], quantity, revenue, profit)
+
+    if sheet is None:
+        workbook.create_sheet('Sales Report').append(columns)
+
+    if include_summaries:
+        _append_summary_sheet(workbook, 'By Store', 'store_name', store_totals)
+        _append_summary_sheet(workbook, 'By Category', 'category', category_totals)
+
+    workbook.save(output)
+    return total_rows
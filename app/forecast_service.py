@@ -0,0 +1,245 @@
+"""
+Forecast Service for the Retail BI Web Application
+Fits Prophet / ARIMA / LinearRegression sales forecasts once per
+(series query, model type, ARIMA order, data version), keeps fitted models
+in an in-memory LRU backed by pickles on local disk, and refits recently
+used models in the background when the ETL publishes a new data version
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import traceback
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+try:
+    from prophet import Prophet
+except Exception:
+    Prophet = None
+try:
+    from statsmodels.tsa.arima.model import ARIMA
+except Exception:
+    ARIMA = None
+
+MIN_FORECAST_MONTHS = 3
+MONTH_NAMES = ['ינואר', 'פברואר', 'מרץ', 'אפריל', 'מאי', 'יוני',
+               'יולי', 'אוגוסט', 'ספטמבר', 'אוקטובר', 'נובמבר', 'דצמבר']
+
+
+def prepare_series(df):
+    """Monthly revenue/profit rows (year, month, month_name, revenue, profit) sorted by month"""
+    df = df.copy()
+    df['date'] = pd.to_datetime(df['year'].astype(str) + '-' + df['month'].astype(str) + '-01')
+    df = df.sort_values('date').reset_index(drop=True)
+    df['revenue'] = df['revenue'].astype(float)
+    df['profit'] = df['profit'].astype(float)
+    return df
+
+
+def fit_forecast_models(df, model_type, order=None):
+    """Fit revenue and profit models on a prepared monthly series"""
+    models = {}
+    accuracy = {'revenue_r2': None, 'profit_r2': None}
+    X = np.arange(len(df)).reshape(-1, 1)
+
+    for measure in ['revenue', 'profit']:
+        y = df[measure].values
+        if model_type == 'prophet':
+            model = Prophet()
+            model.fit(df[['date', measure]].rename(columns={'date': 'ds', measure: 'y'}))
+        elif model_type == 'arima':
+            model = ARIMA(y, order=tuple(order)).fit()
+        else:
+            model = LinearRegression()
+            model.fit(X, y)
+            accuracy[f'{measure}_r2'] = float(model.score(X, y))
+        models[measure] = model
+
+    return {
+        'model_type': model_type,
+        'order': order,
+        'models': models,
+        'historical': df[['year', 'month', 'month_name', 'revenue', 'profit']],
+        'last_date': df['date'].max(),
+        'periods': len(df),
+        'model_accuracy': accuracy,
+        'fitted_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def predict_forecast(bundle, forecast_months):
+    """Forecast rows for the next forecast_months months from a fitted bundle"""
+    predictions = {}
+    for measure, model in bundle['models'].items():
+        if bundle['model_type'] == 'prophet':
+            future = model.make_future_dataframe(periods=forecast_months, freq='MS')
+            predictions[measure] = model.predict(future).tail(forecast_months)['yhat'].values
+        elif bundle['model_type'] == 'arima':
+            predictions[measure] = model.forecast(steps=forecast_months)
+        else:
+            future_X = np.arange(bundle['periods'], bundle['periods'] + forecast_months).reshape(-1, 1)
+            predictions[measure] = model.predict(future_X)
+
+    forecast_dates = pd.date_range(bundle['last_date'] + pd.offsets.MonthBegin(1), periods=forecast_months, freq='MS')
+    return [
+        {
+            'year': int(date_val.year),
+            'month': int(date_val.month),
+            'month_name': MONTH_NAMES[date_val.month - 1],
+            'revenue': float(predictions['revenue'][i]),
+            'profit': float(predictions['profit'][i]),
+            'is_forecast': True
+        }
+        for i, date_val in enumerate(forecast_dates)
+    ]
+
+
+class ForecastService:
+    """Registry of fitted forecast models.
+
+    A spec is a JSON-ready dict with the series query (already filtered and
+    scoped to the user), the fallback query, model type and ARIMA order.
+    series_loader(spec) returns the monthly series DataFrame for a spec.
+    """
+
+    def __init__(self, model_dir, series_loader, memory_size=32, refit_workers=1):
+        self.model_dir = model_dir
+        self.series_loader = series_loader
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._specs = OrderedDict()
+        self._lock = threading.Lock()
+        self._fit_locks = {}
+        self._executor = ThreadPoolExecutor(max_workers=refit_workers, thread_name_prefix='forecast-refit')
+        self._version = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.fits = 0
+        self.refits = 0
+        os.makedirs(model_dir, exist_ok=True)
+
+    def _model_key(self, spec):
+        return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+    def _model_path(self, key, data_version):
+        return os.path.join(self.model_dir, f'v{data_version}', f'{key}.pkl')
+
+    def _remember(self, key, data_version, bundle):
+        with self._lock:
+            self._memory[(key, data_version)] = bundle
+            self._memory.move_to_end((key, data_version))
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get_model(self, spec, data_version):
+        """Return (bundle, source) where source is memory, disk or fit; bundle is None without enough data"""
+        key = self._model_key(spec)
+        with self._lock:
+            self._specs[key] = spec
+            self._specs.move_to_end(key)
+            while len(self._specs) > self.memory_size:
+                self._specs.popitem(last=False)
+            bundle = self._memory.get((key, data_version))
+            if bundle is not None:
+                self._memory.move_to_end((key, data_version))
+                self.memory_hits += 1
+                return bundle, 'memory'
+            fit_lock = self._fit_locks.setdefault((key, data_version), threading.Lock())
+
+        # One fit per model at a time; concurrent requests wait for it
+        with fit_lock:
+            with self._lock:
+                bundle = self._memory.get((key, data_version))
+                if bundle is not None:
+                    self.memory_hits += 1
+            if bundle is not None:
+                return bundle, 'memory'
+            try:
+                return self._load_or_fit(spec, key, data_version)
+            finally:
+                with self._lock:
+                    self._fit_locks.pop((key, data_version), None)
+
+    def _load_or_fit(self, spec, key, data_version):
+        path = self._model_path(key, data_version)
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    bundle = pickle.load(f)
+                self._remember(key, data_version, bundle)
+                self.disk_hits += 1
+                return bundle, 'disk'
+            except Exception as e:
+                print(f"Forecast model {key} could not be loaded, refitting: {e}")
+
+        df = self.series_loader(spec)
+        if df is None or len(df) < MIN_FORECAST_MONTHS:
+            return None, 'fit'
+        bundle = fit_forecast_models(prepare_series(df), spec['model_type'], spec.get('order'))
+        bundle['data_version'] = data_version
+        self.fits += 1
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(bundle, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Forecast model {key} kept in memory only: {e}")
+        self._remember(key, data_version, bundle)
+        return bundle, 'fit'
+
+    def on_data_version(self, data_version):
+        """Called when the warehouse data version changes: refit recently used models in the background"""
+        with self._lock:
+            if data_version == self._version:
+                return
+            first_version = self._version is None
+            self._version = data_version
+            specs = list(self._specs.values())
+        if not first_version:
+            self._executor.submit(self._refit, specs, data_version)
+
+    def _refit(self, specs, data_version):
+        for spec in specs:
+            if self._version != data_version:
+                return  # a newer ETL run superseded this one
+            try:
+                _, source = self.get_model(spec, data_version)
+                if source == 'fit':
+                    self.refits += 1
+            except Exception as e:
+                print(f"Forecast refit failed: {e}")
+                traceback.print_exc()
+        self.cleanup(keep_version=data_version)
+
+    def cleanup(self, keep_version):
+        """Drop models of other data versions from memory and disk"""
+        with self._lock:
+            for cache_key in [k for k in self._memory if k[1] != keep_version]:
+                del self._memory[cache_key]
+        for dirname in os.listdir(self.model_dir):
+            if dirname != f'v{keep_version}':
+                shutil.rmtree(os.path.join(self.model_dir, dirname), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            models_in_memory = len(self._memory)
+            tracked = len(self._specs)
+        return {
+            'models_in_memory': models_in_memory,
+            'tracked_specs': tracked,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'fits': self.fits,
+            'background_refits': self.refits,
+            'data_version': self._version
+        }
@@ -0,0 +1,149 @@
+"""
+Inventory Policy for the Retail BI Web Application
+Vectorized EOQ / reorder point / min-max calculations for all store x product pairs
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+SAFETY_STOCK_FACTOR = 1.1  # 10% buffer on lead-time demand
+MIN_LEVEL_FACTOR = 0.8
+
+INVENTORY_UPSERT_COLUMNS = ['store_id', 'product_id', 'current_stock', 'min_level', 'max_level', 'reorder_point']
+
+
+def _numbers(df, column):
+    return pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+def compute_inventory_policy(df, lead_time_days, holding_cost_rate, ordering_cost):
+    """Compute daily demand, EOQ, reorder point and min/max levels as array operations.
+
+    Expects columns store_id, store_name, product_id, product_name, unit_cost,
+    total_qty and sales_days. Rows without sales days are dropped.
+    """
+    df = df[pd.to_numeric(df['sales_days'], errors='coerce').fillna(0) > 0]
+
+    total_qty = _numbers(df, 'total_qty')
+    sales_days = _numbers(df, 'sales_days')
+    unit_cost = _numbers(df, 'unit_cost')
+
+    daily_demand = total_qty / np.maximum(sales_days, 1)
+    annual_demand = daily_demand * 365
+    holding_cost = np.maximum(unit_cost, 1) * holding_cost_rate
+
+    # EOQ formula
+    eoq = np.maximum(1, np.sqrt(2 * annual_demand * ordering_cost / np.maximum(holding_cost, 1))).astype(np.int64)
+
+    # Reorder point: demand during lead time + safety stock
+    reorder_point = (daily_demand * lead_time_days * SAFETY_STOCK_FACTOR).astype(np.int64)
+
+    # Suggested min/max levels
+    min_level = np.maximum(1, (reorder_point * MIN_LEVEL_FACTOR).astype(np.int64))
+    max_level = reorder_point + eoq
+
+    return pd.DataFrame({
+        'store_id': df['store_id'].astype(np.int64).to_numpy(),
+        'store_name': df['store_name'].to_numpy(),
+        'product_id': df['product_id'].astype(np.int64).to_numpy(),
+        'product_name': df['product_name'].to_numpy(),
+        'daily_demand': np.round(daily_demand, 2),
+        'eoq': eoq,
+        'reorder_point': reorder_point,
+        'min_level': min_level,
+        'max_level': max_level
+    }, index=df.index)
+
+
+def compute_optimization_items(df, lead_time_days, holding_cost_rate, ordering_cost):
+    """Inventory optimization rows (policy + current stock) for /api/inventory-optimization"""
+    policy = compute_inventory_policy(df, lead_time_days, holding_cost_rate, ordering_cost)
+    policy.insert(4, 'current_stock', _numbers(df.loc[policy.index], 'current_stock').astype(np.int64))
+    return policy.reset_index(drop=True)
+
+
+def compute_auto_orders(df, lead_time_days, holding_cost_rate, ordering_cost):
+    """Auto order suggestions: stored reorder point / max level when set, computed policy otherwise"""
+    policy = compute_inventory_policy(df, lead_time_days, holding_cost_rate, ordering_cost)
+    df = df.loc[policy.index]
+
+    current = _numbers(df, 'current_quantity').astype(np.int64)
+    stored_reorder_point = _numbers(df, 'reorder_point').astype(np.int64)
+    stored_max = _numbers(df, 'max_quantity').astype(np.int64)
+    eoq = policy['eoq'].to_numpy()
+
+    reorder_point = np.where(stored_reorder_point > 0, stored_reorder_point, policy['reorder_point'].to_numpy())
+    max_level = np.where(stored_max > 0, stored_max, reorder_point + eoq)
+    suggested_qty = np.maximum(eoq, max_level - current)
+
+    orders = pd.DataFrame({
+        'store_id': policy['store_id'].to_numpy(),
+        'store_name': policy['store_name'].to_numpy(),
+        'product_id': policy['product_id'].to_numpy(),
+        'product_name': policy['product_name'].to_numpy(),
+        'current_stock': current,
+        'reorder_point': reorder_point,
+        'eoq': eoq,
+        'suggested_order_qty': suggested_qty
+    })
+    return orders[current <= reorder_point].reset_index(drop=True)
+
+
+def compute_reorder_suggestions(df):
+    """Items at or below their reorder point, topped up to max level"""
+    current = _numbers(df, 'current_quantity').astype(np.int64)
+    reorder_point = _numbers(df, 'reorder_point').astype(np.int64)
+    max_quantity = _numbers(df, 'max_quantity').astype(np.int64)
+
+    suggestions = pd.DataFrame({
+        'store_id': df['store_id'].astype(np.int64).to_numpy(),
+        'store_name': df['store_name'].to_numpy(),
+        'product_id': df['product_id'].astype(np.int64).to_numpy(),
+        'product_name': df['product_name'].to_numpy(),
+        'current_stock': current,
+        'reorder_point': reorder_point,
+        'suggested_order_qty': np.maximum(0, max_quantity - current)
+    })
+    return suggestions[current <= reorder_point].reset_index(drop=True)
+
+
+def bulk_upsert_inventory_levels(connection, items, batch_size=1000):
+    """Write computed levels to inventory_levels with multi-row upserts in a single transaction.
+
+    Each batch is one INSERT ... VALUES (...), (...) ON DUPLICATE KEY UPDATE statement.
+    Returns rows affected (MySQL counts 1 per insert, 2 per changed row), batch count and elapsed time.
+    """
+    started = time.perf_counter()
+    values = items[INVENTORY_UPSERT_COLUMNS].to_numpy(dtype=np.int64)
+    row_placeholder = '(' + ', '.join(['%s'] * len(INVENTORY_UPSERT_COLUMNS)) + ')'
+    rows_affected = 0
+    batches = 0
+
+    cursor = connection.cursor()
+    try:
+        for i in range(0, len(values), batch_size):
+            batch = values[i:i + batch_size]
+            cursor.execute(f"""
+                INSERT INTO inventory_levels (store_id, product_id, current_quantity, min_quantity, max_quantity, reorder_point)
+                VALUES {', '.join([row_placeholder] * len(batch))}
+                ON DUPLICATE KEY UPDATE
+                    min_quantity = VALUES(min_quantity),
+                    max_quantity = VALUES(max_quantity),
+                    reorder_point = VALUES(reorder_point)
+            """, batch.ravel().tolist())
+            rows_affected += cursor.rowcount
+            batches += 1
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return {
+        'rows': len(values),
+        'rows_affected': rows_affected,
+        'batches': batches,
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    }
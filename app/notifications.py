@@ -0,0 +1,111 @@
+"""
+Notification Writer for the Retail BI Web Application
+Buffers generated notifications and flushes them with multi-row inserts every
+batch_size notifications, skipping ones that duplicate an open (unread) notification
+"""
+
+NOTIFICATION_COLUMNS = ['type', 'title', 'message', 'severity', 'store_id']
+
+
+class NotificationWriter:
+    """Buffered notification inserts with dedupe against unread notifications.
+
+    The buffer is flushed (and committed) whenever it reaches batch_size, so
+    memory stays bounded; call flush() once more at the end. An open notification is identified by (type, store_id, product_id) when the
+    notifications table has a product_id column, and by (type, store_id, title)
+    on older schemas without it.
+    """
+
+    def __init__(self, connection, batch_size=500, with_product_id=True):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.with_product_id = with_product_id
+        self._pending = []
+        self.queued = 0
+        self.inserted = 0
+        self.skipped = 0
+
+    def add(self, notification_type, title, message, severity, store_id, product_id=None):
+        self._pending.append({
+            'type': notification_type,
+            'title': title,
+            'message': message,
+            'severity': severity,
+            'store_id': store_id,
+            'product_id': product_id
+        })
+        self.queued += 1
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def _key(self, notification):
+        third = notification['product_id'] if self.with_product_id else notification['title']
+        return (notification['type'], notification['store_id'], third)
+
+    def _open_keys(self, cursor):
+        """Keys of unread notifications for the types and stores in the buffer"""
+        types = sorted({n['type'] for n in self._pending})
+        store_ids = sorted({n['store_id'] for n in self._pending if n['store_id'] is not None})
+        third = 'product_id' if self.with_product_id else 'title'
+
+        conditions = [f"type IN ({', '.join(['%s'] * len(types))})"]
+        params = list(types)
+        # Chain-wide notifications have no store and must be matched with IS NULL
+        store_conditions = []
+        if store_ids:
+            store_conditions.append(f"store_id IN ({', '.join(['%s'] * len(store_ids))})")
+            params.extend(store_ids)
+        if any(n['store_id'] is None for n in self._pending):
+            store_conditions.append("store_id IS NULL")
+        conditions.append(f"({' OR '.join(store_conditions)})")
+
+        cursor.execute(f"""
+            SELECT type, store_id, {third}
+            FROM notifications
+            WHERE is_read = FALSE AND {' AND '.join(conditions)}
+        """, params)
+        return {tuple(row) for row in cursor.fetchall()}
+
+    def flush(self):
+        """Insert the buffered notifications in one transaction; returns writer stats"""
+        if not self._pending:
+            return self.stats()
+
+        columns = NOTIFICATION_COLUMNS + (['product_id'] if self.with_product_id else [])
+        row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+
+        cursor = self.connection.cursor()
+        try:
+            seen = self._open_keys(cursor)
+            rows = []
+            for notification in self._pending:
+                key = self._key(notification)
+                if key in seen:
+                    self.skipped += 1
+                    continue
+                seen.add(key)
+                rows.append([notification[col] for col in columns])
+
+            for i in range(0, len(rows), self.batch_size):
+                batch = rows[i:i + self.batch_size]
+                cursor.execute(f"""
+                    INSERT INTO notifications ({', '.join(columns)})
+                    VALUES {', '.join([row_placeholder] * len(batch))}
+                """, [value for row in batch for value in row])
+            self.connection.commit()
+            self.inserted += len(rows)
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            self._pending = []
+
+        return self.stats()
+
+    def stats(self):
+        return {
+            'queued': self.queued,
+            'inserted': self.inserted,
+            'skipped_duplicates': self.skipped
+        }
@@ -0,0 +1,114 @@
+"""
+Query Builder for the Retail BI Web Application
+Builds analytical WHERE clauses as stable SQL templates with bound parameters
+(IN lists padded to fixed bucket sizes) and runs them as server-side prepared
+statements cached per pooled connection
+"""
+
+from collections import OrderedDict
+import pandas as pd
+from mysql.connector import Error
+
+# IN lists are padded to the next bucket (repeating the last value), so the
+# number of statement shapes per query grows with log2 of the list length
+IN_LIST_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Shared by all pooled connections
+prepared_statement_stats = {'prepares': 0, 'reuses': 0, 'evictions': 0, 'errors': 0}
+
+
+def in_list_size(count):
+    """Number of placeholders for an IN list of count values"""
+    return next((bucket for bucket in IN_LIST_BUCKETS if bucket >= count), count)
+
+
+class SqlConditions:
+    """AND-ed SQL conditions with %s placeholders and their parameters, in order"""
+
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+
+    def add(self, condition, *params):
+        self.conditions.append(condition)
+        self.params.extend(params)
+        return self
+
+    def add_in(self, column, values):
+        """`column IN (...)` over values, padded to the bucket size"""
+        values = list(values)
+        size = in_list_size(len(values))
+        self.conditions.append(f"{column} IN ({', '.join(['%s'] * size)})")
+        self.params.extend(values + [values[-1]] * (size - len(values)))
+        return self
+
+    def clause(self):
+        """' AND cond AND ...' for appending after WHERE 1=1 (empty without conditions)"""
+        return " AND " + " AND ".join(self.conditions) if self.conditions else ""
+
+
+class PreparedStatementCache:
+    """LRU of prepared cursors of one DBAPI connection, keyed by SQL template.
+
+    mysql.connector re-prepares unless a prepared cursor executes the very
+    same string object again, so each entry keeps the template it was
+    prepared with.
+    """
+
+    def __init__(self, dbapi_connection, max_statements):
+        self.dbapi_connection = dbapi_connection
+        self.max_statements = max_statements
+        self._statements = OrderedDict()  # sql -> (sql, cursor)
+
+    def execute(self, sql, params=None):
+        """Execute sql with params on its prepared cursor; returns the cursor"""
+        entry = self._statements.get(sql)
+        if entry is None:
+            # The pool's connections default to buffered cursors, which mysql.connector
+            # cannot combine with prepared ones; fetch_frame reads every row instead
+            entry = (sql, self.dbapi_connection.cursor(prepared=True, buffered=False))
+            self._statements[sql] = entry
+            prepared_statement_stats['prepares'] += 1
+            while len(self._statements) > self.max_statements:
+                _, (_, cursor) = self._statements.popitem(last=False)
+                self._close(cursor)
+                prepared_statement_stats['evictions'] += 1
+        else:
+            self._statements.move_to_end(sql)
+            prepared_statement_stats['reuses'] += 1
+
+        statement, cursor = entry
+        try:
+            cursor.execute(statement, tuple(params or ()))
+        except Exception:
+            # The statement may be half-prepared or the connection broken - prepare again next time
+            prepared_statement_stats['errors'] += 1
+            self._statements.pop(sql, None)
+            self._close(cursor)
+            raise
+        return cursor
+
+    def _close(self, cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+
+def get_statement_cache(connection, max_statements):
+    """Prepared statement cache of a pooled connection.
+
+    Kept in the pool's per-DBAPI-connection info dict, which SQLAlchemy
+    clears when the connection is closed, recycled or invalidated.
+    """
+    cache = connection.info.get('prepared_statements')
+    if cache is None:
+        cache = PreparedStatementCache(connection.dbapi_connection, max_statements)
+        connection.info['prepared_statements'] = cache
+    return cache
+
+
+def fetch_frame(cursor):
+    """All rows of an executed cursor as a DataFrame (DECIMAL columns as floats, like pd.read_sql)"""
+    columns = [col[0] for col in cursor.description] if cursor.description else []
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
@@ -93,40 +93,16 @@ async function loadDashboard() {
     const queryString = buildQueryString(filters);
     
     try {
-        // Load KPIs
-        const kpiResponse = await fetch(`/api/kpis?${queryString}`);
-        const kpiData = await kpiResponse.json();
-        updateKPIs(kpiData);
-        
-        // Load sales trend
-        const trendResponse = await fetch(`/api/sales-trend?${queryString}`);
-        const trendData = await trendResponse.json();
-        updateSalesTrend(trendData);
-        
-        // Load store performance
-        const storeResponse = await fetch(`/api/store-performance?${queryString}`);
-        const storeData = await storeResponse.json();
-        updateStorePerformance(storeData);
-        
-        // Load product performance
-        const productResponse = await fetch(`/api/product-performance?${queryString}`);
-        const productData = await productResponse.json();
-        updateProductPerformance(productData);
-        
-        // Load category revenue
-        const categoryResponse = await fetch(`/api/category-revenue?${queryString}`);
-        const categoryData = await categoryResponse.json();
-        updateCategoryRevenue(categoryData);
-        
-        // Load customer insights
-        const customerResponse = await fetch(`/api/customer-insights?${queryString}`);
-        const customerData = await customerResponse.json();
-        updateCustomerInsights(customerData);
-        
-        // Load seasonal analysis
-        const seasonalResponse = await fetch(`/api/seasonal-analysis?${queryString}`);
-        const seasonalData = await seasonalResponse.json();
-        updateSeasonalAnalysis(seasonalData);
+        // Load all dashboard panels in one request
+        const response = await fetch(`/api/dashboard?${queryString}`);
+        const data = await response.json();
+        updateKPIs(data.kpis);
+        updateSalesTrend(data.sales_trend);
+        updateStorePerformance(data.store_performance);
+        updateProductPerformance(data.product_performance);
+        updateCategoryRevenue(data.category_revenue);
+        updateCustomerInsights(data.customer_insights);
+        updateSeasonalAnalysis(data.seasonal_analysis);
         
         // Load forecast
         loadForecast();
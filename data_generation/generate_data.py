@@ -1,48 +1,36 @@
 """
 Data Generation Script for Retail BI Project
 Creates synthetic retail data using Faker library
+
+Sales are generated with NumPy arrays, one shard (a run of days within a
+month) at a time, in parallel worker processes. --scale multiplies stores,
+products, customers and daily sales volume, so the same script produces the
+small demo dataset and 10M-1B row benchmark datasets.
 """
 
-import pandas as pd
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import shutil
+import time
 import numpy as np
+import pandas as pd
 from faker import Faker
-import random
-from datetime import datetime, timedelta
-import os
 
-# Initialize Faker
-fake = Faker('he_IL')  # Hebrew locale
-Faker.seed(42)
-np.random.seed(42)
-random.seed(42)
+SEED = 42
 
-# Create output directory
-output_dir = 'data/raw_excel'
-os.makedirs(output_dir, exist_ok=True)
+# Base (scale 1) dataset
+BASE_STORES = 20
+BASE_PRODUCTS = 200
+BASE_CUSTOMERS = 1000
+END_YEAR = 2024
+
+# Excel sheet limit is 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
 
-# ==================== STORES DATA ====================
-print("Generating stores data...")
 cities = ['תל אביב', 'ירושלים', 'חיפה', 'באר שבע', 'אשדוד', 'נתניה', 'רמת גן', 'חולון']
 regions = ['מרכז', 'צפון', 'דרום', 'ירושלים']
 store_types = ['סניף', 'מרכז קניות', 'אונליין']
-
-stores_data = []
-for i in range(1, 21):  # 20 stores
-    stores_data.append({
-        'store_id': i,
-        'store_name': f'סניף {fake.company()}',
-        'city': random.choice(cities),
-        'region': random.choice(regions),
-        'store_type': random.choice(store_types),
-        'opening_date': fake.date_between(start_date='-5y', end_date='-1y')
-    })
-
-df_stores = pd.DataFrame(stores_data)
-df_stores.to_excel(f'{output_dir}/stores.xlsx', index=False)
-print(f"✓ Created stores.xlsx with {len(df_stores)} stores")
-
-# ==================== PRODUCTS DATA ====================
-print("Generating products data...")
 categories = ['אלקטרוניקה', 'ביגוד', 'מזון', 'ספרים', 'צעצועים', 'בית וגן', 'ספורט', 'יופי']
 brands = {
     'אלקטרוניקה': ['סמסונג', 'אפל', 'סוני', 'LG'],
@@ -54,151 +42,275 @@ brands = {
     'ספורט': ['נייקי', 'אדידס', 'פומה', 'ריבוק'],
     'יופי': ['לוריאל', 'אוליאה', 'ריבון', 'MAC']
 }
+# Price based on category
+price_ranges = {
+    'אלקטרוניקה': (200, 5000),
+    'ביגוד': (50, 500),
+    'מזון': (10, 150),
+    'ספרים': (30, 200),
+    'צעצועים': (50, 800),
+    'בית וגן': (100, 2000),
+    'ספורט': (100, 1500),
+    'יופי': (30, 400)
+}
+genders = ['זכר', 'נקבה']
+age_groups = ['18-25', '26-35', '36-45', '46-55', '56+']
+
+FILE_EXTENSIONS = {'excel': 'xlsx', 'parquet': 'parquet', 'csv': 'csv'}
+SOURCE_NAMES = ['stores', 'products', 'customers', 'sales_raw']
 
-products_data = []
-for i in range(1, 201):  # 200 products
-    category = random.choice(categories)
-    brand = random.choice(brands[category])
-    
-    # Price based on category
-    price_ranges = {
-        'אלקטרוניקה': (200, 5000),
-        'ביגוד': (50, 500),
-        'מזון': (10, 150),
-        'ספרים': (30, 200),
-        'צעצועים': (50, 800),
-        'בית וגן': (100, 2000),
-        'ספורט': (100, 1500),
-        'יופי': (30, 400)
-    }
-    
-    min_price, max_price = price_ranges[category]
-    price = round(random.uniform(min_price, max_price), 2)
-    cost = round(price * random.uniform(0.4, 0.7), 2)  # Cost is 40-70% of price
-    
-    products_data.append({
-        'product_id': i,
-        'product_name': f'{brand} {fake.word()}',
-        'category': category,
-        'brand': brand,
+# Faker output is sampled from pools so dimension size does not scale Faker calls
+NAME_POOL_SIZE = 5000
+
+
+def faker_pool(fake, method, size):
+    return np.array([getattr(fake, method)() for _ in range(size)], dtype=object)
+
+
+# ==================== STORES DATA ====================
+def generate_stores(fake, rng, n_stores):
+    print("Generating stores data...")
+    company_pool = faker_pool(fake, 'company', min(n_stores, NAME_POOL_SIZE))
+    opening_offsets = rng.integers(365, 5 * 365, n_stores)
+    return pd.DataFrame({
+        'store_id': np.arange(1, n_stores + 1),
+        'store_name': ['סניף ' + name for name in rng.choice(company_pool, n_stores)],
+        'city': rng.choice(cities, n_stores),
+        'region': rng.choice(regions, n_stores),
+        'store_type': rng.choice(store_types, n_stores),
+        'opening_date': (pd.Timestamp.today().normalize() - pd.to_timedelta(opening_offsets, unit='D')).date
+    })
+
+
+# ==================== PRODUCTS DATA ====================
+def generate_products(fake, rng, n_products):
+    print("Generating products data...")
+    product_categories = rng.choice(categories, n_products)
+    product_brands = np.array([brands[category][i] for category, i in
+                               zip(product_categories, rng.integers(0, 4, n_products))], dtype=object)
+    min_price = np.array([price_ranges[c][0] for c in product_categories])
+    max_price = np.array([price_ranges[c][1] for c in product_categories])
+
+    price = np.round(rng.uniform(min_price, max_price), 2)
+    cost = np.round(price * rng.uniform(0.4, 0.7, n_products), 2)  # Cost is 40-70% of price
+    word_pool = faker_pool(fake, 'word', min(n_products, NAME_POOL_SIZE))
+
+    return pd.DataFrame({
+        'product_id': np.arange(1, n_products + 1),
+        'product_name': [f'{brand} {word}' for brand, word in zip(product_brands, rng.choice(word_pool, n_products))],
+        'category': product_categories,
+        'brand': product_brands,
         'price': price,
         'cost': cost
     })
 
-df_products = pd.DataFrame(products_data)
-df_products.to_excel(f'{output_dir}/products.xlsx', index=False)
-print(f"✓ Created products.xlsx with {len(df_products)} products")
 
 # ==================== CUSTOMERS DATA ====================
-print("Generating customers data...")
-customers_data = []
-genders = ['זכר', 'נקבה']
-age_groups = ['18-25', '26-35', '36-45', '46-55', '56+']
-
-for i in range(1, 1001):  # 1000 customers
-    gender = random.choice(genders)
-    age = random.randint(18, 75)
-    
+def generate_customers(fake, rng, n_customers):
+    print("Generating customers data...")
+    age = rng.integers(18, 76, n_customers)
     # Determine age group
-    if age <= 25:
-        age_group = '18-25'
-    elif age <= 35:
-        age_group = '26-35'
-    elif age <= 45:
-        age_group = '36-45'
-    elif age <= 55:
-        age_group = '46-55'
-    else:
-        age_group = '56+'
-    
-    customers_data.append({
-        'customer_id': i,
-        'customer_name': fake.name(),
-        'gender': gender,
+    age_group = np.select(
+        [age <= 25, age <= 35, age <= 45, age <= 55],
+        age_groups[:4],
+        default=age_groups[4]
+    )
+    name_pool = faker_pool(fake, 'name', min(n_customers, NAME_POOL_SIZE))
+    email_pool = faker_pool(fake, 'email', min(n_customers, NAME_POOL_SIZE))
+
+    return pd.DataFrame({
+        'customer_id': np.arange(1, n_customers + 1),
+        'customer_name': rng.choice(name_pool, n_customers),
+        'gender': rng.choice(genders, n_customers),
         'age': age,
         'age_group': age_group,
-        'email': fake.email(),
-        'city': random.choice(cities)
+        'email': rng.choice(email_pool, n_customers),
+        'city': rng.choice(cities, n_customers)
     })
 
-df_customers = pd.DataFrame(customers_data)
-df_customers.to_excel(f'{output_dir}/customers.xlsx', index=False)
-print(f"✓ Created customers.xlsx with {len(df_customers)} customers")
 
 # ==================== SALES DATA ====================
-print("Generating sales data...")
-start_date = datetime(2023, 1, 1)
-end_date = datetime(2024, 12, 31)
-
-sales_data = []
-sale_id = 1
-
-# Generate sales for 2 years
-current_date = start_date
-while current_date <= end_date:
-    # More sales on weekends and certain months (seasonality)
-    day_of_week = current_date.weekday()
-    month = current_date.month
-    
-    # Base number of sales per day
-    if day_of_week >= 5:  # Weekend
-        num_sales = random.randint(80, 150)
+def daily_sales_counts(rng, dates, scale):
+    """Number of sales per day: more on weekends, +30% in Q4, times the scale factor"""
+    weekend = dates.dayofweek >= 5
+    counts = np.where(weekend, rng.integers(80, 151, len(dates)), rng.integers(50, 101, len(dates)))
+    counts = np.where(dates.quarter == 4, (counts * 1.3).astype(np.int64), counts)
+    return np.maximum(1, np.round(counts * scale)).astype(np.int64)
+
+
+def plan_shards(dates, counts, shard_rows):
+    """Split the calendar into shards of whole days that never cross a month and hold <= shard_rows sales"""
+    shards = []
+    start = 0
+    rows = 0
+    for i in range(len(dates)):
+        new_month = i > start and (dates[i].month != dates[start].month)
+        if i > start and (new_month or rows + counts[i] > shard_rows):
+            shards.append((start, i))
+            start, rows = i, 0
+        rows += counts[i]
+    shards.append((start, len(dates)))
+    return shards
+
+
+def generate_sales_shard(shard_index, day_values, day_counts, first_sale_id, prices, costs,
+                         n_stores, n_customers, path=None, file_format=None):
+    """Generate one shard of sales as arrays (runs in a worker process).
+
+    Writes the shard to path when given, otherwise returns the DataFrame.
+    """
+    rng = np.random.default_rng([SEED, shard_index])
+    n = int(day_counts.sum())
+
+    product_idx = rng.integers(0, len(prices), n)
+    quantity = rng.integers(1, 6, n)  # Quantity (1-5 items)
+    revenue = np.round(prices[product_idx] * quantity, 2)
+    total_cost = np.round(costs[product_idx] * quantity, 2)
+
+    # Add some randomness to sale time during the day (08:00-20:59)
+    minutes = rng.integers(8, 21, n) * 60 + rng.integers(0, 60, n)
+    sale_date = np.repeat(day_values, day_counts) + minutes.astype('timedelta64[m]')
+
+    df_sales = pd.DataFrame({
+        'sale_id': np.arange(first_sale_id, first_sale_id + n, dtype=np.int64),
+        'sale_date': sale_date,
+        'store_id': rng.integers(1, n_stores + 1, n),
+        'product_id': product_idx + 1,
+        'customer_id': rng.integers(1, n_customers + 1, n),
+        'quantity': quantity,
+        'revenue': revenue,
+        'cost': total_cost,
+        'profit': np.round(revenue - total_cost, 2)
+    })
+
+    if path is None:
+        return df_sales
+    write_frame(df_sales, path, file_format)
+    return n
+
+
+def remove_previous_output(output_dir):
+    """Delete generated files of every format so the ETL's format auto-detection sees only this run"""
+    sales_dir = os.path.join(output_dir, 'sales_raw')
+    if os.path.isdir(sales_dir):
+        shutil.rmtree(sales_dir)
+    for name in SOURCE_NAMES:
+        for extension in FILE_EXTENSIONS.values():
+            path = os.path.join(output_dir, f'{name}.{extension}')
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def write_frame(df, path, file_format):
+    if file_format == 'parquet':
+        df.to_parquet(path, index=False)
+    elif file_format == 'csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+
+
+def generate_sales(df_products, n_stores, n_customers, dates, scale, output_dir, file_format, shard_rows, workers):
+    print("Generating sales data...")
+    rng = np.random.default_rng(SEED)
+    counts = daily_sales_counts(rng, dates, scale)
+    shards = plan_shards(dates, counts, shard_rows)
+    total_rows = int(counts.sum())
+
+    if file_format == 'excel' and total_rows > EXCEL_MAX_ROWS:
+        raise SystemExit(f"✗ {total_rows:,} sales do not fit in one Excel sheet - use --format parquet or csv")
+
+    prices = df_products['price'].to_numpy()
+    costs = df_products['cost'].to_numpy()
+    day_values = dates.values.astype('datetime64[m]')
+    first_ids = np.concatenate([[1], np.cumsum(counts)[:-1] + 1])
+
+    sales_dir = None
+    if file_format != 'excel':
+        sales_dir = os.path.join(output_dir, 'sales_raw')
+        extension = FILE_EXTENSIONS[file_format]
+
+    started = time.perf_counter()
+    frames = []
+    rows_written = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for shard_index, (start, end) in enumerate(shards):
+            path = None
+            if sales_dir:
+                # Partitioned by month: sales_raw/month=2024-01/part-00000.parquet
+                partition_dir = os.path.join(sales_dir, f"month={dates[start].strftime('%Y-%m')}")
+                os.makedirs(partition_dir, exist_ok=True)
+                path = os.path.join(partition_dir, f'part-{shard_index:05d}.{extension}')
+            futures.append(executor.submit(
+                generate_sales_shard, shard_index, day_values[start:end], counts[start:end],
+                int(first_ids[start]), prices, costs, n_stores, n_customers, path, file_format
+            ))
+        for future in futures:
+            result = future.result()
+            if sales_dir:
+                rows_written += result
+            else:
+                frames.append(result)
+                rows_written += len(result)
+            # Progress indicator
+            print(f"  Generated {rows_written:,}/{total_rows:,} sales...")
+
+    elapsed = time.perf_counter() - started
+    print(f"  {total_rows / max(elapsed, 1e-6):,.0f} rows/sec with {workers} workers")
+
+    if sales_dir:
+        print(f"✓ Created {len(shards)} {file_format} shards in {sales_dir}/ with {total_rows:,} sales transactions")
     else:
-        num_sales = random.randint(50, 100)
-    
-    # Seasonal adjustment (Q4 has more sales)
-    if month in [10, 11, 12]:
-        num_sales = int(num_sales * 1.3)
-    
-    for _ in range(num_sales):
-        store_id = random.randint(1, 20)
-        product_id = random.randint(1, 200)
-        customer_id = random.randint(1, 1000)
-        
-        # Get product price
-        product = df_products[df_products['product_id'] == product_id].iloc[0]
-        price = product['price']
-        cost = product['cost']
-        
-        # Quantity (1-5 items)
-        quantity = random.randint(1, 5)
-        
-        revenue = round(price * quantity, 2)
-        total_cost = round(cost * quantity, 2)
-        profit = round(revenue - total_cost, 2)
-        
-        # Add some randomness to sale time during the day
-        sale_time = current_date + timedelta(
-            hours=random.randint(8, 20),
-            minutes=random.randint(0, 59)
-        )
-        
-        sales_data.append({
-            'sale_id': sale_id,
-            'sale_date': sale_time,
-            'store_id': store_id,
-            'product_id': product_id,
-            'customer_id': customer_id,
-            'quantity': quantity,
-            'revenue': revenue,
-            'cost': total_cost,
-            'profit': profit
-        })
-        
-        sale_id += 1
-    
-    current_date += timedelta(days=1)
-    
-    # Progress indicator
-    if sale_id % 10000 == 0:
-        print(f"  Generated {sale_id} sales...")
-
-df_sales = pd.DataFrame(sales_data)
-df_sales.to_excel(f'{output_dir}/sales_raw.xlsx', index=False)
-print(f"✓ Created sales_raw.xlsx with {len(df_sales)} sales transactions")
-
-print("\n" + "="*50)
-print("Data generation completed successfully!")
-print(f"All files saved to: {output_dir}/")
-print("="*50)
+        df_sales = pd.concat(frames, ignore_index=True)
+        df_sales.to_excel(f'{output_dir}/sales_raw.xlsx', index=False)
+        print(f"✓ Created sales_raw.xlsx with {len(df_sales):,} sales transactions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic retail data')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplies stores, products, customers and sales per day (default: 1)')
+    parser.add_argument('--years', type=int, default=2, help=f'years of sales ending {END_YEAR}-12-31 (default: 2)')
+    parser.add_argument('--format', choices=['excel', 'parquet', 'csv'], default='excel', dest='file_format',
+                        help='output format; parquet/csv write sales as month-partitioned shards (default: excel)')
+    parser.add_argument('--output-dir', default='data/raw_excel')
+    parser.add_argument('--shard-rows', type=int, default=5_000_000, help='max sales rows per shard')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='parallel shard writers')
+    args = parser.parse_args()
+
+    # Initialize Faker
+    fake = Faker('he_IL')  # Hebrew locale
+    Faker.seed(SEED)
+    rng = np.random.default_rng(SEED)
+
+    # Create output directory
+    output_dir = args.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+    remove_previous_output(output_dir)
+    extension = FILE_EXTENSIONS[args.file_format]
+
+    n_stores = max(1, round(BASE_STORES * args.scale))
+    n_products = max(1, round(BASE_PRODUCTS * args.scale))
+    n_customers = max(1, round(BASE_CUSTOMERS * args.scale))
+
+    for name, df in [('stores', generate_stores(fake, rng, n_stores)),
+                     ('products', generate_products(fake, rng, n_products)),
+                     ('customers', generate_customers(fake, rng, n_customers))]:
+        write_frame(df, f'{output_dir}/{name}.{extension}', args.file_format)
+        print(f"✓ Created {name}.{extension} with {len(df):,} {name}")
+        if name == 'products':
+            df_products = df
+
+    dates = pd.date_range(f'{END_YEAR - args.years + 1}-01-01', f'{END_YEAR}-12-31', freq='D')
+    generate_sales(df_products, n_stores, n_customers, dates, args.scale, output_dir,
+                   args.file_format, args.shard_rows, max(1, args.workers))
+
+    print("\n" + "="*50)
+    print("Data generation completed successfully!")
+    print(f"All files saved to: {output_dir}/")
+    print("="*50)
+
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""
+Sales Anomaly Detection for the Retail BI ETL
+Keeps day-of-week aware EWMA baselines (mean / variance of daily revenue) per
+store x category in anomaly_baselines, scores only the days each load added,
+stores the anomalies in sales_anomalies and emits notifications for recent
+store-level and chain-level anomalies
+"""
+
+from datetime import timedelta
+import os
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+
+# Each weekday is updated once a week, so alpha 0.2 weighs roughly the last 5 same weekdays
+EWMA_ALPHA = float(os.environ.get('ANOMALY_EWMA_ALPHA', 0.2))
+Z_THRESHOLD = float(os.environ.get('ANOMALY_Z_THRESHOLD', 3.0))
+CRITICAL_Z = float(os.environ.get('ANOMALY_CRITICAL_Z', 4.5))
+# Observations of a weekday needed before it is scored
+MIN_HISTORY = int(os.environ.get('ANOMALY_MIN_HISTORY', 4))
+# Floor of the standard deviation relative to the expected revenue (flat series)
+MIN_STD_RATIO = 0.05
+# Only anomalies this close to the newest loaded day become notifications
+NOTIFY_DAYS = int(os.environ.get('ANOMALY_NOTIFY_DAYS', 7))
+WRITE_BATCH_SIZE = 1000
+
+# Same slice convention as forecast_results
+ALL_STORES = 0
+ALL_CATEGORIES = 'ALL'
+SLICE_KEYS = ['store_id', 'category']
+BASELINE_KEYS = SLICE_KEYS + ['day_of_week']
+STATE_KEY = 'anomaly_last_date_id'
+
+
+def fetch_frame(cursor, query, params=None):
+    cursor.execute(query, params)
+    return pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+
+
+def fetch_daily_sales(cursor, after_date_id):
+    """Daily revenue per store x category from the rollup, for days after after_date_id"""
+    df = fetch_frame(cursor, """
+        SELECT a.date_id, d.date AS sale_date, a.store_id, p.category, SUM(a.revenue) AS revenue
+        FROM agg_sales_daily_store_product a
+        JOIN dim_date d ON a.date_id = d.date_id
+        JOIN dim_product p ON a.product_id = p.product_id
+        WHERE a.date_id > %s
+        GROUP BY a.date_id, d.date, a.store_id, p.category
+    """, (after_date_id,))
+    df['revenue'] = df['revenue'].astype(float)
+    return df
+
+
+def fill_missing_days(daily, known_slices=None, first_day=None):
+    """Add zero-revenue rows for the days a store x category had no sales.
+
+    The rollup only has rows for days with sales, so a store outage would
+    never be scored. Each slice is reindexed over the calendar from its first
+    sale (or from first_day if it already has a baseline) to the newest day.
+    """
+    daily = daily.assign(sale_date=pd.to_datetime(daily['sale_date']).dt.normalize())
+    last_day = daily['sale_date'].max()
+    first_day = pd.Timestamp(first_day) if first_day is not None else daily['sale_date'].min()
+
+    starts = daily.groupby(SLICE_KEYS, as_index=False)['sale_date'].min()
+    if known_slices is not None and not known_slices.empty:
+        starts = pd.concat([starts, known_slices[SLICE_KEYS].assign(sale_date=first_day)], ignore_index=True)
+        starts = starts.groupby(SLICE_KEYS, as_index=False)['sale_date'].min()
+
+    calendar = pd.DataFrame({'day': pd.date_range(min(first_day, starts['sale_date'].min()), last_day, freq='D')})
+    grid = starts.merge(calendar, how='cross')
+    grid = grid.loc[grid['day'] >= grid['sale_date'], SLICE_KEYS + ['day']].rename(columns={'day': 'sale_date'})
+
+    filled = grid.merge(daily.drop(columns='date_id'), on=SLICE_KEYS + ['sale_date'], how='left')
+    filled['revenue'] = filled['revenue'].fillna(0.0)
+    filled['date_id'] = filled['sale_date'].dt.strftime('%Y%m%d').astype(np.int64)
+    filled['sale_date'] = filled['sale_date'].dt.date
+    return filled[['date_id', 'sale_date', 'store_id', 'category', 'revenue']]
+
+
+def add_rollup_levels(df):
+    """Add all-category, all-store and chain-total rows to store x category daily sales"""
+    day_cols = ['date_id', 'sale_date']
+    per_store = df.groupby(day_cols + ['store_id'], as_index=False)['revenue'].sum().assign(category=ALL_CATEGORIES)
+    per_category = df.groupby(day_cols + ['category'], as_index=False)['revenue'].sum().assign(store_id=ALL_STORES)
+    total = df.groupby(day_cols, as_index=False)['revenue'].sum().assign(store_id=ALL_STORES, category=ALL_CATEGORIES)
+    return pd.concat([df, per_store, per_category, total], ignore_index=True)
+
+
+def score_days(baselines, daily):
+    """Score daily revenue against the baselines, then fold each day into them.
+
+    Days are processed in date order; within a day every baseline key occurs
+    at most once, so each day is one vectorized step over all keys.
+    Returns (updated baselines, anomalies).
+    """
+    daily = daily.sort_values('date_id', kind='stable').reset_index(drop=True)
+    daily['day_of_week'] = pd.to_datetime(daily['sale_date']).dt.dayofweek
+
+    state = baselines.set_index(BASELINE_KEYS)
+    row_keys = pd.MultiIndex.from_frame(daily[BASELINE_KEYS])
+    keys = state.index.append(row_keys).unique()
+    state = state.reindex(keys)
+    mean = state['mean_revenue'].fillna(0).to_numpy(dtype=float, copy=True)
+    var = state['var_revenue'].fillna(0).to_numpy(dtype=float, copy=True)
+    observations = state['observations'].fillna(0).to_numpy(dtype=np.int64, copy=True)
+    last_date_id = state['last_date_id'].fillna(0).to_numpy(dtype=np.int64, copy=True)
+
+    positions = keys.get_indexer(row_keys)
+    revenue = daily['revenue'].to_numpy(dtype=float)
+    date_ids = daily['date_id'].to_numpy(dtype=np.int64)
+    expected = np.empty(len(daily))
+    std = np.empty(len(daily))
+    history = np.empty(len(daily), dtype=np.int64)
+
+    _, starts = np.unique(date_ids, return_index=True)
+    for start, end in zip(starts, list(starts[1:]) + [len(daily)]):
+        pos = positions[start:end]
+        x = revenue[start:end]
+        expected[start:end] = mean[pos]
+        std[start:end] = np.sqrt(var[pos])
+        history[start:end] = observations[pos]
+
+        # EWMA mean / variance; the first observations average equally until 1/n < alpha
+        weight = np.maximum(EWMA_ALPHA, 1.0 / (observations[pos] + 1))
+        diff = x - mean[pos]
+        increment = weight * diff
+        mean[pos] += increment
+        var[pos] = (1 - weight) * (var[pos] + diff * increment)
+        observations[pos] += 1
+        last_date_id[pos] = date_ids[start]
+
+    scale = np.maximum(std, MIN_STD_RATIO * np.abs(expected))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_score = np.where(scale > 0, (revenue - expected) / scale, 0.0)
+        deviation = np.where(expected > 0, (revenue - expected) / expected * 100, 0.0)
+    flagged = (history >= MIN_HISTORY) & (np.abs(z_score) > Z_THRESHOLD)
+
+    anomalies = daily.loc[flagged, ['store_id', 'category', 'date_id', 'sale_date', 'revenue']].assign(
+        expected_revenue=expected[flagged],
+        std_revenue=std[flagged],
+        z_score=z_score[flagged],
+        deviation_pct=deviation[flagged],
+        anomaly_type=np.where(z_score[flagged] > 0, 'high', 'low'),
+        severity=np.where(np.abs(z_score[flagged]) >= CRITICAL_Z, 'critical', 'warning')
+    )
+
+    updated = keys.to_frame(index=False).assign(
+        mean_revenue=mean, var_revenue=var, observations=observations, last_date_id=last_date_id
+    )
+    return updated, anomalies.reset_index(drop=True)
+
+
+def write_rows(cursor, table, df, updates):
+    """Multi-row INSERT ... ON DUPLICATE KEY UPDATE of a DataFrame"""
+    columns = list(df.columns)
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    for i in range(0, len(rows), WRITE_BATCH_SIZE):
+        batch = rows[i:i + WRITE_BATCH_SIZE]
+        cursor.execute(f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES {', '.join([placeholder] * len(batch))}
+            ON DUPLICATE KEY UPDATE {', '.join(f'{col} = VALUES({col})' for col in updates)}
+        """, [value for row in batch for value in row])
+
+
+def write_notifications(connection, cursor, notifications):
+    """Insert (type, title, message, severity, store_id) notifications in one transaction.
+
+    The ETL keeps this small writer instead of importing the web app's.
+    A notification is skipped while one with the same type, store and title
+    (which carries the date) is still unread.
+    """
+    stats = {'queued': len(notifications), 'inserted': 0, 'skipped_duplicates': 0}
+    if not notifications:
+        return stats
+    types = sorted({n[0] for n in notifications})
+    titles = sorted({n[1] for n in notifications})
+    try:
+        cursor.execute(f"""
+            SELECT type, store_id, title
+            FROM notifications
+            WHERE is_read = FALSE
+              AND type IN ({', '.join(['%s'] * len(types))})
+              AND title IN ({', '.join(['%s'] * len(titles))})
+        """, types + titles)
+        seen = {tuple(row) for row in cursor.fetchall()}
+        rows = []
+        for notification in notifications:
+            key = (notification[0], notification[4], notification[1])
+            if key in seen:
+                stats['skipped_duplicates'] += 1
+                continue
+            seen.add(key)
+            rows.append(list(notification))
+
+        for i in range(0, len(rows), WRITE_BATCH_SIZE):
+            batch = rows[i:i + WRITE_BATCH_SIZE]
+            cursor.execute(f"""
+                INSERT INTO notifications (type, title, message, severity, store_id)
+                VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(batch))}
+            """, [value for row in batch for value in row])
+        connection.commit()
+        stats['inserted'] = len(rows)
+    except Exception:
+        connection.rollback()
+        raise
+    return stats
+
+
+def notify_anomalies(connection, cursor, anomalies, latest_date):
+    """Notifications for recent store-level and chain-level anomalies (category slices are only stored)"""
+    if anomalies.empty:
+        return None
+    latest = pd.Timestamp(latest_date)
+    recent = anomalies[
+        (anomalies['category'] == ALL_CATEGORIES)
+        & (pd.to_datetime(anomalies['sale_date']) > latest - timedelta(days=NOTIFY_DAYS))
+    ]
+    if recent.empty:
+        return None
+
+    stores = fetch_frame(cursor, "SELECT store_id, store_name FROM dim_store")
+    store_names = dict(zip(stores['store_id'], stores['store_name']))
+    # Deduped by title (it carries the date): one open notification per store and day
+    notifications = []
+    for row in recent.itertuples(index=False):
+        date_label = pd.Timestamp(row.sale_date).strftime('%Y-%m-%d')
+        scope = f'בסניף {store_names.get(row.store_id, row.store_id)}' if row.store_id != ALL_STORES else 'בכל הרשת'
+        direction = 'גבוהות' if row.anomaly_type == 'high' else 'נמוכות'
+        notifications.append((
+            'anomaly',
+            f'אנומליה במכירות {scope} - {date_label}',
+            f'הכנסות {direction} מהצפוי {scope} ב-{date_label}: ₪{row.revenue:,.0f} '
+            f'לעומת ₪{row.expected_revenue:,.0f} צפוי ({row.deviation_pct:+.1f}%).',
+            row.severity,
+            None if row.store_id == ALL_STORES else int(row.store_id)
+        ))
+    return write_notifications(connection, cursor, notifications)
+
+
+def update_anomaly_baselines(connection, rebuild=False):
+    """Fold the days loaded since the last run into the baselines and record anomalies.
+
+    rebuild=True (full reloads) drops the baselines and replays the whole
+    history. Sales loaded later for days that were already scored do not
+    change their baselines until the next rebuild.
+    """
+    print("\n" + "="*50)
+    print("UPDATING ANOMALY BASELINES")
+    print("="*50)
+
+    try:
+        cursor = connection.cursor()
+        if rebuild:
+            cursor.execute("DELETE FROM anomaly_baselines")
+            cursor.execute("DELETE FROM sales_anomalies")
+            after_date_id = 0
+        else:
+            cursor.execute("SELECT state_value FROM etl_state WHERE state_key = %s", (STATE_KEY,))
+            row = cursor.fetchone()
+            after_date_id = int(row[0]) if row else 0
+
+        daily = fetch_daily_sales(cursor, after_date_id)
+        if daily.empty:
+            connection.commit()
+            cursor.close()
+            print("  ✓ No new days to score")
+            return
+
+        baselines = fetch_frame(cursor, """
+            SELECT store_id, category, day_of_week, mean_revenue, var_revenue, observations, last_date_id
+            FROM anomaly_baselines
+        """)
+        # Days without sales are scored as zero revenue (outages)
+        known_slices = baselines[(baselines['store_id'] != ALL_STORES) & (baselines['category'] != ALL_CATEGORIES)]
+        first_day = pd.to_datetime(str(after_date_id), format='%Y%m%d') + timedelta(days=1) if after_date_id else None
+        daily = add_rollup_levels(fill_missing_days(daily, known_slices, first_day))
+        baselines, anomalies = score_days(baselines, daily)
+        touched = baselines[baselines['last_date_id'] > after_date_id]
+
+        write_rows(cursor, 'anomaly_baselines', touched,
+                   ['mean_revenue', 'var_revenue', 'observations', 'last_date_id'])
+        if not anomalies.empty:
+            write_rows(cursor, 'sales_anomalies', anomalies,
+                       ['revenue', 'expected_revenue', 'std_revenue', 'z_score', 'deviation_pct', 'anomaly_type', 'severity'])
+        cursor.execute("""
+            INSERT INTO etl_state (state_key, state_value)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE state_value = VALUES(state_value)
+        """, (STATE_KEY, str(int(daily['date_id'].max()))))
+        connection.commit()
+        print(f"  ✓ Scored {daily['date_id'].nunique()} days across {len(touched)} baselines: "
+              f"{len(anomalies)} anomalies")
+
+        try:
+            stats = notify_anomalies(connection, cursor, anomalies, daily['sale_date'].max())
+            if stats:
+                print(f"  ✓ Anomaly notifications: {stats['inserted']} created, {stats['skipped_duplicates']} already open")
+        except Error as e:
+            print(f"  ⚠ Could not write anomaly notifications: {e}")
+        cursor.close()
+    except Error as e:
+        connection.rollback()
+        print(f"✗ Error updating anomaly baselines: {e}")
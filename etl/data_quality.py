@@ -0,0 +1,222 @@
+"""
+Data Quality Engine for the Retail BI ETL
+Evaluates row-level rules in one vectorized mask pass per table, checks tables
+concurrently and persists the results to etl_quality_runs
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from mysql.connector import Error
+
+SAMPLE_ROWS = 5
+
+# Row-level rules: (name, description, function(df) -> boolean Series of violating rows)
+# Comparisons are negated so rows with missing values also count as violations.
+SALES_RULES = [
+    ('invalid_sale_date', 'sale_date missing or not a valid date', lambda df: df['sale_date'].isna()),
+    ('non_positive_revenue', 'revenue must be positive', lambda df: ~(df['revenue'] > 0)),
+    ('non_positive_quantity', 'quantity must be positive', lambda df: ~(df['quantity'] > 0)),
+    ('profit_exceeds_revenue', 'profit must not exceed revenue', lambda df: ~(df['profit'] <= df['revenue']))
+]
+
+# Table name -> (key column, row-level rules)
+TABLE_CHECKS = {
+    'Stores': ('store_id', []),
+    'Products': ('product_id', []),
+    'Customers': ('customer_id', []),
+    'Sales': ('sale_id', SALES_RULES)
+}
+
+
+def sample_rows(df, mask):
+    """Up to SAMPLE_ROWS offending rows as JSON-ready dicts"""
+    positions = np.flatnonzero(mask)[:SAMPLE_ROWS]
+    if len(positions) == 0:
+        return []
+    return json.loads(df.iloc[positions].to_json(orient='records', date_format='iso'))
+
+
+def check_table(name, df, key_col, rules):
+    """Evaluate the duplicate-key check and every rule of a table in one mask pass.
+
+    Returns per-rule counts and samples plus the boolean keep mask.
+    """
+    duplicate_mask = df.duplicated(subset=[key_col], keep='first').to_numpy()
+    rule_masks = [rule(df).to_numpy(dtype=bool) for _, _, rule in rules]
+    if rule_masks:
+        rule_violations = np.logical_or.reduce(rule_masks)
+    else:
+        rule_violations = np.zeros(len(df), dtype=bool)
+
+    missing = df.isna().sum()
+    result = {
+        'table': name,
+        'rows': len(df),
+        'missing_values': {col: int(count) for col, count in missing[missing > 0].items()},
+        'duplicates': int(duplicate_mask.sum()),
+        'duplicate_samples': sample_rows(df, duplicate_mask),
+        'rules': {
+            rule_name: {
+                'description': description,
+                'count': int(mask.sum()),
+                'samples': sample_rows(df, mask)
+            }
+            for (rule_name, description, _), mask in zip(rules, rule_masks)
+        },
+        # Rows removed by rules (duplicates are reported separately, as before)
+        'rows_removed_by_rules': int((rule_violations & ~duplicate_mask).sum())
+    }
+    return result, ~(duplicate_mask | rule_violations)
+
+
+def revenue_outliers(df_sales):
+    """IQR revenue outliers (reported, not removed)"""
+    if df_sales.empty or 'revenue' not in df_sales.columns:
+        return {'count': 0, 'percentage': 0}
+    q1, q3 = df_sales['revenue'].quantile([0.25, 0.75])
+    iqr = q3 - q1
+    lower_bound, upper_bound = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    count = int(((df_sales['revenue'] < lower_bound) | (df_sales['revenue'] > upper_bound)).sum())
+    return {
+        'count': count,
+        'percentage': count / len(df_sales) * 100,
+        'lower_bound': float(lower_bound),
+        'upper_bound': float(upper_bound)
+    }
+
+
+def run_quality_checks(frames, max_workers=4):
+    """Check every table concurrently and drop offending rows (one filter per table).
+
+    frames maps a TABLE_CHECKS name to its DataFrame. Returns the cleaned
+    frames and the quality report.
+    """
+    if 'Sales' in frames:
+        frames['Sales']['sale_date'] = pd.to_datetime(frames['Sales']['sale_date'], errors='coerce')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            name: executor.submit(check_table, name, df, *TABLE_CHECKS[name])
+            for name, df in frames.items()
+        }
+        checked = {name: future.result() for name, future in futures.items()}
+
+    cleaned = {}
+    tables = {}
+    for name, (result, keep) in checked.items():
+        df = frames[name]
+        cleaned[name] = df if keep.all() else df[keep]
+        tables[name] = result
+
+    report = {'tables': tables}
+    if 'Sales' in cleaned:
+        report['outliers'] = {'Sales': revenue_outliers(cleaned['Sales'])}
+    return cleaned, finalize_report(report)
+
+
+def merge_table_results(total, result):
+    """Add one chunk's check_table result to running totals (streaming validation)"""
+    if total is None:
+        return result
+    total['rows'] += result['rows']
+    total['duplicates'] += result['duplicates']
+    total['duplicate_samples'] = (total['duplicate_samples'] + result['duplicate_samples'])[:SAMPLE_ROWS]
+    total['rows_removed_by_rules'] += result['rows_removed_by_rules']
+    for col, count in result['missing_values'].items():
+        total['missing_values'][col] = total['missing_values'].get(col, 0) + count
+    for rule_name, rule in result['rules'].items():
+        rule_total = total['rules'][rule_name]
+        rule_total['count'] += rule['count']
+        rule_total['samples'] = (rule_total['samples'] + rule['samples'])[:SAMPLE_ROWS]
+    return total
+
+
+def finalize_report(report):
+    """Add the score inputs (legacy quality_report layout), totals and the score"""
+    tables = report['tables']
+    report['missing_values'] = {name: t['missing_values'] for name, t in tables.items()}
+    report['duplicates'] = {name: t['duplicates'] for name, t in tables.items()}
+    report.setdefault('outliers', {})
+    report['business_rules'] = {'total_removed': sum(t['rows_removed_by_rules'] for t in tables.values())}
+    report['rows_checked'] = sum(t['rows'] for t in tables.values())
+    report['rows_removed'] = sum(t['duplicates'] + t['rows_removed_by_rules'] for t in tables.values())
+    report['score'] = round(calculate_quality_score(report), 2)
+    return report
+
+
+def calculate_quality_score(quality_report):
+    """Calculate overall data quality score (0-100)"""
+    score = 100
+
+    # Deduct points for missing values
+    for table, missing in quality_report['missing_values'].items():
+        if missing:
+            score -= min(20, sum(missing.values()) * 0.1)
+
+    # Deduct points for duplicates
+    for table, dup_count in quality_report['duplicates'].items():
+        if dup_count > 0:
+            score -= min(15, dup_count * 0.1)
+
+    # Deduct points for outliers (if excessive)
+    if 'Sales' in quality_report['outliers']:
+        outlier_pct = quality_report['outliers']['Sales'].get('percentage', 0)
+        if outlier_pct > 5:  # More than 5% outliers
+            score -= min(10, (outlier_pct - 5) * 0.5)
+
+    # Deduct points for business rule violations
+    total_removed = quality_report['business_rules'].get('total_removed', 0)
+    if total_removed > 0:
+        score -= min(15, total_removed * 0.01)
+
+    return max(0, score)
+
+
+def print_quality_report(report):
+    """Console summary of a quality report"""
+    for name, table in report['tables'].items():
+        if table['missing_values']:
+            print(f"  ⚠ {name} - Missing values found:")
+            for col, count in table['missing_values'].items():
+                print(f"    - {col}: {count} ({count / max(table['rows'], 1) * 100:.1f}%)")
+        if table['duplicates']:
+            print(f"  ⚠ {name} - Found {table['duplicates']} duplicate keys")
+        for rule_name, rule in table['rules'].items():
+            if rule['count']:
+                print(f"  ⚠ {name} - {rule['count']} rows violate {rule_name} ({rule['description']})")
+        if not (table['missing_values'] or table['duplicates'] or any(r['count'] for r in table['rules'].values())):
+            print(f"  ✓ {name} - {table['rows']:,} rows, all checks passed")
+
+    outliers = report['outliers'].get('Sales')
+    if outliers and outliers['count']:
+        print(f"  ⚠ Sales - Found {outliers['count']} revenue outliers ({outliers['percentage']:.1f}%)")
+
+    print("\n" + "-"*50)
+    print("DATA QUALITY SUMMARY")
+    print("-"*50)
+    print(f"Rows checked: {report['rows_checked']:,}, removed: {report['rows_removed']:,}")
+    print(f"Data quality score: {report['score']:.1f}%")
+    print("-"*50)
+
+
+def save_quality_run(connection, report, load_mode):
+    """Persist a quality report to etl_quality_runs (read by /api/data-quality)"""
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO etl_quality_runs (load_mode, quality_score, rows_checked, rows_removed, report)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (
+            load_mode,
+            report['score'],
+            report['rows_checked'],
+            report['rows_removed'],
+            json.dumps(report, default=str)
+        ))
+        connection.commit()
+        cursor.close()
+        print(f"  ✓ Saved quality report to etl_quality_runs")
+    except Error as e:
+        print(f"  ⚠ Could not save quality report: {e}")
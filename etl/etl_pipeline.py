@@ -1,6 +1,6 @@
 """
 ETL Pipeline for Retail BI Project
-Extracts data from Excel, transforms it, and loads into Data Warehouse
+Extracts data from Excel / CSV / Parquet files, transforms it, and loads into Data Warehouse
 """
 
 import pandas as pd
@@ -9,12 +9,87 @@ from datetime import datetime
 import mysql.connector
 from mysql.connector import Error
 import os
-from sqlalchemy import create_engine
+import argparse
+import csv
+import glob
+import hashlib
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import load_workbook
+from data_quality import (
+    TABLE_CHECKS, check_table, run_quality_checks, merge_table_results,
+    finalize_report, print_quality_report, save_quality_run
+)
+from anomaly_detection import update_anomaly_baselines
+from sqlalchemy import create_engine, text, bindparam
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import pyarrow  # noqa: F401 - Parquet engine for the staging cache
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
 # Configuration
 EXCEL_DIR = 'data/raw_excel'
+# Source base names in EXCEL_DIR: <base>.xlsx|.csv|.parquet or a <base>/ directory
+# of part files (e.g. sales_raw/month=2024-01/part-00000.parquet)
+SOURCE_FILES = {
+    'stores': 'stores',
+    'products': 'products',
+    'customers': 'customers',
+    'sales': 'sales_raw'
+}
+# 'auto' picks the first format found, in this order
+SOURCE_FORMATS = ['parquet', 'csv', 'excel']
+SOURCE_FORMAT = os.environ.get('ETL_SOURCE_FORMAT', 'auto')
+FORMAT_EXTENSIONS = {'parquet': '.parquet', 'csv': '.csv', 'excel': '.xlsx'}
+
+# Typed column schemas enforced on read, whatever the source format
+SOURCE_SCHEMAS = {
+    'stores': {
+        'store_id': 'int', 'store_name': 'string', 'city': 'string',
+        'region': 'string', 'store_type': 'string', 'opening_date': 'datetime'
+    },
+    'products': {
+        'product_id': 'int', 'product_name': 'string', 'category': 'string',
+        'brand': 'string', 'price': 'float', 'cost': 'float'
+    },
+    'customers': {
+        'customer_id': 'int', 'customer_name': 'string', 'gender': 'string',
+        'age': 'int', 'age_group': 'string', 'email': 'string', 'city': 'string'
+    },
+    'sales': {
+        'sale_id': 'int', 'sale_date': 'datetime', 'store_id': 'int', 'product_id': 'int',
+        'customer_id': 'int', 'quantity': 'int', 'revenue': 'float', 'cost': 'float', 'profit': 'float'
+    }
+}
+STAGING_CACHE_DIR = os.environ.get('ETL_STAGING_CACHE_DIR', 'data/.staging_cache')
+EXTRACT_WORKERS = int(os.environ.get('ETL_EXTRACT_WORKERS', len(SOURCE_FILES)))
+STREAM_CHUNK_SIZE = int(os.environ.get('ETL_CHUNK_SIZE', 50000))
+
+# dim_date covers whole calendar years around the sales (plus this range, if set)
+CALENDAR_START = os.environ.get('ETL_CALENDAR_START')  # e.g. '2020-01-01'
+CALENDAR_END = os.environ.get('ETL_CALENDAR_END')      # e.g. '2026-12-31'
+BULK_LOAD_CHUNK_SIZE = int(os.environ.get('ETL_BULK_LOAD_CHUNK_SIZE', 500000))
+
+# Blue/green reloads: these tables are loaded as <table>__next and swapped in
+# with one RENAME TABLE. dim_store / dim_product stay in place (upserted)
+# because users, notifications and inventory tables hold foreign keys to them.
+SWAP_TABLES = ['fact_sales', 'dim_date', 'dim_customer', 'agg_sales_daily_store_product']
+SHADOW_SUFFIX = '__next'
+PREVIOUS_SUFFIX = '__prev'
+
+# fact_sales is RANGE partitioned by month of date_id; rows past the last
+# monthly partition land in this catch-all until ensure_fact_partitions splits it
+FUTURE_PARTITION = 'p_future'
+# A fact_sales created before partitioning is rebuilt as fact_sales__migrate (--migrate-partitions)
+MIGRATION_SUFFIX = '__migrate'
+FACT_COLUMNS = ['sale_id', 'date_id', 'store_id', 'product_id', 'customer_id', 'quantity', 'revenue', 'cost', 'profit']
+# sale_ids per lookup when checking which sales are already loaded
+SALE_ID_LOOKUP_BATCH = 1000
 DB_CONFIG = {
     'host': 'localhost',
     'database': 'BusinessIntelligence',
@@ -36,6 +111,14 @@ def create_database_connection():
         print("\nNote: Make sure MySQL is running and database 'retail_bi' exists")
         return None
 
+def create_warehouse_engine():
+    """SQLAlchemy engine for bulk loads (pandas to_sql)"""
+    connection_string = (
+        f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}"
+        f"@{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset=utf8mb4"
+    )
+    return create_engine(connection_string)
+
 def create_database_if_not_exists():
     """Create database if it doesn't exist"""
     try:
@@ -53,8 +136,14 @@ def create_database_if_not_exists():
     except Error as e:
         print(f"✗ Error creating database: {e}")
 
-def load_sql_schema(connection):
-    """Load SQL schema from file"""
+def load_sql_schema(connection, drop_existing=True):
+    """Load SQL schema from file
+
+    With drop_existing=False the DROP statements are skipped and existing
+    tables/indexes are left alone (only missing tables and views are created).
+    An existing fact_sales keeps its layout; one that predates partitioning
+    is rebuilt by migrate_fact_partitions.
+    """
     try:
         with open('warehouse/star_schema.sql', 'r', encoding='utf-8') as f:
             sql_script = f.read()
@@ -64,10 +153,15 @@ def load_sql_schema(connection):
         statements = [s.strip() for s in sql_script.split(';') if s.strip()]
         
         for statement in statements:
+            if not drop_existing and 'DROP TABLE' in statement.upper():
+                continue
             if statement:
                 try:
                     cursor.execute(statement)
                 except Error as e:
+                    # Table / index already exists
+                    if not drop_existing and e.errno in (1050, 1061):
+                        continue
                     # Ignore errors for DROP TABLE IF EXISTS if tables don't exist
                     if 'DROP TABLE' not in statement.upper():
                         print(f"Warning: {e}")
@@ -78,193 +172,284 @@ def load_sql_schema(connection):
     except Exception as e:
         print(f"✗ Error loading schema: {e}")
 
+def file_fingerprint(path):
+    """Content hash + mtime of a source file (the staging cache key)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return f"{digest.hexdigest()[:32]}_{os.stat(path).st_mtime_ns}"
+
+def staging_cache_path(name, files):
+    if len(files) == 1:
+        fingerprint = file_fingerprint(files[0])
+    else:
+        # Multi-file source: hash of the part files' paths and fingerprints
+        digest = hashlib.sha256('\n'.join(f"{path}:{file_fingerprint(path)}" for path in files).encode())
+        fingerprint = digest.hexdigest()[:32]
+    return os.path.join(STAGING_CACHE_DIR, f"{name}_{fingerprint}.parquet")
+
+def find_source(name):
+    """Locate a source in EXCEL_DIR; returns (format, files).
+
+    Part-file directories are searched recursively, so partition
+    directories (month=2024-01/) work. With ETL_SOURCE_FORMAT=auto the
+    first format in SOURCE_FORMATS that exists wins.
+    """
+    base = os.path.join(EXCEL_DIR, SOURCE_FILES[name])
+    formats = SOURCE_FORMATS if SOURCE_FORMAT == 'auto' else [SOURCE_FORMAT]
+    for file_format in formats:
+        extension = FORMAT_EXTENSIONS[file_format]
+        if os.path.isdir(base):
+            files = sorted(glob.glob(os.path.join(base, '**', f'*{extension}'), recursive=True))
+            if files:
+                return file_format, files
+        if os.path.isfile(base + extension):
+            return file_format, [base + extension]
+    raise FileNotFoundError(f"No {'/'.join(formats)} source for {name} in {EXCEL_DIR}")
+
+def enforce_schema(name, df):
+    """Cast a source frame to its SOURCE_SCHEMAS types.
+
+    Unparseable values become missing (and are caught by the quality
+    checks); int columns stay float while they hold missing values.
+    """
+    schema = SOURCE_SCHEMAS[name]
+    missing = [col for col in schema if col not in df.columns]
+    if missing:
+        raise ValueError(f"{name} source is missing columns: {', '.join(missing)}")
+    
+    columns = {}
+    for col, kind in schema.items():
+        values = df[col]
+        if kind == 'datetime':
+            values = pd.to_datetime(values, errors='coerce')
+        elif kind == 'string':
+            if not pd.api.types.is_string_dtype(values):
+                values = values.astype('string')
+        else:
+            values = pd.to_numeric(values, errors='coerce')
+            if kind == 'int' and not values.isna().any():
+                values = values.astype(np.int64)
+            else:
+                values = values.astype(np.float64)
+        columns[col] = values
+    return pd.DataFrame(columns, index=df.index)
+
+def read_source_file(file_format, path, columns=None):
+    if file_format == 'parquet':
+        return pd.read_parquet(path, columns=columns)
+    if file_format == 'csv':
+        return pd.read_csv(path, usecols=columns)
+    return pd.read_excel(path)
+
+def stage_source(name, file_format, files, cache_path):
+    """Parse one CSV / Excel source (runs in a worker process).
+
+    Writes the typed frame to the Parquet staging cache and returns the
+    cache path, or returns the DataFrame itself when it cannot be cached.
+    """
+    columns = list(SOURCE_SCHEMAS[name])
+    frames = [read_source_file(file_format, path, columns) for path in files]
+    df = enforce_schema(name, pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+    if not cache_path:
+        return df
+
+    try:
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"  ⚠ Could not cache {name}: {e}")
+        return df
+
+    # Drop staged copies of older versions of this source
+    prefix = f"{name}_"
+    for filename in os.listdir(STAGING_CACHE_DIR):
+        stale_path = os.path.join(STAGING_CACHE_DIR, filename)
+        if filename.startswith(prefix) and filename.endswith('.parquet') and stale_path != cache_path:
+            os.remove(stale_path)
+    return cache_path
+
 def extract_excel_data():
-    """Extract data from Excel files"""
+    """Extract data from the source files (Parquet, CSV or Excel).
+
+    Parquet sources are read directly; unchanged CSV / Excel sources come
+    from the Parquet staging cache and the rest are parsed in parallel
+    worker processes.
+    """
     print("\n" + "="*50)
-    print("EXTRACTING DATA FROM EXCEL FILES")
+    print("EXTRACTING SOURCE DATA")
     print("="*50)
     
     try:
-        # Load all Excel files
-        df_stores = pd.read_excel(f'{EXCEL_DIR}/stores.xlsx')
-        df_products = pd.read_excel(f'{EXCEL_DIR}/products.xlsx')
-        df_customers = pd.read_excel(f'{EXCEL_DIR}/customers.xlsx')
-        df_sales = pd.read_excel(f'{EXCEL_DIR}/sales_raw.xlsx')
-        
-        print(f"✓ Loaded stores: {len(df_stores)} rows")
-        print(f"✓ Loaded products: {len(df_products)} rows")
-        print(f"✓ Loaded customers: {len(df_customers)} rows")
-        print(f"✓ Loaded sales: {len(df_sales)} rows")
-        
-        return df_stores, df_products, df_customers, df_sales
+        frames = extract_sources(SOURCE_FILES)
+        return frames['stores'], frames['products'], frames['customers'], frames['sales']
     except Exception as e:
-        print(f"✗ Error loading Excel files: {e}")
+        print(f"✗ Error loading source files: {e}")
         return None, None, None, None
 
+def extract_sources(names):
+    """Load the named sources into typed DataFrames"""
+    frames = {}
+    to_parse = {}
+    if PARQUET_AVAILABLE:
+        os.makedirs(STAGING_CACHE_DIR, exist_ok=True)
+    else:
+        print("  ⚠ pyarrow not installed - staging cache disabled")
+
+    for name in names:
+        file_format, files = find_source(name)
+        if file_format == 'parquet':
+            frames[name] = enforce_schema(name, pd.read_parquet(files if len(files) > 1 else files[0],
+                                                                columns=list(SOURCE_SCHEMAS[name])))
+            print(f"✓ Loaded {name} from {len(files)} parquet file(s): {len(frames[name])} rows")
+            continue
+        
+        cache_path = staging_cache_path(name, files) if PARQUET_AVAILABLE else None
+        if cache_path and os.path.exists(cache_path):
+            frames[name] = enforce_schema(name, pd.read_parquet(cache_path))
+            print(f"✓ Loaded {name} from staging cache: {len(frames[name])} rows")
+        else:
+            to_parse[name] = (file_format, files, cache_path)
+
+    if to_parse:
+        workers = max(1, min(EXTRACT_WORKERS, len(to_parse)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                name: executor.submit(stage_source, name, file_format, files, cache_path)
+                for name, (file_format, files, cache_path) in to_parse.items()
+            }
+            for name, future in futures.items():
+                result = future.result()
+                frames[name] = pd.read_parquet(result) if isinstance(result, str) else result
+                print(f"✓ Loaded {name} ({to_parse[name][0]}): {len(frames[name])} rows")
+    return frames
+
+def iter_excel_chunks(path, chunk_size):
+    """Yield DataFrames of up to chunk_size rows from a workbook opened in read-only (streaming) mode"""
+    workbook = load_workbook(path, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+def iter_parquet_chunks(paths, chunk_size, columns):
+    import pyarrow.parquet as pq
+    for path in paths:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+
+def iter_sales_chunks(chunk_size):
+    """Stream typed sales rows in chunks.
+
+    Parquet parts are read batch by batch; CSV / Excel sources come from
+    the staging cache when unchanged, else from the files themselves.
+    """
+    columns = list(SOURCE_SCHEMAS['sales'])
+    file_format, files = find_source('sales')
+    cache_path = None
+    if file_format != 'parquet' and PARQUET_AVAILABLE:
+        cache_path = staging_cache_path('sales', files)
+    
+    if file_format == 'parquet':
+        print(f"✓ Streaming sales from {len(files)} parquet file(s) ({chunk_size:,} rows per chunk)")
+        chunks = iter_parquet_chunks(files, chunk_size, columns)
+    elif cache_path and os.path.exists(cache_path):
+        print(f"✓ Streaming sales from staging cache ({chunk_size:,} rows per chunk)")
+        chunks = iter_parquet_chunks([cache_path], chunk_size, None)
+    elif file_format == 'csv':
+        print(f"✓ Streaming sales from {len(files)} CSV file(s) ({chunk_size:,} rows per chunk)")
+        chunks = (chunk for path in files for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_size))
+    else:
+        print(f"✓ Streaming sales from {files[0]} ({chunk_size:,} rows per chunk)")
+        chunks = (chunk for path in files for chunk in iter_excel_chunks(path, chunk_size))
+    
+    for chunk in chunks:
+        yield enforce_schema('sales', chunk)
+
 def validate_data(df_stores, df_products, df_customers, df_sales):
-    """Validate and clean data with comprehensive data quality checks"""
+    """Validate and clean data with comprehensive data quality checks
+
+    All checks run through the data quality engine (one vectorized mask pass
+    per table, tables checked concurrently). Returns the cleaned frames and
+    the quality report.
+    """
     print("\n" + "="*50)
     print("VALIDATING AND CLEANING DATA")
     print("="*50)
     
-    quality_report = {
-        'missing_values': {},
-        'duplicates': {},
-        'outliers': {},
-        'data_types': {},
-        'business_rules': {}
-    }
-    
-    # Check for missing values
-    print("\n[1/5] Checking for missing values...")
-    for name, df in [('Stores', df_stores), ('Products', df_products), 
-                     ('Customers', df_customers), ('Sales', df_sales)]:
-        missing = df.isnull().sum()
-        if missing.any():
-            print(f"  ⚠ {name} - Missing values found:")
-            for col, count in missing[missing > 0].items():
-                print(f"    - {col}: {count} ({count/len(df)*100:.1f}%)")
-            quality_report['missing_values'][name] = missing[missing > 0].to_dict()
-        else:
-            print(f"  ✓ {name} - No missing values")
-            quality_report['missing_values'][name] = {}
-    
-    # Check for duplicates
-    print("\n[2/5] Checking for duplicates...")
-    for name, df, key_col in [('Stores', df_stores, 'store_id'),
-                              ('Products', df_products, 'product_id'),
-                              ('Customers', df_customers, 'customer_id'),
-                              ('Sales', df_sales, 'sale_id')]:
-        duplicates = df.duplicated(subset=[key_col]).sum()
-        if duplicates > 0:
-            print(f"  ⚠ {name} - Found {duplicates} duplicate {key_col}s")
-            quality_report['duplicates'][name] = duplicates
-            # Remove duplicates, keep first
-            df = df.drop_duplicates(subset=[key_col], keep='first')
-            if name == 'Stores':
-                df_stores = df
-            elif name == 'Products':
-                df_products = df
-            elif name == 'Customers':
-                df_customers = df
-            else:
-                df_sales = df
-        else:
-            print(f"  ✓ {name} - No duplicates")
-            quality_report['duplicates'][name] = 0
-    
-    # Check for outliers (using IQR method)
-    print("\n[3/5] Checking for outliers...")
-    if 'revenue' in df_sales.columns:
-        Q1 = df_sales['revenue'].quantile(0.25)
-        Q3 = df_sales['revenue'].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        
-        outliers = df_sales[(df_sales['revenue'] < lower_bound) | 
-                            (df_sales['revenue'] > upper_bound)]
-        outlier_count = len(outliers)
-        
-        if outlier_count > 0:
-            print(f"  ⚠ Sales - Found {outlier_count} revenue outliers ({outlier_count/len(df_sales)*100:.1f}%)")
-            print(f"    Range: {lower_bound:.2f} - {upper_bound:.2f}")
-            quality_report['outliers']['Sales'] = {
-                'count': outlier_count,
-                'percentage': outlier_count/len(df_sales)*100
-            }
-        else:
-            print(f"  ✓ Sales - No significant outliers")
-            quality_report['outliers']['Sales'] = {'count': 0, 'percentage': 0}
-    
-    # Validate data types
-    print("\n[4/5] Validating data types...")
-    df_sales['sale_date'] = pd.to_datetime(df_sales['sale_date'], errors='coerce')
-    invalid_dates = df_sales['sale_date'].isna().sum()
-    if invalid_dates > 0:
-        print(f"  ⚠ Sales - {invalid_dates} invalid dates found")
-        df_sales = df_sales[df_sales['sale_date'].notna()]
-    else:
-        print(f"  ✓ Sales - All dates are valid")
-    
-    # Business rules validation
-    print("\n[5/5] Validating business rules...")
-    initial_count = len(df_sales)
-    
-    # Rule 1: Revenue must be positive
-    df_sales = df_sales[df_sales['revenue'] > 0]
-    removed_negative = initial_count - len(df_sales)
-    
-    # Rule 2: Quantity must be positive
-    df_sales = df_sales[df_sales['quantity'] > 0]
-    removed_zero_qty = initial_count - (removed_negative + len(df_sales))
-    
-    # Rule 3: Profit should be <= Revenue (cost can't be negative)
-    df_sales = df_sales[df_sales['profit'] <= df_sales['revenue']]
-    removed_invalid_profit = initial_count - (removed_negative + removed_zero_qty + len(df_sales))
-    
-    # Rule 4: Check referential integrity (will be done later in transform)
-    
-    total_removed = removed_negative + removed_zero_qty + removed_invalid_profit
-    if total_removed > 0:
-        print(f"  ⚠ Removed {total_removed} records violating business rules:")
-        if removed_negative > 0:
-            print(f"    - {removed_negative} records with negative/zero revenue")
-        if removed_zero_qty > 0:
-            print(f"    - {removed_zero_qty} records with zero/negative quantity")
-        if removed_invalid_profit > 0:
-            print(f"    - {removed_invalid_profit} records with invalid profit")
-        
-        quality_report['business_rules'] = {
-            'removed_negative_revenue': int(removed_negative),
-            'removed_zero_quantity': int(removed_zero_qty),
-            'removed_invalid_profit': int(removed_invalid_profit),
-            'total_removed': int(total_removed)
-        }
-    else:
-        print(f"  ✓ All records pass business rules")
-        quality_report['business_rules'] = {'total_removed': 0}
-    
-    # Data quality summary
-    print("\n" + "-"*50)
-    print("DATA QUALITY SUMMARY")
-    print("-"*50)
-    print(f"Total records after cleaning: {len(df_sales):,}")
-    print(f"Data quality score: {calculate_quality_score(quality_report):.1f}%")
-    print("-"*50)
+    cleaned, quality_report = run_quality_checks({
+        'Stores': df_stores,
+        'Products': df_products,
+        'Customers': df_customers,
+        'Sales': df_sales
+    })
+    print_quality_report(quality_report)
     
     print("\n✓ Data validation completed")
-    return df_stores, df_products, df_customers, df_sales
+    return cleaned['Stores'], cleaned['Products'], cleaned['Customers'], cleaned['Sales'], quality_report
 
-def calculate_quality_score(quality_report):
-    """Calculate overall data quality score (0-100)"""
-    score = 100
-    
-    # Deduct points for missing values
-    for table, missing in quality_report['missing_values'].items():
-        if missing:
-            score -= min(20, sum(missing.values()) * 0.1)
-    
-    # Deduct points for duplicates
-    for table, dup_count in quality_report['duplicates'].items():
-        if dup_count > 0:
-            score -= min(15, dup_count * 0.1)
-    
-    # Deduct points for outliers (if excessive)
-    if 'Sales' in quality_report['outliers']:
-        outlier_pct = quality_report['outliers']['Sales'].get('percentage', 0)
-        if outlier_pct > 5:  # More than 5% outliers
-            score -= min(10, (outlier_pct - 5) * 0.5)
+def to_date_ids(timestamps):
+    """Vectorized timestamp -> yyyymmdd date_id"""
+    timestamps = pd.to_datetime(timestamps)
+    return (timestamps.dt.year * 10000 + timestamps.dt.month * 100 + timestamps.dt.day).astype('int64')
+
+def build_calendar(start, end):
+    """Contiguous dim_date rows from start to end, built from DatetimeIndex attributes in one pass"""
+    dates = pd.date_range(start, end, freq='D')
+    return pd.DataFrame({
+        'date_id': (dates.year * 10000 + dates.month * 100 + dates.day).astype('int64'),
+        'date': dates.date,
+        'day': dates.day,
+        'month': dates.month,
+        'quarter': dates.quarter,
+        'year': dates.year,
+        'month_name': dates.month_name(),
+        'quarter_name': 'Q' + dates.quarter.astype(str),
+        'day_of_week': dates.day_name(),
+        'is_weekend': dates.dayofweek >= 5,
+        'is_holiday': False
+    })
+
+def missing_calendar_rows(sale_dates, known_date_ids):
+    """dim_date rows needed for sale_dates that are not in known_date_ids (updated in place).
+
+    Whole calendar years are generated (widened to ETL_CALENDAR_START/END)
+    so the date dimension stays contiguous.
+    """
+    needed = set(to_date_ids(sale_dates).unique().tolist()) - known_date_ids
+    if not needed:
+        return pd.DataFrame()
     
-    # Deduct points for business rule violations
-    total_removed = quality_report['business_rules'].get('total_removed', 0)
-    if total_removed > 0:
-        score -= min(15, total_removed * 0.01)
+    start = pd.Timestamp(year=min(needed) // 10000, month=1, day=1)
+    end = pd.Timestamp(year=max(needed) // 10000, month=12, day=31)
+    if CALENDAR_START:
+        start = min(start, pd.Timestamp(CALENDAR_START))
+    if CALENDAR_END:
+        end = max(end, pd.Timestamp(CALENDAR_END))
     
-    return max(0, score)
+    calendar = build_calendar(start, end)
+    calendar = calendar[~calendar['date_id'].isin(known_date_ids)]
+    known_date_ids.update(calendar['date_id'].tolist())
+    return calendar
+
+def transform_data(df_stores, df_products, df_customers, df_sales, existing_date_ids=None):
+    """Transform data for Data Warehouse
 
-def transform_data(df_stores, df_products, df_customers, df_sales):
-    """Transform data for Data Warehouse"""
+    date_id is the yyyymmdd form of the date. existing_date_ids holds the
+    ids already in dim_date (incremental mode); only missing calendar
+    days get dim_date rows.
+    """
     print("\n" + "="*50)
     print("TRANSFORMING DATA")
     print("="*50)
@@ -272,31 +457,12 @@ def transform_data(df_stores, df_products, df_customers, df_sales):
     # ========== DIM_DATE ==========
     print("Creating date dimension...")
     df_sales['sale_date'] = pd.to_datetime(df_sales['sale_date'])
-    unique_dates = df_sales['sale_date'].dt.date.unique()
-    
-    dim_date_data = []
-    for i, date in enumerate(sorted(unique_dates), 1):
-        date_obj = pd.to_datetime(date)
-        dim_date_data.append({
-            'date_id': i,
-            'date': date,
-            'day': date_obj.day,
-            'month': date_obj.month,
-            'quarter': date_obj.quarter,
-            'year': date_obj.year,
-            'month_name': date_obj.strftime('%B'),
-            'quarter_name': f'Q{date_obj.quarter}',
-            'day_of_week': date_obj.strftime('%A'),
-            'is_weekend': date_obj.weekday() >= 5,
-            'is_holiday': False
-        })
-    
-    df_dim_date = pd.DataFrame(dim_date_data)
+    known_date_ids = set(existing_date_ids or ())
+    df_dim_date = missing_calendar_rows(df_sales['sale_date'], known_date_ids)
     print(f"  ✓ Created {len(df_dim_date)} date records")
     
-    # Create date mapping
-    date_mapping = {date: i+1 for i, date in enumerate(sorted(unique_dates))}
-    df_sales['date_id'] = df_sales['sale_date'].dt.date.map(date_mapping)
+    # Map sales to date ids
+    df_sales['date_id'] = to_date_ids(df_sales['sale_date'])
     
     # ========== DIM_STORE ==========
     print("Creating store dimension...")
@@ -324,7 +490,7 @@ def transform_data(df_stores, df_products, df_customers, df_sales):
     valid_stores = set(df_dim_store['store_id'])
     valid_products = set(df_dim_product['product_id'])
     valid_customers = set(df_dim_customer['customer_id'])
-    valid_dates = set(df_dim_date['date_id'])
+    valid_dates = known_date_ids
     
     initial_count = len(df_fact_sales)
     df_fact_sales = df_fact_sales[
@@ -342,20 +508,183 @@ def transform_data(df_stores, df_products, df_customers, df_sales):
     print("\n✓ Data transformation completed")
     return df_dim_date, df_dim_store, df_dim_product, df_dim_customer, df_fact_sales
 
+def get_droppable_indexes(cursor, table):
+    """Secondary indexes of table that can be dropped for a bulk load.
+
+    For every foreign key column the first index starting with it is kept
+    (InnoDB requires one); all other non-primary indexes are returned as
+    (index_name, [columns], is_unique).
+    """
+    cursor.execute("""
+        SELECT index_name, column_name, non_unique
+        FROM information_schema.statistics
+        WHERE table_schema = %s AND table_name = %s AND index_name <> 'PRIMARY'
+        ORDER BY index_name, seq_in_index
+    """, (DB_CONFIG['database'], table))
+    indexes = {}
+    for index_name, column_name, non_unique in cursor.fetchall():
+        indexes.setdefault(index_name, ([], not non_unique))[0].append(column_name)
+    
+    cursor.execute("""
+        SELECT DISTINCT column_name
+        FROM information_schema.key_column_usage
+        WHERE table_schema = %s AND table_name = %s AND referenced_table_name IS NOT NULL
+    """, (DB_CONFIG['database'], table))
+    fk_columns = {row[0] for row in cursor.fetchall()}
+    
+    droppable = []
+    for index_name, (columns, is_unique) in sorted(indexes.items()):
+        if columns[0] in fk_columns:
+            fk_columns.discard(columns[0])
+            continue
+        droppable.append((index_name, columns, is_unique))
+    return droppable
+
+def mysql_tsv_frame(df):
+    """Escape text and mark NULLs as \\N the way LOAD DATA's default FIELDS ESCAPED BY '\\' expects"""
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if values.dtype == bool:
+            values = values.astype(int)
+        elif pd.api.types.is_string_dtype(values):
+            values = (values.astype(str)
+                      .str.replace('\\', '\\\\', regex=False)
+                      .str.replace('\t', '\\t', regex=False)
+                      .str.replace('\n', '\\n', regex=False))
+        if df[col].isna().any():
+            values = values.astype(object).where(df[col].notna(), '\\N')
+        columns[col] = values
+    return pd.DataFrame(columns)
+
+def drop_secondary_indexes(table):
+    """Drop the droppable secondary indexes of table before a bulk load (returns them)"""
+    connection = mysql.connector.connect(**DB_CONFIG)
+    cursor = connection.cursor()
+    try:
+        dropped = get_droppable_indexes(cursor, table)
+        if dropped:
+            cursor.execute(f"ALTER TABLE {table} " + ", ".join(f"DROP INDEX {name}" for name, _, _ in dropped))
+            print(f"  ✓ Dropped {len(dropped)} secondary indexes on {table}")
+        return dropped
+    finally:
+        cursor.close()
+        connection.close()
+
+def rebuild_secondary_indexes(table, dropped):
+    """Rebuild the indexes dropped by drop_secondary_indexes in one ALTER TABLE"""
+    if not dropped:
+        return
+    connection = mysql.connector.connect(**DB_CONFIG)
+    cursor = connection.cursor()
+    try:
+        started = time.perf_counter()
+        cursor.execute(f"ALTER TABLE {table} " + ", ".join(
+            f"ADD {'UNIQUE ' if is_unique else ''}INDEX {name} ({', '.join(cols)})"
+            for name, cols, is_unique in dropped
+        ))
+        print(f"  ✓ Rebuilt {len(dropped)} indexes on {table} in {time.perf_counter() - started:.1f}s")
+    finally:
+        cursor.close()
+        connection.close()
+
+def bulk_load_table(table, df, chunk_size=BULK_LOAD_CHUNK_SIZE):
+    """Load df into an (empty) table with LOAD DATA LOCAL INFILE.
+
+    Each chunk is written to a temporary TSV file and loaded natively. FK and
+    unique checks are off for the session. The load is a single transaction.
+    Requires local_infile=ON on the server.
+    """
+    connection = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True)
+    cursor = connection.cursor()
+    columns = list(df.columns)
+    started = time.perf_counter()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        cursor.execute("SET UNIQUE_CHECKS = 0")
+        
+        for i in range(0, len(df), chunk_size):
+            chunk = df.iloc[i:i+chunk_size]
+            fd, path = tempfile.mkstemp(suffix='.tsv')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                    mysql_tsv_frame(chunk).to_csv(f, sep='\t', header=False, index=False,
+                                                  lineterminator='\n', quoting=csv.QUOTE_NONE)
+                cursor.execute(f"""
+                    LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}'
+                    INTO TABLE {table}
+                    CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY '\\t'
+                    LINES TERMINATED BY '\\n'
+                    ({', '.join(columns)})
+                """)
+            finally:
+                os.remove(path)
+            loaded = i + len(chunk)
+            rate = loaded / max(time.perf_counter() - started, 1e-6)
+            print(f"  Loaded {loaded:,}/{len(df):,} rows ({rate:,.0f} rows/sec)")
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        # Session settings only; a failure here must not hide the load error
+        try:
+            cursor.execute("SET UNIQUE_CHECKS = 1")
+            cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        except Error as e:
+            print(f"  ⚠ Could not restore session checks: {e}")
+        cursor.close()
+        connection.close()
+    
+    elapsed = time.perf_counter() - started
+    print(f"  ✓ Bulk loaded {table}: {len(df):,} rows in {elapsed:.1f}s ({len(df) / max(elapsed, 1e-6):,.0f} rows/sec)")
+
+def insert_fact_chunks(engine, df_fact_sales, table, chunk_size=10000):
+    """Load facts with chunked to_sql"""
+    total_chunks = (len(df_fact_sales) // chunk_size) + 1
+    started = time.perf_counter()
+    
+    for i in range(0, len(df_fact_sales), chunk_size):
+        chunk = df_fact_sales.iloc[i:i+chunk_size]
+        chunk.to_sql(table, engine, if_exists='append', index=False)
+        print(f"  Loaded chunk {i//chunk_size + 1}/{total_chunks} ({len(chunk)} rows)")
+    
+    elapsed = time.perf_counter() - started
+    print(f"  ✓ Loaded {table}: {len(df_fact_sales)} rows ({len(df_fact_sales) / max(elapsed, 1e-6):,.0f} rows/sec)")
+
+def load_fact_table(engine, df_fact_sales, table, fast_load=False):
+    """Load facts with LOAD DATA LOCAL INFILE (fast_load) or chunked to_sql.
+
+    With fast_load, secondary indexes are dropped first and rebuilt once after
+    the load succeeds, also when it fell back to chunked inserts.
+    """
+    if not fast_load:
+        insert_fact_chunks(engine, df_fact_sales, table)
+        return
+    
+    dropped = drop_secondary_indexes(table)
+    try:
+        bulk_load_table(table, df_fact_sales)
+    except Error as e:
+        print(f"  ⚠ LOAD DATA LOCAL INFILE failed ({e}) - falling back to chunked inserts")
+        insert_fact_chunks(engine, df_fact_sales, table)
+    rebuild_secondary_indexes(table, dropped)
+
 def load_to_database(connection, df_dim_date, df_dim_store, df_dim_product, 
-                     df_dim_customer, df_fact_sales):
-    """Load transformed data into Data Warehouse"""
+                     df_dim_customer, df_fact_sales, fast_load=False):
+    """Load transformed data into Data Warehouse
+
+    With fast_load, fact_sales is loaded with LOAD DATA LOCAL INFILE
+    (bulk_load_table), falling back to chunked to_sql if that fails.
+    """
     print("\n" + "="*50)
     print("LOADING DATA TO DATA WAREHOUSE")
     print("="*50)
     
     try:
         # Create SQLAlchemy engine for faster bulk inserts
-        connection_string = (
-            f"mysql+pymysql://{DB_CONFIG['user']}:{DB_CONFIG['password']}"
-            f"@{DB_CONFIG['host']}/{DB_CONFIG['database']}?charset=utf8mb4"
-        )
-        engine = create_engine(connection_string)
+        engine = create_warehouse_engine()
         
         # Clear existing data first (in correct order due to foreign keys)
         print("\nClearing existing data...")
@@ -400,15 +729,7 @@ def load_to_database(connection, df_dim_date, df_dim_store, df_dim_product,
         
         # Load fact table in chunks for better performance
         print("\nLoading fact table...")
-        chunk_size = 10000
-        total_chunks = (len(df_fact_sales) // chunk_size) + 1
-        
-        for i in range(0, len(df_fact_sales), chunk_size):
-            chunk = df_fact_sales.iloc[i:i+chunk_size]
-            chunk.to_sql('fact_sales', engine, if_exists='append', index=False)
-            print(f"  Loaded chunk {i//chunk_size + 1}/{total_chunks} ({len(chunk)} rows)")
-        
-        print(f"  ✓ Loaded fact_sales: {len(df_fact_sales)} rows")
+        load_fact_table(engine, df_fact_sales, 'fact_sales', fast_load)
         
         engine.dispose()
         print("\n✓ Data loading completed successfully!")
@@ -418,10 +739,746 @@ def load_to_database(connection, df_dim_date, df_dim_store, df_dim_product,
         import traceback
         traceback.print_exc()
 
-def run_etl():
+def month_partitions(date_ids):
+    """(name, upper bound) of the monthly partitions covering date_ids, e.g. ('p202401', 20240201)"""
+    date_ids = pd.Series(list(date_ids), dtype='int64')
+    months = pd.period_range(
+        pd.to_datetime(str(date_ids.min()), format='%Y%m%d'),
+        pd.to_datetime(str(date_ids.max()), format='%Y%m%d'),
+        freq='M'
+    )
+    return [(f"p{month.strftime('%Y%m')}", int((month + 1).strftime('%Y%m01'))) for month in months]
+
+def partition_definitions(partitions):
+    return ', '.join(f"PARTITION {name} VALUES LESS THAN ({bound})" for name, bound in partitions)
+
+def ensure_fact_partitions(connection, date_ids, table='fact_sales'):
+    """Give every month in date_ids its own fact_sales partition.
+
+    Months after the last monthly partition are split out of the catch-all
+    partition, months before the first one out of that first partition.
+    Tables without partitioning (older schemas) are left alone.
+    """
+    if len(date_ids) == 0:
+        return
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT partition_name, partition_description
+            FROM information_schema.partitions
+            WHERE table_schema = %s AND table_name = %s AND partition_name IS NOT NULL
+            ORDER BY partition_ordinal_position
+        """, (DB_CONFIG['database'], table))
+        existing = cursor.fetchall()
+        if not existing:
+            return
+        
+        names = {name for name, _ in existing}
+        monthly = [(name, int(bound)) for name, bound in existing if bound != 'MAXVALUE']
+        wanted = [p for p in month_partitions(date_ids) if p[0] not in names]
+        if not wanted:
+            return
+        
+        before = [p for p in wanted if monthly and p[1] < monthly[0][1]]
+        after = [p for p in wanted if not monthly or p[1] > monthly[-1][1]]
+        if before:
+            first_name, first_bound = monthly[0]
+            cursor.execute(f"""
+                ALTER TABLE {table} REORGANIZE PARTITION {first_name} INTO (
+                    {partition_definitions(before + [(first_name, first_bound)])}
+                )
+            """)
+        if after and FUTURE_PARTITION in names:
+            cursor.execute(f"""
+                ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO (
+                    {partition_definitions(after)},
+                    PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE
+                )
+            """)
+        print(f"  ✓ Added {len(before) + len(after)} monthly partitions to {table}")
+    except Error as e:
+        print(f"  ⚠ Could not add partitions to {table}: {e}")
+    finally:
+        cursor.close()
+
+def fact_sales_is_partitioned(connection, table='fact_sales'):
+    """True if the fact table has the monthly RANGE partitions of the current schema"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.partitions
+        WHERE table_schema = %s AND table_name = %s AND partition_name IS NOT NULL
+    """, (DB_CONFIG['database'], table))
+    partitioned = cursor.fetchone()[0] > 0
+    cursor.close()
+    return partitioned
+
+def require_partitioned_fact_sales(connection):
+    """Refuse to load into a fact_sales created by a schema before partitioning.
+
+    Shadow reloads copy the live layout (CREATE TABLE ... LIKE) and
+    load_sql_schema(drop_existing=False) keeps existing tables, so an old
+    fact_sales would silently stay unpartitioned.
+    """
+    if not fact_sales_is_partitioned(connection):
+        raise RuntimeError(
+            "fact_sales is not partitioned by date_id (created by an older schema). "
+            "Run `python etl/etl_pipeline.py --migrate-partitions` before loading."
+        )
+
+def fact_sales_ddl(table):
+    """CREATE TABLE statement of fact_sales in warehouse/star_schema.sql, for another table name"""
+    with open('warehouse/star_schema.sql', 'r', encoding='utf-8') as f:
+        statements = f.read().split(';')
+    for statement in statements:
+        start = statement.find('CREATE TABLE fact_sales (')
+        if start >= 0:
+            return statement[start:].replace('CREATE TABLE fact_sales (', f'CREATE TABLE {table} (', 1)
+    raise RuntimeError("CREATE TABLE fact_sales not found in warehouse/star_schema.sql")
+
+def migrate_fact_partitions(connection):
+    """Rebuild a fact_sales that predates partitioning with the current schema.
+
+    Rows are copied into a partitioned fact_sales__migrate (monthly partitions
+    for the loaded months) that is swapped in with one RENAME TABLE. The old
+    table's foreign keys and single-column indexes go with it.
+    """
+    print("\n" + "="*50)
+    print("MIGRATING FACT_SALES TO MONTHLY PARTITIONS")
+    print("="*50)
+    
+    if fact_sales_is_partitioned(connection):
+        print("  ✓ fact_sales is already partitioned")
+        return True
+    
+    table = f'fact_sales{MIGRATION_SUFFIX}'
+    columns = ', '.join(FACT_COLUMNS)
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(fact_sales_ddl(table))
+        cursor.execute("SELECT MIN(date_id), MAX(date_id) FROM fact_sales")
+        date_range = [date_id for date_id in cursor.fetchone() if date_id is not None]
+        if date_range and not has_legacy_date_keys(connection):
+            ensure_fact_partitions(connection, date_range, table)
+        
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM fact_sales")
+        rows = cursor.rowcount
+        connection.commit()
+        cursor.execute(f"RENAME TABLE fact_sales TO fact_sales{PREVIOUS_SUFFIX}_unpartitioned, {table} TO fact_sales")
+        cursor.execute(f"DROP TABLE fact_sales{PREVIOUS_SUFFIX}_unpartitioned")
+        print(f"  ✓ Copied {rows} rows into the partitioned fact_sales")
+        return True
+    except Error as e:
+        connection.rollback()
+        print(f"✗ Error migrating fact_sales (live table untouched): {e}")
+        return False
+    finally:
+        cursor.close()
+
+def table_names(suffix):
+    return ', '.join(f"{table}{suffix}" for table in SWAP_TABLES)
+
+def drop_generation(connection, suffix):
+    """Drop the <table><suffix> copies of the swapped tables"""
+    cursor = connection.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    cursor.execute(f"DROP TABLE IF EXISTS {table_names(suffix)}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    cursor.close()
+
+def prepare_shadow_tables(connection):
+    """Create empty <table>__next copies (same columns and indexes) of the swapped tables"""
+    drop_generation(connection, SHADOW_SUFFIX)
+    cursor = connection.cursor()
+    for table in SWAP_TABLES:
+        cursor.execute(f"CREATE TABLE {table}{SHADOW_SUFFIX} LIKE {table}")
+    cursor.close()
+    print(f"✓ Created shadow tables: {table_names(SHADOW_SUFFIX)}")
+
+def swap_shadow_tables(connection, keep_previous=False):
+    """Swap the loaded shadow tables in with a single (atomic) RENAME TABLE"""
+    print("\n" + "="*50)
+    print("SWAPPING IN NEW TABLES")
+    print("="*50)
+    
+    drop_generation(connection, PREVIOUS_SUFFIX)
+    renames = []
+    for table in SWAP_TABLES:
+        renames.append(f"{table} TO {table}{PREVIOUS_SUFFIX}")
+        renames.append(f"{table}{SHADOW_SUFFIX} TO {table}")
+    cursor = connection.cursor()
+    cursor.execute("RENAME TABLE " + ", ".join(renames))
+    cursor.close()
+    print("  ✓ New tables are live")
+    
+    if keep_previous:
+        print(f"  ✓ Previous generation kept as {table_names(PREVIOUS_SUFFIX)} (rollback: --rollback)")
+    else:
+        drop_generation(connection, PREVIOUS_SUFFIX)
+
+def rollback_swap(connection):
+    """Swap the previous generation (kept with --keep-previous) back in"""
+    cursor = connection.cursor()
+    cursor.execute(f"""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = %s AND table_name IN ({', '.join(['%s'] * len(SWAP_TABLES))})
+    """, [DB_CONFIG['database']] + [f"{table}{PREVIOUS_SUFFIX}" for table in SWAP_TABLES])
+    if cursor.fetchone()[0] != len(SWAP_TABLES):
+        cursor.close()
+        print("✗ No previous generation to roll back to (run the ETL with --keep-previous)")
+        return False
+    
+    drop_generation(connection, SHADOW_SUFFIX)
+    renames = []
+    for table in SWAP_TABLES:
+        renames.append(f"{table} TO {table}{SHADOW_SUFFIX}")
+        renames.append(f"{table}{PREVIOUS_SUFFIX} TO {table}")
+    cursor.execute("RENAME TABLE " + ", ".join(renames))
+    
+    # Watermark of the restored generation is re-read from its fact table
+    cursor.execute("DELETE FROM etl_state WHERE state_key IN ('max_sale_id', 'max_sale_date')")
+    connection.commit()
+    cursor.close()
+    drop_generation(connection, SHADOW_SUFFIX)
+    get_sales_watermark(connection)
+    print("✓ Rolled back to the previous generation")
+    return True
+
+def load_to_shadow_tables(df_dim_date, df_dim_store, df_dim_product, df_dim_customer, df_fact_sales, fast_load=False):
+    """Load a full reload into the __next shadow tables (live tables keep serving reads)"""
+    print("\n" + "="*50)
+    print("LOADING DATA TO SHADOW TABLES")
+    print("="*50)
+    
+    engine = create_warehouse_engine()
+    try:
+        print("\nLoading dimension tables...")
+        with engine.begin() as conn:
+            for table, df, key_col in [('dim_store', df_dim_store, 'store_id'),
+                                       ('dim_product', df_dim_product, 'product_id')]:
+                affected = upsert_dimension(conn, table, df, key_col)
+                print(f"  ✓ Upserted {table} in place: {len(df)} rows checked, {affected} rows affected")
+            df_dim_date.to_sql(f'dim_date{SHADOW_SUFFIX}', conn, if_exists='append', index=False)
+            print(f"  ✓ Loaded dim_date{SHADOW_SUFFIX}: {len(df_dim_date)} rows")
+            df_dim_customer.to_sql(f'dim_customer{SHADOW_SUFFIX}', conn, if_exists='append', index=False)
+            print(f"  ✓ Loaded dim_customer{SHADOW_SUFFIX}: {len(df_dim_customer)} rows")
+        
+        print("\nLoading fact table...")
+        load_fact_table(engine, df_fact_sales, f'fact_sales{SHADOW_SUFFIX}', fast_load)
+        return True
+    except Exception as e:
+        print(f"✗ Error loading shadow tables (live tables untouched): {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        engine.dispose()
+
+def get_etl_state(connection, state_key):
+    """Read a value from etl_state (None if missing)"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT state_value FROM etl_state WHERE state_key = %s", (state_key,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+def set_etl_state(connection, values):
+    """Write key/value pairs to etl_state"""
+    cursor = connection.cursor()
+    for state_key, state_value in values.items():
+        cursor.execute("""
+            INSERT INTO etl_state (state_key, state_value)
+            VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE state_value = VALUES(state_value)
+        """, (state_key, str(state_value)))
+    connection.commit()
+    cursor.close()
+
+def sales_watermarks(df_fact_sales, df_sales):
+    """High-water marks (max sale_id / sale_date) of a loaded fact batch"""
+    loaded_dates = df_sales.loc[df_sales['sale_id'].isin(df_fact_sales['sale_id']), 'sale_date']
+    return {
+        'max_sale_id': int(df_fact_sales['sale_id'].max()),
+        'max_sale_date': loaded_dates.max().strftime('%Y-%m-%d')
+    }
+
+def warehouse_is_loaded(connection):
+    """True if the star schema exists (incremental loads need an existing warehouse)"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_schema = %s AND table_name IN ('fact_sales', 'dim_date', 'etl_state')
+    """, (DB_CONFIG['database'],))
+    exists = cursor.fetchone()[0] == 3
+    cursor.close()
+    return exists
+
+def get_sales_watermark(connection):
+    """Last loaded sale_id from etl_state, seeded from fact_sales for warehouses loaded before state tracking"""
+    max_sale_id = get_etl_state(connection, 'max_sale_id')
+    if max_sale_id is not None:
+        return int(max_sale_id)
+
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT MAX(f.sale_id), MAX(d.date)
+        FROM fact_sales f
+        JOIN dim_date d ON f.date_id = d.date_id
+    """)
+    max_sale_id, max_sale_date = cursor.fetchone()
+    cursor.close()
+    if max_sale_id is None:
+        return None
+    set_etl_state(connection, {'max_sale_id': max_sale_id, 'max_sale_date': max_sale_date})
+    return int(max_sale_id)
+
+def get_existing_date_ids(connection):
+    """Set of date_ids already in dim_date"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT date_id FROM dim_date")
+    date_ids = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return date_ids
+
+def has_legacy_date_keys(connection):
+    """True if dim_date still uses the old sequential date_ids instead of yyyymmdd"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT MIN(date_id) FROM dim_date")
+    min_date_id = cursor.fetchone()[0]
+    cursor.close()
+    return min_date_id is not None and min_date_id < 10000101
+
+def upsert_dimension(conn, table, df, key_col):
+    """INSERT ... ON DUPLICATE KEY UPDATE every row of a dimension (unchanged rows are no-ops)"""
+    if df.empty:
+        return 0
+    columns = list(df.columns)
+    updates = ', '.join(f"{col} = VALUES({col})" for col in columns if col != key_col)
+    statement = text(f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES ({', '.join(f':{col}' for col in columns)})
+        ON DUPLICATE KEY UPDATE {updates}
+    """)
+    rows = df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    return conn.execute(statement, rows).rowcount
+
+def customer_feature_deltas(df_fact_sales):
+    """Per-customer totals of newly loaded sales (added onto customer_features)"""
+    grouped = df_fact_sales.sort_values(['date_id', 'sale_id']).groupby('customer_id')
+    to_date = lambda date_ids: pd.to_datetime(date_ids.astype(str), format='%Y%m%d').dt.date
+    return pd.DataFrame({
+        'first_purchase_date': to_date(grouped['date_id'].min()),
+        'last_purchase_date': to_date(grouped['date_id'].max()),
+        'last_store_id': grouped['store_id'].last(),
+        'transactions': grouped.size(),
+        'total_revenue': grouped['revenue'].sum().round(2),
+        'total_quantity': grouped['quantity'].sum()
+    }).reset_index()
+
+def upsert_customer_features(conn, df_fact_sales):
+    """Add newly loaded sales to customer_features in the caller's transaction.
+
+    Changed customers get segment NULL until the segment model assigns them again.
+    """
+    if df_fact_sales.empty:
+        return 0
+    deltas = customer_feature_deltas(df_fact_sales)
+    columns = list(deltas.columns)
+    # Assignments run left to right: last_store_id is compared before last_purchase_date moves
+    statement = text(f"""
+        INSERT INTO customer_features ({', '.join(columns)})
+        VALUES ({', '.join(f':{col}' for col in columns)})
+        ON DUPLICATE KEY UPDATE
+            segment = NULL,
+            transactions = transactions + VALUES(transactions),
+            total_revenue = total_revenue + VALUES(total_revenue),
+            total_quantity = total_quantity + VALUES(total_quantity),
+            first_purchase_date = LEAST(first_purchase_date, VALUES(first_purchase_date)),
+            last_store_id = IF(VALUES(last_purchase_date) >= last_purchase_date, VALUES(last_store_id), last_store_id),
+            last_purchase_date = GREATEST(last_purchase_date, VALUES(last_purchase_date))
+    """)
+    conn.execute(statement, deltas.astype(object).to_dict(orient='records'))
+    return len(deltas)
+
+def rebuild_customer_features(connection):
+    """Recompute customer_features from fact_sales after a full load.
+
+    Customers whose totals did not change keep their segment.
+    """
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO customer_features
+                (customer_id, first_purchase_date, last_purchase_date, last_store_id,
+                 transactions, total_revenue, total_quantity)
+            SELECT 
+                f.customer_id,
+                MIN(d.date),
+                MAX(d.date),
+                CAST(SUBSTRING_INDEX(GROUP_CONCAT(f.store_id ORDER BY f.date_id DESC, f.sale_id DESC), ',', 1) AS UNSIGNED),
+                COUNT(*),
+                SUM(f.revenue),
+                SUM(f.quantity)
+            FROM fact_sales f
+            JOIN dim_date d ON f.date_id = d.date_id
+            GROUP BY f.customer_id
+            ON DUPLICATE KEY UPDATE
+                segment = IF(transactions = VALUES(transactions) AND total_revenue = VALUES(total_revenue), segment, NULL),
+                first_purchase_date = VALUES(first_purchase_date),
+                last_purchase_date = VALUES(last_purchase_date),
+                last_store_id = VALUES(last_store_id),
+                transactions = VALUES(transactions),
+                total_revenue = VALUES(total_revenue),
+                total_quantity = VALUES(total_quantity)
+        """)
+        cursor.execute("""
+            DELETE cf FROM customer_features cf
+            LEFT JOIN (SELECT DISTINCT customer_id FROM fact_sales) f ON cf.customer_id = f.customer_id
+            WHERE f.customer_id IS NULL
+        """)
+        connection.commit()
+        cursor.execute("SELECT COUNT(*) FROM customer_features")
+        print(f"  ✓ Rebuilt customer_features: {cursor.fetchone()[0]} customers")
+        cursor.close()
+    except Error as e:
+        print(f"✗ Error building customer features: {e}")
+
+def load_incremental(df_dim_date, df_dim_store, df_dim_product, df_dim_customer, df_fact_sales, watermarks):
+    """Append new sales and dates, upsert dimensions and advance the watermark in one transaction"""
+    print("\n" + "="*50)
+    print("LOADING NEW DATA TO DATA WAREHOUSE (INCREMENTAL)")
+    print("="*50)
+    
+    engine = create_warehouse_engine()
+    try:
+        with engine.begin() as conn:
+            print("\nUpserting dimension tables...")
+            for table, df, key_col in [('dim_store', df_dim_store, 'store_id'),
+                                       ('dim_product', df_dim_product, 'product_id'),
+                                       ('dim_customer', df_dim_customer, 'customer_id')]:
+                affected = upsert_dimension(conn, table, df, key_col)
+                print(f"  ✓ {table}: {len(df)} rows checked, {affected} rows affected")
+            
+            if not df_dim_date.empty:
+                df_dim_date.to_sql('dim_date', conn, if_exists='append', index=False)
+            print(f"  ✓ Appended dim_date: {len(df_dim_date)} new dates")
+            
+            print("\nAppending fact table...")
+            loaded = exclude_loaded_sales(conn, df_fact_sales)
+            if len(loaded) < len(df_fact_sales):
+                print(f"  ⚠ Skipped {len(df_fact_sales) - len(loaded)} sales already in fact_sales")
+            df_fact_sales = loaded
+            chunk_size = 10000
+            for i in range(0, len(df_fact_sales), chunk_size):
+                df_fact_sales.iloc[i:i+chunk_size].to_sql('fact_sales', conn, if_exists='append', index=False)
+            print(f"  ✓ Appended fact_sales: {len(df_fact_sales)} rows")
+            
+            customers = upsert_customer_features(conn, df_fact_sales)
+            print(f"  ✓ Updated customer_features: {customers} customers")
+            
+            if watermarks:
+                for state_key, state_value in watermarks.items():
+                    conn.execute(text("""
+                        INSERT INTO etl_state (state_key, state_value)
+                        VALUES (:state_key, :state_value)
+                        ON DUPLICATE KEY UPDATE state_value = VALUES(state_value)
+                    """), {'state_key': state_key, 'state_value': str(state_value)})
+                print(f"  ✓ High-water mark: sale_id {watermarks['max_sale_id']} ({watermarks['max_sale_date']})")
+        
+        print("\n✓ Incremental load completed successfully!")
+        return True
+    except Exception as e:
+        print(f"✗ Error loading data (transaction rolled back): {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        engine.dispose()
+
+def refresh_sales_rollup(connection, date_ids):
+    """Rebuild rollup rows only for the given date_ids (dates touched by an incremental load)"""
+    date_ids = sorted(int(date_id) for date_id in date_ids)
+    if not date_ids:
+        return
+    
+    try:
+        cursor = connection.cursor()
+        rows = 0
+        for i in range(0, len(date_ids), 1000):
+            batch = date_ids[i:i+1000]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f"DELETE FROM agg_sales_daily_store_product WHERE date_id IN ({placeholders})", batch)
+            cursor.execute(f"""
+                INSERT INTO agg_sales_daily_store_product
+                    (date_id, store_id, product_id, transactions, quantity, revenue, cost, profit)
+                SELECT 
+                    date_id,
+                    store_id,
+                    product_id,
+                    COUNT(*),
+                    SUM(quantity),
+                    SUM(revenue),
+                    SUM(cost),
+                    SUM(profit)
+                FROM fact_sales
+                WHERE date_id IN ({placeholders})
+                GROUP BY date_id, store_id, product_id
+            """, batch)
+            rows += cursor.rowcount
+        connection.commit()
+        cursor.close()
+        print(f"  ✓ Refreshed agg_sales_daily_store_product for {len(date_ids)} dates: {rows} rows")
+    except Error as e:
+        print(f"✗ Error refreshing aggregate tables: {e}")
+
+def build_sales_lookups(df_dim_store, df_dim_product, df_dim_customer, existing_date_ids):
+    """Lookups shared by every streamed chunk: FK validity sets and the date_ids already in dim_date"""
+    return {
+        'stores': set(df_dim_store['store_id']),
+        'products': set(df_dim_product['product_id']),
+        'customers': set(df_dim_customer['customer_id']),
+        'date_ids': set(existing_date_ids)
+    }
+
+def validate_sales_chunk(df_sales):
+    """Chunk-level validation with the Sales quality rules (duplicates are checked within the chunk)"""
+    df_sales = df_sales.assign(sale_date=pd.to_datetime(df_sales['sale_date'], errors='coerce'))
+    result, keep = check_table('Sales', df_sales, *TABLE_CHECKS['Sales'])
+    return df_sales[keep], result
+
+def transform_sales_chunk(df_sales, lookups):
+    """Map a validated chunk to fact rows; returns (new dim_date rows, fact rows, rows failing FK checks)"""
+    df_new_dates = missing_calendar_rows(df_sales['sale_date'], lookups['date_ids'])
+    df_sales = df_sales.assign(date_id=to_date_ids(df_sales['sale_date']))
+    
+    df_fact_sales = df_sales[[
+        'sale_id', 'date_id', 'store_id', 'product_id', 
+        'customer_id', 'quantity', 'revenue', 'cost', 'profit'
+    ]]
+    valid = (
+        df_fact_sales['store_id'].isin(lookups['stores']) &
+        df_fact_sales['product_id'].isin(lookups['products']) &
+        df_fact_sales['customer_id'].isin(lookups['customers'])
+    )
+    return df_new_dates, df_fact_sales[valid], int((~valid).sum())
+
+def exclude_loaded_sales(conn, df_fact_sales, table='fact_sales'):
+    """Fact rows whose sale_id is not in the fact table yet.
+
+    The partitioned fact_sales is keyed by (sale_id, date_id), so its primary
+    key does not stop a sale from being loaded again under another date. The
+    check runs in the caller's load transaction (the ETL is the only writer).
+    """
+    if df_fact_sales.empty:
+        return df_fact_sales
+    sale_ids = df_fact_sales['sale_id'].unique().tolist()
+    statement = text(f"SELECT sale_id FROM {table} WHERE sale_id IN :sale_ids").bindparams(
+        bindparam('sale_ids', expanding=True)
+    )
+    loaded = set()
+    for i in range(0, len(sale_ids), SALE_ID_LOOKUP_BATCH):
+        result = conn.execute(statement, {'sale_ids': sale_ids[i:i + SALE_ID_LOOKUP_BATCH]})
+        loaded.update(row[0] for row in result)
+    return df_fact_sales[~df_fact_sales['sale_id'].isin(loaded)]
+
+def load_sales_chunk(conn, df_new_dates, df_fact_chunk, suffix=''):
+    """Append a chunk's new dates and not yet loaded sales; returns the fact rows inserted"""
+    if not df_new_dates.empty:
+        df_new_dates.to_sql(f'dim_date{suffix}', conn, if_exists='append', index=False)
+    df_new_sales = exclude_loaded_sales(conn, df_fact_chunk, f'fact_sales{suffix}')
+    if not df_new_sales.empty:
+        df_new_sales.to_sql(f'fact_sales{suffix}', conn, if_exists='append', index=False)
+    return df_new_sales
+
+def load_dimensions(engine, df_dim_store, df_dim_product, df_dim_customer, incremental, suffix=''):
+    """Load the (small) store/product/customer dimensions before streaming facts
+
+    With a shadow suffix, dim_customer goes to its shadow table and the
+    in-place dimensions (dim_store, dim_product) are upserted.
+    """
+    with engine.begin() as conn:
+        for table, df, key_col in [('dim_store', df_dim_store, 'store_id'),
+                                   ('dim_product', df_dim_product, 'product_id'),
+                                   (f'dim_customer{suffix}', df_dim_customer, 'customer_id')]:
+            if incremental or (suffix and table in ('dim_store', 'dim_product')):
+                affected = upsert_dimension(conn, table, df, key_col)
+                print(f"  ✓ {table}: {len(df)} rows checked, {affected} rows affected")
+            else:
+                df.to_sql(table, conn, if_exists='append', index=False)
+                print(f"  ✓ Loaded {table}: {len(df)} rows")
+
+def run_streaming_etl(connection, incremental=False, chunk_size=STREAM_CHUNK_SIZE, keep_previous=False):
+    """Stream sales through validate -> transform -> load in fixed-size chunks (bounded memory)"""
+    suffix = ''
+    if incremental:
+        max_sale_id = get_sales_watermark(connection)
+        existing_date_ids = get_existing_date_ids(connection)
+        print(f"\nLast loaded sale_id: {max_sale_id if max_sale_id is not None else 'none'}")
+    else:
+        if warehouse_is_loaded(connection):
+            # Full reload into shadow tables, swapped in at the end
+            load_sql_schema(connection, drop_existing=False)
+            prepare_shadow_tables(connection)
+            suffix = SHADOW_SUFFIX
+        else:
+            load_sql_schema(connection)
+        max_sale_id = None
+        existing_date_ids = set()
+    
+    print("\n" + "="*50)
+    print("LOADING DIMENSIONS")
+    print("="*50)
+    try:
+        frames = extract_sources(['stores', 'products', 'customers'])
+    except Exception as e:
+        print(f"✗ Error loading source files: {e}")
+        return
+    
+    cleaned, dimension_report = run_quality_checks({
+        'Stores': frames['stores'],
+        'Products': frames['products'],
+        'Customers': frames['customers']
+    })
+    df_dim_store = cleaned['Stores']
+    df_dim_product = cleaned['Products']
+    df_dim_customer = cleaned['Customers'][
+        ['customer_id', 'customer_name', 'gender', 'age', 'age_group', 'city']
+    ]
+    
+    engine = create_warehouse_engine()
+    try:
+        load_dimensions(engine, df_dim_store, df_dim_product, df_dim_customer, incremental, suffix)
+        lookups = build_sales_lookups(df_dim_store, df_dim_product, df_dim_customer, existing_date_ids)
+        
+        print("\n" + "="*50)
+        print("STREAMING SALES")
+        print("="*50)
+        totals = {'read': 0, 'rejected': 0, 'invalid_fk': 0, 'duplicates': 0, 'loaded': 0}
+        sales_quality = None
+        touched_date_ids = set()
+        watermarks = None
+        
+        for chunk_number, df_chunk in enumerate(iter_sales_chunks(chunk_size), 1):
+            totals['read'] += len(df_chunk)
+            if max_sale_id is not None:
+                df_chunk = df_chunk[df_chunk['sale_id'] > max_sale_id]
+            
+            df_chunk, chunk_quality = validate_sales_chunk(df_chunk)
+            rejected = chunk_quality['duplicates'] + chunk_quality['rows_removed_by_rules']
+            sales_quality = merge_table_results(sales_quality, chunk_quality)
+            df_new_dates, df_fact_chunk, invalid_fk = transform_sales_chunk(df_chunk, lookups)
+            ensure_fact_partitions(connection, df_fact_chunk['date_id'].unique(), f'fact_sales{suffix}')
+            
+            with engine.begin() as conn:
+                df_new_sales = load_sales_chunk(conn, df_new_dates, df_fact_chunk, suffix)
+                if incremental:
+                    # Only the inserted rows: a rerun after a failed run re-reads committed chunks
+                    upsert_customer_features(conn, df_new_sales)
+            
+            totals['rejected'] += rejected
+            totals['invalid_fk'] += invalid_fk
+            loaded = len(df_new_sales)
+            totals['duplicates'] += len(df_fact_chunk) - loaded
+            totals['loaded'] += loaded
+            touched_date_ids.update(df_fact_chunk['date_id'].unique().tolist())
+            if not df_fact_chunk.empty:
+                chunk_marks = sales_watermarks(df_fact_chunk, df_chunk)
+                if watermarks is None or chunk_marks['max_sale_id'] > watermarks['max_sale_id']:
+                    watermarks = chunk_marks
+            print(f"  Chunk {chunk_number}: {loaded:,} loaded, {rejected:,} rejected, {invalid_fk:,} invalid FKs ({totals['loaded']:,} total)")
+    except Exception as e:
+        if suffix:
+            print(f"✗ Error streaming sales (live tables untouched): {e}")
+        else:
+            print(f"✗ Error streaming sales (committed chunks are kept): {e}")
+        import traceback
+        traceback.print_exc()
+        return
+    finally:
+        engine.dispose()
+    
+    print(f"\n✓ Streamed {totals['read']:,} sales rows: {totals['loaded']:,} loaded, "
+          f"{totals['rejected']:,} failed validation, {totals['invalid_fk']:,} invalid foreign keys, "
+          f"{totals['duplicates']:,} duplicates skipped")
+    
+    quality_tables = dict(dimension_report['tables'])
+    if sales_quality:
+        quality_tables['Sales'] = sales_quality
+    quality_report = finalize_report({'tables': quality_tables})
+    print_quality_report(quality_report)
+    save_quality_run(connection, quality_report, 'stream-incremental' if incremental else 'stream')
+    
+    # Aggregate
+    if incremental:
+        refresh_sales_rollup(connection, touched_date_ids)
+    elif not build_sales_rollup(connection, suffix):
+        return
+    
+    if suffix:
+        swap_shadow_tables(connection, keep_previous)
+    if not incremental:
+        rebuild_customer_features(connection)
+    update_anomaly_baselines(connection, rebuild=not incremental)
+    if watermarks:
+        set_etl_state(connection, watermarks)
+    bump_data_version(connection)
+
+def build_sales_rollup(connection, suffix=''):
+    """Rebuild the daily store/product rollup from fact_sales (suffix: build the shadow copy)"""
+    print("\n" + "="*50)
+    print("BUILDING AGGREGATE TABLES")
+    print("="*50)
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"TRUNCATE TABLE agg_sales_daily_store_product{suffix}")
+        cursor.execute(f"""
+            INSERT INTO agg_sales_daily_store_product{suffix}
+                (date_id, store_id, product_id, transactions, quantity, revenue, cost, profit)
+            SELECT 
+                date_id,
+                store_id,
+                product_id,
+                COUNT(*),
+                SUM(quantity),
+                SUM(revenue),
+                SUM(cost),
+                SUM(profit)
+            FROM fact_sales{suffix}
+            GROUP BY date_id, store_id, product_id
+        """)
+        rows = cursor.rowcount
+        connection.commit()
+        cursor.close()
+        print(f"  ✓ Loaded agg_sales_daily_store_product{suffix}: {rows} rows")
+        return True
+    except Error as e:
+        print(f"✗ Error building aggregate tables: {e}")
+        return False
+
+def bump_data_version(connection):
+    """Increment the warehouse data version so the web app drops cached results"""
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            INSERT INTO etl_state (state_key, state_value)
+            VALUES ('data_version', '1')
+            ON DUPLICATE KEY UPDATE state_value = CAST(state_value AS UNSIGNED) + 1
+        """)
+        connection.commit()
+        cursor.execute("SELECT state_value FROM etl_state WHERE state_key = 'data_version'")
+        version = cursor.fetchone()[0]
+        cursor.close()
+        print(f"  ✓ Warehouse data version: {version}")
+    except Error as e:
+        print(f"✗ Error updating data version: {e}")
+
+def run_etl(incremental=False, stream=False, chunk_size=STREAM_CHUNK_SIZE, fast_load=False, keep_previous=False):
     """Main ETL process"""
     print("="*50)
-    print("RETAIL BI - ETL PIPELINE")
+    print("RETAIL BI - ETL PIPELINE"
+          + (" (INCREMENTAL)" if incremental else "")
+          + (" (STREAMING)" if stream else ""))
     print("="*50)
     
     # Create database if needed
@@ -433,19 +1490,60 @@ def run_etl():
         print("\n✗ Cannot proceed without database connection")
         return
     
+    if warehouse_is_loaded(connection):
+        try:
+            require_partitioned_fact_sales(connection)
+        except RuntimeError as e:
+            print(f"\n✗ {e}")
+            connection.close()
+            return
+    
+    if incremental and not warehouse_is_loaded(connection):
+        print("\n⚠ Warehouse not loaded yet - running a full load instead")
+        incremental = False
+    elif incremental and has_legacy_date_keys(connection):
+        print("\n⚠ dim_date uses sequential date_ids - running a full load to switch to yyyymmdd keys")
+        incremental = False
+    
+    if stream:
+        run_streaming_etl(connection, incremental, chunk_size, keep_previous)
+    elif incremental:
+        run_incremental_etl(connection)
+    else:
+        run_full_etl(connection, fast_load, keep_previous)
+    
+    connection.close()
+    print("\n" + "="*50)
+    print("ETL PROCESS COMPLETED SUCCESSFULLY!")
+    print("="*50)
+    print("Next: python scripts/train_customer_segments.py --assign-pending  (segments of updated customers)")
+
+def run_full_etl(connection, fast_load=False, keep_previous=False):
+    """Full reload of all source data.
+
+    The first load creates the schema and loads in place. Later reloads go to
+    shadow tables that are swapped in atomically, so dashboards never see
+    empty or partial tables.
+    """
+    swap = warehouse_is_loaded(connection)
+    
     # Load schema
-    load_sql_schema(connection)
+    if swap:
+        load_sql_schema(connection, drop_existing=False)
+        prepare_shadow_tables(connection)
+    else:
+        load_sql_schema(connection)
     
     # Extract
     df_stores, df_products, df_customers, df_sales = extract_excel_data()
     if df_sales is None:
-        connection.close()
         return
     
     # Validate
-    df_stores, df_products, df_customers, df_sales = validate_data(
+    df_stores, df_products, df_customers, df_sales, quality_report = validate_data(
         df_stores, df_products, df_customers, df_sales
     )
+    save_quality_run(connection, quality_report, 'full')
     
     # Transform
     df_dim_date, df_dim_store, df_dim_product, df_dim_customer, df_fact_sales = transform_data(
@@ -453,14 +1551,104 @@ def run_etl():
     )
     
     # Load
-    load_to_database(connection, df_dim_date, df_dim_store, df_dim_product, 
-                    df_dim_customer, df_fact_sales)
+    ensure_fact_partitions(connection, df_fact_sales['date_id'].unique(),
+                           f'fact_sales{SHADOW_SUFFIX}' if swap else 'fact_sales')
+    if swap:
+        if not load_to_shadow_tables(df_dim_date, df_dim_store, df_dim_product,
+                                     df_dim_customer, df_fact_sales, fast_load):
+            return
+        if not build_sales_rollup(connection, SHADOW_SUFFIX):
+            return
+        swap_shadow_tables(connection, keep_previous)
+    else:
+        load_to_database(connection, df_dim_date, df_dim_store, df_dim_product, 
+                        df_dim_customer, df_fact_sales, fast_load)
+        build_sales_rollup(connection)
+    rebuild_customer_features(connection)
+    update_anomaly_baselines(connection, rebuild=True)
+    
+    if not df_fact_sales.empty:
+        set_etl_state(connection, sales_watermarks(df_fact_sales, df_sales))
+    bump_data_version(connection)
+
+def run_incremental_etl(connection):
+    """Delta load: only sales above the sale_id high-water mark, dimensions upserted in place"""
+    max_sale_id = get_sales_watermark(connection)
+    print(f"\nLast loaded sale_id: {max_sale_id if max_sale_id is not None else 'none'}")
+    
+    # Extract
+    df_stores, df_products, df_customers, df_sales = extract_excel_data()
+    if df_sales is None:
+        return
+    
+    if max_sale_id is not None:
+        df_sales = df_sales[df_sales['sale_id'] > max_sale_id].copy()
+    print(f"✓ New sales since last load: {len(df_sales)} rows")
+    
+    # Validate
+    df_stores, df_products, df_customers, df_sales, quality_report = validate_data(
+        df_stores, df_products, df_customers, df_sales
+    )
+    save_quality_run(connection, quality_report, 'incremental')
+    
+    # Transform (existing dates keep their date_id)
+    df_dim_date, df_dim_store, df_dim_product, df_dim_customer, df_fact_sales = transform_data(
+        df_stores, df_products, df_customers, df_sales,
+        existing_date_ids=get_existing_date_ids(connection)
+    )
     
+    # Load (partition DDL commits implicitly, so it runs before the load transaction)
+    ensure_fact_partitions(connection, df_fact_sales['date_id'].unique())
+    watermarks = sales_watermarks(df_fact_sales, df_sales) if not df_fact_sales.empty else None
+    if not load_incremental(df_dim_date, df_dim_store, df_dim_product, df_dim_customer, df_fact_sales, watermarks):
+        return
+    
+    # Aggregate
+    refresh_sales_rollup(connection, df_fact_sales['date_id'].unique())
+    update_anomaly_baselines(connection)
+    bump_data_version(connection)
+
+def run_partition_migration():
+    """Migrate a fact_sales created before partitioning (--migrate-partitions)"""
+    connection = create_database_connection()
+    if not connection:
+        print("\n✗ Cannot proceed without database connection")
+        return
+    if migrate_fact_partitions(connection):
+        bump_data_version(connection)
     connection.close()
-    print("\n" + "="*50)
-    print("ETL PROCESS COMPLETED SUCCESSFULLY!")
-    print("="*50)
 
-if __name__ == '__main__':
-    run_etl()
+def run_rollback():
+    """Restore the warehouse generation kept by the last --keep-previous reload"""
+    connection = create_database_connection()
+    if not connection:
+        print("\n✗ Cannot proceed without database connection")
+        return
+    if rollback_swap(connection):
+        bump_data_version(connection)
+    connection.close()
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Retail BI ETL pipeline')
+    parser.add_argument('--incremental', action='store_true',
+                        help='load only sales newer than the last run and upsert dimensions (no truncate)')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream sales in fixed-size chunks instead of loading the whole file into memory')
+    parser.add_argument('--chunk-size', type=int, default=STREAM_CHUNK_SIZE,
+                        help=f'rows per chunk in --stream mode (default: {STREAM_CHUNK_SIZE})')
+    parser.add_argument('--fast-load', action='store_true',
+                        help='full load: bulk load fact_sales with LOAD DATA LOCAL INFILE (needs local_infile=ON)')
+    parser.add_argument('--keep-previous', action='store_true',
+                        help='full reload: keep the replaced tables as <table>__prev for --rollback')
+    parser.add_argument('--rollback', action='store_true',
+                        help='swap the generation kept by --keep-previous back in and exit')
+    parser.add_argument('--migrate-partitions', action='store_true',
+                        help='rebuild a fact_sales created before monthly partitioning and exit')
+    args = parser.parse_args()
+    if args.migrate_partitions:
+        run_partition_migration()
+    elif args.rollback:
+        run_rollback()
+    else:
+        run_etl(incremental=args.incremental, stream=args.stream, chunk_size=args.chunk_size,
+                fast_load=args.fast_load, keep_previous=args.keep_previous)
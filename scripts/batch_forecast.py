@@ -0,0 +1,235 @@
+"""
+Script to forecast sales for every store x category
+Pulls the monthly series of all store/category pairs in one grouped query,
+fits them in parallel worker processes and writes history + forecast rows to
+forecast_results, which /api/sales-forecast reads. Run it nightly after the ETL.
+
+Usage: python scripts/batch_forecast.py [--model linear|prophet|arima] [--months 12] [--workers 8]
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import os
+import sys
+import time
+import mysql.connector
+from mysql.connector import Error
+import pandas as pd
+
+# Reuse the web app's model fitting
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from forecast_service import (  # noqa: E402
+    MIN_FORECAST_MONTHS, prepare_series, fit_forecast_models, predict_forecast, Prophet, ARIMA
+)
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'BusinessIntelligence',
+    'user': 'root',
+    'password': '12345',  # Change this to your MySQL password
+    'charset': 'utf8mb4'
+}
+
+ALL_STORES = 0
+ALL_CATEGORIES = 'ALL'
+INSERT_BATCH_SIZE = 1000
+
+FORECAST_COLUMNS = [
+    'store_id', 'category', 'model_type', 'arima_order', 'year', 'month', 'month_name',
+    'revenue', 'profit', 'is_forecast', 'revenue_r2', 'profit_r2', 'data_version'
+]
+
+
+def create_forecast_results_table(connection):
+    """Create forecast_results table if it doesn't exist"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS forecast_results (
+            store_id INT NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            model_type VARCHAR(20) NOT NULL,
+            arima_order VARCHAR(20) NOT NULL DEFAULT '',
+            year INT NOT NULL,
+            month INT NOT NULL,
+            month_name VARCHAR(20),
+            revenue DECIMAL(14, 2) NOT NULL,
+            profit DECIMAL(14, 2) NOT NULL,
+            is_forecast BOOLEAN NOT NULL,
+            revenue_r2 DOUBLE NULL,
+            profit_r2 DOUBLE NULL,
+            data_version VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (store_id, category, model_type, arima_order, year, month)
+        )
+    """)
+    connection.commit()
+    cursor.close()
+
+
+def fetch_frame(connection, query, params=None):
+    cursor = connection.cursor()
+    cursor.execute(query, params)
+    df = pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+    cursor.close()
+    return df
+
+
+def get_data_version(connection):
+    df = fetch_frame(connection, "SELECT state_value FROM etl_state WHERE state_key = 'data_version'")
+    return str(df['state_value'].iloc[0]) if not df.empty else '0'
+
+
+def get_sales_table(connection):
+    """The daily rollup when it is populated, fact_sales otherwise"""
+    try:
+        if not fetch_frame(connection, "SELECT 1 AS has_rows FROM agg_sales_daily_store_product LIMIT 1").empty:
+            return 'agg_sales_daily_store_product'
+    except Error:
+        pass
+    return 'fact_sales'
+
+
+def fetch_monthly_series(connection):
+    """Monthly revenue/profit of every store x category in one grouped query"""
+    table = get_sales_table(connection)
+    df = fetch_frame(connection, f"""
+        SELECT
+            f.store_id,
+            p.category,
+            d.year,
+            d.month,
+            d.month_name,
+            SUM(f.revenue) AS revenue,
+            SUM(f.profit) AS profit
+        FROM {table} f
+        JOIN dim_date d ON f.date_id = d.date_id
+        JOIN dim_product p ON f.product_id = p.product_id
+        GROUP BY f.store_id, p.category, d.year, d.month, d.month_name
+    """)
+    df[['revenue', 'profit']] = df[['revenue', 'profit']].astype(float)
+    print(f"✓ Loaded {len(df):,} monthly rows from {table}")
+    return df
+
+
+def build_series(df):
+    """Series per (store, category), plus all-category, all-store and total rollups"""
+    month_cols = ['year', 'month', 'month_name']
+    levels = [
+        (['store_id', 'category'], lambda key: key),
+        (['store_id'], lambda key: (key, ALL_CATEGORIES)),
+        (['category'], lambda key: (ALL_STORES, key)),
+    ]
+    series = {}
+    for group_cols, slice_key in levels:
+        grouped = df.groupby(group_cols + month_cols, as_index=False)[['revenue', 'profit']].sum()
+        for key, group in grouped.groupby(group_cols[0] if len(group_cols) == 1 else group_cols):
+            series[slice_key(key)] = group[month_cols + ['revenue', 'profit']]
+    series[(ALL_STORES, ALL_CATEGORIES)] = df.groupby(month_cols, as_index=False)[['revenue', 'profit']].sum()
+    return series
+
+
+def forecast_series(slice_key, df, model_type, order, forecast_months):
+    """Fit one series (runs in a worker process); returns (slice_key, history rows, forecast rows, accuracy)"""
+    if len(df) < MIN_FORECAST_MONTHS:
+        return slice_key, None, None, None
+    bundle = fit_forecast_models(prepare_series(df), model_type, order)
+    history = bundle['historical'].to_dict(orient='records')
+    return slice_key, history, predict_forecast(bundle, forecast_months), bundle['model_accuracy']
+
+
+def write_results(connection, results, model_type, arima_order, data_version):
+    """Replace this model's forecasts in one transaction"""
+    rows = []
+    for (store_id, category), history, forecast, accuracy in results:
+        for row in history + forecast:
+            rows.append((
+                int(store_id), category, model_type, arima_order,
+                int(row['year']), int(row['month']), row['month_name'],
+                round(float(row['revenue']), 2), round(float(row['profit']), 2),
+                bool(row.get('is_forecast', False)),
+                accuracy['revenue_r2'], accuracy['profit_r2'], data_version
+            ))
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute("DELETE FROM forecast_results WHERE model_type = %s AND arima_order = %s",
+                       (model_type, arima_order))
+        placeholders = ', '.join(['%s'] * len(FORECAST_COLUMNS))
+        for i in range(0, len(rows), INSERT_BATCH_SIZE):
+            cursor.executemany(f"""
+                INSERT INTO forecast_results ({', '.join(FORECAST_COLUMNS)})
+                VALUES ({placeholders})
+            """, rows[i:i + INSERT_BATCH_SIZE])
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Forecast sales for every store x category')
+    parser.add_argument('--model', choices=['linear', 'prophet', 'arima'], default='linear')
+    parser.add_argument('--arima-order', default='1,1,1', help='p,d,q for --model arima')
+    parser.add_argument('--months', type=int, default=12, help='forecast horizon in months')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    if args.model == 'prophet' and Prophet is None:
+        sys.exit("✗ Prophet is not installed")
+    if args.model == 'arima' and ARIMA is None:
+        sys.exit("✗ statsmodels is not installed")
+    order = [int(x) for x in args.arima_order.split(',')] if args.model == 'arima' else None
+    arima_order = ','.join(str(x) for x in order) if order else ''
+
+    print("="*50)
+    print("BATCH SALES FORECAST")
+    print("="*50)
+
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        sys.exit(f"✗ Error connecting to MySQL: {e}")
+
+    try:
+        create_forecast_results_table(connection)
+        data_version = get_data_version(connection)
+        series = build_series(fetch_monthly_series(connection))
+        print(f"✓ Fitting {len(series)} series with {args.model} on {args.workers} workers...")
+
+        started = time.perf_counter()
+        results = []
+        skipped = 0
+        failed = 0
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = [
+                executor.submit(forecast_series, slice_key, df, args.model, order, args.months)
+                for slice_key, df in series.items()
+            ]
+            for future in futures:
+                try:
+                    slice_key, history, forecast, accuracy = future.result()
+                except Exception as e:
+                    print(f"  ⚠ Fit failed: {e}")
+                    failed += 1
+                    continue
+                if history is None:
+                    skipped += 1
+                    continue
+                results.append((slice_key, history, forecast, accuracy))
+        elapsed = time.perf_counter() - started
+        print(f"✓ Fitted {len(results)} series in {elapsed:.1f}s "
+              f"({skipped} with under {MIN_FORECAST_MONTHS} months skipped, {failed} failed)")
+
+        rows = write_results(connection, results, args.model, arima_order, data_version)
+        print(f"✓ Wrote {rows:,} rows to forecast_results (data version {data_version})")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Script to check the query plans of the dashboard queries
+Runs the analytical endpoints of app.py against the warehouse, captures
+every SQL statement they send and EXPLAINs it, reporting whether the fact
+scan is partition-pruned and which index it uses.
+
+Usage: python scripts/check_query_plans.py [--date-start 2024-01-01] [--date-end 2024-03-31]
+"""
+
+import argparse
+import sys
+import os
+import pandas as pd
+
+# app.py imports its sibling modules directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+import app as bi  # noqa: E402
+
+ENDPOINTS = [
+    '/api/dashboard',
+    '/api/kpis',
+    '/api/sales-trend',
+    '/api/store-performance',
+    '/api/product-performance',
+    '/api/category-revenue',
+    '/api/customer-insights',
+    '/api/business-insights',
+    '/api/seasonal-analysis',
+    '/api/anomaly-detection',
+    '/api/customer-segments'
+]
+
+# Indexes each sales table is expected to be read through (warehouse/star_schema.sql)
+INTENDED_INDEXES = {
+    'fact_sales': {'idx_fact_date_store', 'idx_fact_store_date', 'idx_fact_product_date', 'idx_fact_customer_date'},
+    'agg_sales_daily_store_product': {'PRIMARY', 'idx_agg_store_date', 'idx_agg_product_date'}
+}
+
+# Metadata lookups made by the app itself (rollup / data version checks)
+IGNORED_QUERY_MARKERS = ['information_schema', 'etl_state', 'has_rows']
+
+
+def build_scenarios(date_start, date_end):
+    """(name, session, query params) filter combinations the dashboard sends"""
+    dates = {'date_start': date_start, 'date_end': date_end}
+    stores = bi.execute_query("SELECT store_id, region FROM dim_store ORDER BY store_id LIMIT 3")
+    categories = bi.execute_query("SELECT DISTINCT category FROM dim_product ORDER BY category LIMIT 2")
+    admin = {'user_id': 0, 'role': 'admin'}
+
+    scenarios = [('date range', admin, dates)]
+    if not stores.empty:
+        scenarios.append(('date + stores', admin, {**dates, 'stores': ','.join(str(s) for s in stores['store_id'])}))
+        scenarios.append(('date + region', admin, {**dates, 'regions': stores['region'].iloc[0]}))
+        scenarios.append(('store manager', {'user_id': 0, 'role': 'store_manager',
+                                            'store_id': int(stores['store_id'].iloc[0])}, dates))
+    if not categories.empty:
+        scenarios.append(('date + categories', admin, {**dates, 'categories': ','.join(categories['category'])}))
+    return scenarios
+
+
+def capture_queries(client, session_values, endpoint, params):
+    """Call an endpoint and return the analytical SQL templates it executed, with their parameters"""
+    captured = []
+    original_execute_query = bi.execute_query
+
+    def recording_execute_query(query, query_params=None):
+        if not any(marker in query for marker in IGNORED_QUERY_MARKERS):
+            captured.append((query, query_params))
+        return original_execute_query(query, query_params)
+
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess.update(session_values)
+
+    bi._result_cache.clear()  # cached responses would skip the queries
+    bi.execute_query = recording_execute_query
+    try:
+        client.get(endpoint, query_string=params)
+    finally:
+        bi.execute_query = original_execute_query
+    return captured
+
+
+def get_partition_count(table):
+    df = bi.execute_query("""
+        SELECT COUNT(*) AS partitions
+        FROM information_schema.partitions
+        WHERE table_schema = %s AND table_name = %s
+          AND partition_name IS NOT NULL
+    """, [bi.DB_CONFIG['database'], table])
+    return int(df['partitions'].iloc[0]) if not df.empty else 0
+
+
+def check_plan(query, query_params, partition_counts):
+    """EXPLAIN a query with its bound parameters; returns one result row per sales table scan"""
+    with bi.db_connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN {query}", query_params)
+        plan = pd.DataFrame(cursor.fetchall(), columns=[col[0] for col in cursor.description])
+        cursor.close()
+
+    source = 'agg_sales_daily_store_product' if 'agg_sales_daily_store_product' in query else 'fact_sales'
+    results = []
+    for _, step in plan[plan['table'] == 'f'].iterrows():
+        key = step['key']
+        partitions = step.get('partitions')
+        total_partitions = partition_counts.get(source, 0)
+        scanned_partitions = len(str(partitions).split(',')) if partitions else 0
+        pruned = bool(total_partitions) and 0 < scanned_partitions < total_partitions
+        uses_index = key in INTENDED_INDEXES[source] and step['type'] != 'ALL'
+        results.append({
+            'table': source,
+            'partitions': f"{scanned_partitions}/{total_partitions}" if total_partitions else '-',
+            'type': str(step['type']),
+            'key': key,
+            'rows': step['rows'],
+            'ok': pruned or uses_index
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN the dashboard queries of app.py')
+    parser.add_argument('--date-start', default='2024-01-01')
+    parser.add_argument('--date-end', default='2024-03-31')
+    args = parser.parse_args()
+
+    partition_counts = {table: get_partition_count(table) for table in INTENDED_INDEXES}
+    if not partition_counts['fact_sales']:
+        print("⚠ fact_sales is not partitioned - recreate it from warehouse/star_schema.sql and reload")
+
+    client = bi.app.test_client()
+    failures = 0
+    checked = 0
+    for scenario, session_values, params in build_scenarios(args.date_start, args.date_end):
+        print(f"\n=== {scenario} ===")
+        for endpoint in ENDPOINTS:
+            for query, query_params in capture_queries(client, session_values, endpoint, params):
+                try:
+                    results = check_plan(query, query_params, partition_counts)
+                except Exception as e:
+                    print(f"  ✗ {endpoint}: EXPLAIN failed: {e}")
+                    failures += 1
+                    continue
+                for result in results:
+                    checked += 1
+                    status = '✓' if result['ok'] else '✗'
+                    failures += 0 if result['ok'] else 1
+                    print(f"  {status} {endpoint:<28} {result['table']:<30} partitions={result['partitions']:<7} "
+                          f"type={result['type']:<6} key={result['key']} rows={result['rows']}")
+
+    print("\n" + "="*50)
+    print(f"Checked {checked} sales table scans, {failures} without pruning or an intended index")
+    print("="*50)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -31,6 +31,7 @@ def create_notifications_table():
                 notification_id INT AUTO_INCREMENT PRIMARY KEY,
                 user_id INT,
                 store_id INT,
+                product_id INT,
                 type VARCHAR(50) NOT NULL,
                 title VARCHAR(255) NOT NULL,
                 message TEXT NOT NULL,
@@ -42,7 +43,8 @@ def create_notifications_table():
                 INDEX idx_user_id (user_id),
                 INDEX idx_store_id (store_id),
                 INDEX idx_is_read (is_read),
-                INDEX idx_created_at (created_at)
+                INDEX idx_created_at (created_at),
+                INDEX idx_open_dedupe (type, store_id, product_id, is_read)
             )
         """)
         connection.commit()
@@ -0,0 +1,163 @@
+"""
+Script to train the customer segmentation model
+Reads the RFM features the ETL maintains in customer_features, fits a
+MiniBatchKMeans model, writes every customer's segment back to the table and
+persists the scaler + centroids for /api/customer-segments. Run it nightly
+after the ETL; between trainings, --assign-pending assigns customers the ETL
+updated (segment NULL) with the saved model.
+
+Usage: python scripts/train_customer_segments.py [--clusters 4] [--batch-size 4096]
+       python scripts/train_customer_segments.py --assign-pending
+"""
+
+import argparse
+import os
+import sys
+import time
+import mysql.connector
+from mysql.connector import Error
+import numpy as np
+import pandas as pd
+
+# Reuse the web app's segmentation model
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app'))
+
+from customer_segments import (  # noqa: E402
+    train_segment_model, predict_segments, save_segment_model, SegmentModelStore, assign_pending_segments
+)
+
+# Database configuration
+DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'BusinessIntelligence',
+    'user': 'root',
+    'password': '12345',  # Change this to your MySQL password
+    'charset': 'utf8mb4'
+}
+
+FETCH_BATCH_SIZE = 100000
+UPDATE_BATCH_SIZE = 1000
+ASSIGN_BATCH_SIZE = 50000
+
+
+def create_customer_features_table(connection):
+    """Create customer_features table if it doesn't exist"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS customer_features (
+            customer_id INT PRIMARY KEY,
+            first_purchase_date DATE,
+            last_purchase_date DATE,
+            last_store_id INT,
+            transactions INT NOT NULL DEFAULT 0,
+            total_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            total_quantity INT NOT NULL DEFAULT 0,
+            segment INT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_customer_features_store (last_store_id, customer_id),
+            INDEX idx_customer_features_segment (segment)
+        )
+    """)
+    connection.commit()
+    cursor.close()
+
+
+def fetch_features(connection):
+    """All customer feature rows, fetched in batches"""
+    cursor = connection.cursor()
+    cursor.execute("""
+        SELECT customer_id, last_purchase_date, transactions, total_revenue, total_quantity
+        FROM customer_features
+    """)
+    columns = [col[0] for col in cursor.description]
+    frames = []
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not rows:
+            break
+        frames.append(pd.DataFrame(rows, columns=columns))
+    cursor.close()
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def write_segments(connection, customer_ids, segments):
+    """Write every customer's segment back in one transaction"""
+    values = np.column_stack([customer_ids, segments]).astype(np.int64)
+    cursor = connection.cursor()
+    try:
+        for i in range(0, len(values), UPDATE_BATCH_SIZE):
+            batch = values[i:i + UPDATE_BATCH_SIZE]
+            cursor.execute(f"""
+                INSERT INTO customer_features (customer_id, segment)
+                VALUES {', '.join(['(%s, %s)'] * len(batch))}
+                ON DUPLICATE KEY UPDATE segment = VALUES(segment)
+            """, batch.ravel().tolist())
+        connection.commit()
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def assign_pending(connection, model_path):
+    """Assign every customer with segment NULL using the saved model, in batches"""
+    model = SegmentModelStore(model_path).get()
+    if model is None:
+        sys.exit(f"✗ No segment model at {model_path} - train one first")
+
+    total = 0
+    while True:
+        assigned = assign_pending_segments(connection, model, limit=ASSIGN_BATCH_SIZE,
+                                           batch_size=UPDATE_BATCH_SIZE)
+        total += assigned
+        if assigned < ASSIGN_BATCH_SIZE:
+            break
+    print(f"✓ Assigned segments to {total:,} updated customers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the customer segmentation model')
+    parser.add_argument('--clusters', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=4096, help='MiniBatchKMeans batch size')
+    parser.add_argument('--model-path', default=os.environ.get('CUSTOMER_SEGMENT_MODEL', 'data/models/customer_segments.pkl'))
+    parser.add_argument('--assign-pending', action='store_true',
+                        help='Only assign customers updated since training, with the saved model')
+    args = parser.parse_args()
+
+    print("="*50)
+    print("CUSTOMER SEGMENTATION TRAINING")
+    print("="*50)
+
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+    except Error as e:
+        sys.exit(f"✗ Error connecting to MySQL: {e}")
+
+    try:
+        create_customer_features_table(connection)
+        if args.assign_pending:
+            assign_pending(connection, args.model_path)
+            return
+
+        df = fetch_features(connection)
+        print(f"✓ Loaded features of {len(df):,} customers")
+        if len(df) < args.clusters:
+            sys.exit("✗ Not enough customers - run the ETL first")
+
+        started = time.perf_counter()
+        model = train_segment_model(df, n_clusters=args.clusters, batch_size=args.batch_size)
+        segments = predict_segments(model, df)
+        print(f"✓ Trained {args.clusters} segments in {time.perf_counter() - started:.1f}s")
+
+        write_segments(connection, df['customer_id'].to_numpy(dtype=np.int64), segments)
+        print(f"✓ Assigned segments to {len(df):,} customers")
+
+        save_segment_model(model, args.model_path)
+        print(f"✓ Saved model to {args.model_path}")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
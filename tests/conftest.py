@@ -0,0 +1,60 @@
+"""
+Test configuration: the web app and the ETL run as scripts from their own
+directories, so their modules are imported the same way here
+"""
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for folder in ('etl', 'app'):
+    sys.path.insert(0, os.path.join(ROOT, folder))
+
+
+class SqliteConnection:
+    """sqlite3 connection that accepts the %s placeholders of mysql.connector"""
+
+    def __init__(self):
+        self.db = sqlite3.connect(':memory:')
+        self.db.execute("""
+            CREATE TABLE notifications (
+                notification_id INTEGER PRIMARY KEY, type TEXT, title TEXT, message TEXT,
+                severity TEXT, store_id INTEGER, is_read BOOLEAN DEFAULT FALSE
+            )
+        """)
+        self.commits = 0
+
+    def cursor(self):
+        return SqliteCursor(self.db.cursor())
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+
+class SqliteCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace('%s', '?'), params)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def close(self):
+        self.cursor.close()
+
+
+@pytest.fixture
+def notifications_db():
+    """In-memory notifications table (without product_id, like older schemas)"""
+    connection = SqliteConnection()
+    yield connection
+    connection.db.close()
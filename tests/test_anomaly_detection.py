@@ -0,0 +1,139 @@
+"""
+Tests for the day-of-week EWMA anomaly baselines and anomaly notifications
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomaly_detection as ad
+
+BASELINE_COLUMNS = ad.BASELINE_KEYS + ['mean_revenue', 'var_revenue', 'observations', 'last_date_id']
+
+
+def weekly_sales(revenues, start=date(2024, 1, 1), store_id=1, category='Electronics'):
+    """One row per week on the same weekday as start"""
+    days = [start + timedelta(weeks=i) for i in range(len(revenues))]
+    return pd.DataFrame({
+        'date_id': [int(day.strftime('%Y%m%d')) for day in days],
+        'sale_date': days,
+        'store_id': store_id,
+        'category': category,
+        'revenue': [float(r) for r in revenues]
+    })
+
+
+def empty_baselines():
+    return pd.DataFrame(columns=BASELINE_COLUMNS)
+
+
+def test_first_observations_are_averaged_equally():
+    baselines, anomalies = ad.score_days(empty_baselines(), weekly_sales([10, 20, 30]))
+    row = baselines.iloc[0]
+    assert row['day_of_week'] == 0
+    assert row['observations'] == 3
+    assert row['mean_revenue'] == pytest.approx(20.0)
+    assert row['var_revenue'] == pytest.approx(np.var([10, 20, 30]))
+    assert row['last_date_id'] == 20240115
+    assert anomalies.empty
+
+
+def test_mean_decays_with_alpha_after_warmup():
+    warmup = [100] * 5
+    baselines, _ = ad.score_days(empty_baselines(), weekly_sales(warmup + [200]))
+    assert baselines.iloc[0]['mean_revenue'] == pytest.approx(100 + ad.EWMA_ALPHA * 100)
+
+
+def test_weekdays_keep_separate_baselines():
+    monday = weekly_sales([100, 100])
+    tuesday = weekly_sales([500, 500], start=date(2024, 1, 2))
+    baselines, _ = ad.score_days(empty_baselines(), pd.concat([monday, tuesday], ignore_index=True))
+    means = baselines.set_index('day_of_week')['mean_revenue']
+    assert means[0] == pytest.approx(100.0)
+    assert means[1] == pytest.approx(500.0)
+
+
+def test_incremental_scoring_matches_full_replay():
+    sales = weekly_sales([100, 110, 95, 105, 98, 400, 102, 99])
+    full, full_anomalies = ad.score_days(empty_baselines(), sales)
+
+    first, first_anomalies = ad.score_days(empty_baselines(), sales.iloc[:4])
+    second, second_anomalies = ad.score_days(first, sales.iloc[4:])
+
+    assert second['observations'].tolist() == full['observations'].tolist()
+    assert second['mean_revenue'].to_numpy() == pytest.approx(full['mean_revenue'].to_numpy())
+    assert second['var_revenue'].to_numpy() == pytest.approx(full['var_revenue'].to_numpy())
+    assert len(first_anomalies) + len(second_anomalies) == len(full_anomalies)
+
+
+def test_spike_is_flagged_only_after_min_history():
+    history = [100, 104, 96, 102, 98]
+    _, anomalies = ad.score_days(empty_baselines(), weekly_sales(history + [400]))
+    assert len(anomalies) == 1
+    spike = anomalies.iloc[0]
+    assert spike['anomaly_type'] == 'high'
+    assert spike['severity'] == 'critical'
+    assert spike['expected_revenue'] == pytest.approx(100.0)
+
+    _, early = ad.score_days(empty_baselines(), weekly_sales([100, 104, 400]))
+    assert early.empty
+
+
+def test_flat_series_uses_std_floor():
+    _, anomalies = ad.score_days(empty_baselines(), weekly_sales([100] * 5 + [90]))
+    assert len(anomalies) == 0
+    _, anomalies = ad.score_days(empty_baselines(), weekly_sales([100] * 5 + [80]))
+    assert anomalies.iloc[0]['z_score'] == pytest.approx(-4.0)
+    assert anomalies.iloc[0]['anomaly_type'] == 'low'
+
+
+def test_etl_writer_skips_open_notifications(notifications_db):
+    connection = notifications_db
+    cursor = connection.cursor()
+    first = [('anomaly', 'אנומליה בכל הרשת - 2024-03-04', 'הודעה', 'warning', None),
+             ('anomaly', 'אנומליה בסניף 3 - 2024-03-04', 'הודעה', 'critical', 3)]
+    assert ad.write_notifications(connection, cursor, first)['inserted'] == 2
+
+    second = first + [('anomaly', 'אנומליה בסניף 4 - 2024-03-04', 'הודעה', 'warning', 4)]
+    stats = ad.write_notifications(connection, cursor, second)
+    assert stats == {'queued': 3, 'inserted': 1, 'skipped_duplicates': 2}
+
+
+def test_missing_days_are_filled_with_zero_revenue():
+    sales = pd.DataFrame({
+        'date_id': [20240101, 20240103, 20240101],
+        'sale_date': [date(2024, 1, 1), date(2024, 1, 3), date(2024, 1, 1)],
+        'store_id': [1, 1, 2],
+        'category': ['Toys', 'Toys', 'Food'],
+        'revenue': [50.0, 70.0, 20.0]
+    })
+    filled = ad.fill_missing_days(sales).set_index(['store_id', 'category', 'date_id'])['revenue']
+    assert filled[(1, 'Toys', 20240102)] == 0.0
+    assert filled[(1, 'Toys', 20240103)] == 70.0
+    assert filled[(2, 'Food', 20240102)] == 0.0 and filled[(2, 'Food', 20240103)] == 0.0
+    assert len(filled) == 6
+
+
+def test_slices_with_baselines_start_at_first_new_day():
+    sales = weekly_sales([100], start=date(2024, 1, 3))
+    known = pd.DataFrame({'store_id': [1, 2], 'category': ['Electronics', 'Food']})
+    filled = ad.fill_missing_days(sales, known, first_day=date(2024, 1, 1))
+    store_two = filled[filled['store_id'] == 2]
+    assert store_two['date_id'].tolist() == [20240101, 20240102, 20240103]
+    assert (store_two['revenue'] == 0).all()
+    assert filled[filled['store_id'] == 1]['date_id'].min() == 20240101
+
+
+def test_store_outage_is_scored_as_low_anomaly():
+    # A store sells every Monday, then has no sales at all on the sixth one
+    history = weekly_sales([100, 104, 96, 102, 98])
+    other_store = weekly_sales([50] * 6, store_id=2)
+    daily = ad.add_rollup_levels(ad.fill_missing_days(pd.concat([history, other_store], ignore_index=True)))
+    _, anomalies = ad.score_days(empty_baselines(), daily)
+
+    outage = anomalies[(anomalies['store_id'] == 1) & (anomalies['category'] == ad.ALL_CATEGORIES)]
+    assert outage['date_id'].tolist() == [20240205]
+    assert outage.iloc[0]['anomaly_type'] == 'low'
+    assert outage.iloc[0]['revenue'] == 0.0
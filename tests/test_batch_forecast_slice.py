@@ -0,0 +1,93 @@
+"""
+Tests for serving sales forecasts from the nightly forecast_results batch
+"""
+
+import pandas as pd
+import pytest
+from flask import session
+
+import app as bi
+
+
+def slice_for(stores='', categories='', regions='', role='admin', store_id=None):
+    with bi.app.test_request_context('/api/sales-forecast'):
+        session.update(user_id=1, role=role, store_id=store_id)
+        return bi.get_batch_forecast_slice(stores, categories, regions)
+
+
+@pytest.mark.parametrize('stores, categories, expected', [
+    ('', '', (0, 'ALL')),
+    ('7', '', (7, 'ALL')),
+    ('', 'Electronics', (0, 'Electronics')),
+    (' 7 ', ' Electronics ', (7, 'Electronics')),
+    ('7,8', '', None),
+    ('', 'Electronics,Toys', None),
+    ('abc', '', None),
+])
+def test_admin_slice(stores, categories, expected):
+    assert slice_for(stores, categories) == expected
+
+
+def test_regions_are_not_in_batch_grid():
+    assert slice_for(regions='North') is None
+
+
+def test_store_manager_is_pinned_to_own_store():
+    assert slice_for(stores='7,8', categories='Toys', role='manager', store_id=3) == (3, 'Toys')
+
+
+def batch_rows(history_months=6, forecast_months=3):
+    rows = []
+    for i in range(history_months + forecast_months):
+        rows.append({
+            'year': 2024, 'month': i + 1, 'month_name': f'm{i + 1}',
+            'revenue': 100.0 + i, 'profit': 10.0 + i,
+            'is_forecast': int(i >= history_months),
+            'revenue_r2': 0.9, 'profit_r2': None
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture
+def batch_table(monkeypatch):
+    calls = []
+
+    def fake_execute_query(query, params=None):
+        calls.append(params)
+        return batch_rows()
+
+    monkeypatch.setattr(bi, 'table_exists', lambda name: True)
+    monkeypatch.setattr(bi, 'get_data_version', lambda: '5')
+    monkeypatch.setattr(bi, 'execute_query', fake_execute_query)
+    return calls
+
+
+def test_read_batch_forecast_selects_slice_and_version(batch_table):
+    result = bi.read_batch_forecast((4, 'Toys'), 'linear', '1,1,1', 3, '2023-01-01', '2024-12-31')
+    assert batch_table == [[4, 'Toys', 'linear', '1,1,1', '5']]
+    assert len(result['historical']) == 6
+    assert [row['month'] for row in result['forecast']] == [7, 8, 9]
+    assert all(row['is_forecast'] for row in result['forecast'])
+    assert result['model_accuracy'] == {'revenue_r2': 0.9, 'profit_r2': None}
+    assert result['model_cache'] == 'batch'
+
+
+def test_read_batch_forecast_trims_horizon(batch_table):
+    result = bi.read_batch_forecast((0, 'ALL'), 'linear', '1,1,1', 2, '2023-01-01', '2024-12-31')
+    assert [row['month'] for row in result['forecast']] == [7, 8]
+
+
+def test_read_batch_forecast_needs_full_horizon(batch_table):
+    assert bi.read_batch_forecast((0, 'ALL'), 'linear', '1,1,1', 6, '2023-01-01', '2024-12-31') is None
+
+
+def test_read_batch_forecast_needs_whole_history_unless_forced(batch_table):
+    args = ((0, 'ALL'), 'linear', '1,1,1', 3, '2024-03-01', '2024-12-31')
+    assert bi.read_batch_forecast(*args) is None
+    assert bi.read_batch_forecast(*args, force=True) is not None
+
+
+def test_read_batch_forecast_without_slice_or_table(monkeypatch):
+    assert bi.read_batch_forecast(None, 'linear', '1,1,1', 3, '2023-01-01', '2024-12-31') is None
+    monkeypatch.setattr(bi, 'table_exists', lambda name: False)
+    assert bi.read_batch_forecast((0, 'ALL'), 'linear', '1,1,1', 3, '2023-01-01', '2024-12-31') is None
@@ -0,0 +1,130 @@
+"""
+Tests for the additive customer_features maintenance of incremental loads
+"""
+
+import re
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import etl_pipeline as etl
+
+
+def fact_rows(rows):
+    """(sale_id, date_id, store_id, customer_id, quantity, revenue) tuples as fact rows"""
+    df = pd.DataFrame(rows, columns=['sale_id', 'date_id', 'store_id', 'customer_id', 'quantity', 'revenue'])
+    return df.assign(product_id=1, cost=df['revenue'] * 0.6, profit=df['revenue'] * 0.4)[etl.FACT_COLUMNS]
+
+
+class MySQLUpsertConnection:
+    """Runs the MySQL upsert statements of etl_pipeline on SQLite.
+
+    ON DUPLICATE KEY UPDATE becomes ON CONFLICT DO UPDATE; like MySQL,
+    SQLite evaluates the assignments against the row as it was before the update.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, statement, params=None):
+        sql = str(statement).replace('ON DUPLICATE KEY UPDATE', 'ON CONFLICT (customer_id) DO UPDATE SET')
+        sql = re.sub(r'VALUES\((\w+)\)', r'excluded.\1', sql)
+        sql = sql.replace('LEAST(', 'MIN(').replace('GREATEST(', 'MAX(').replace('IF(', 'IIF(')
+        return self.conn.execute(text(sql), params)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE fact_sales (
+                {', '.join(f'{col} NUMERIC' for col in etl.FACT_COLUMNS)},
+                PRIMARY KEY (sale_id, date_id)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE customer_features (
+                customer_id INTEGER PRIMARY KEY, first_purchase_date TEXT, last_purchase_date TEXT,
+                last_store_id INTEGER, transactions INTEGER NOT NULL DEFAULT 0,
+                total_revenue NUMERIC NOT NULL DEFAULT 0, total_quantity INTEGER NOT NULL DEFAULT 0,
+                segment INTEGER
+            )
+        """))
+    yield engine
+    engine.dispose()
+
+
+def features(engine):
+    with engine.connect() as conn:
+        df = pd.read_sql("SELECT * FROM customer_features ORDER BY customer_id", conn)
+    return df.set_index('customer_id')
+
+
+def test_deltas_per_customer():
+    deltas = etl.customer_feature_deltas(fact_rows([
+        (1, 20240110, 3, 7, 2, 20.0),
+        (2, 20240103, 4, 7, 1, 5.5),
+        (3, 20240110, 5, 7, 1, 4.5),
+        (4, 20240105, 1, 8, 3, 30.0),
+    ])).set_index('customer_id')
+
+    assert deltas.loc[7, 'transactions'] == 3
+    assert deltas.loc[7, 'total_quantity'] == 4
+    assert deltas.loc[7, 'total_revenue'] == pytest.approx(30.0)
+    assert deltas.loc[7, 'first_purchase_date'] == date(2024, 1, 3)
+    assert deltas.loc[7, 'last_purchase_date'] == date(2024, 1, 10)
+    # Latest day, then highest sale_id
+    assert deltas.loc[7, 'last_store_id'] == 5
+    assert deltas.loc[8, 'transactions'] == 1
+
+
+def test_upserts_add_up_to_one_load(engine):
+    first = fact_rows([(1, 20240105, 3, 7, 2, 20.0), (2, 20240106, 1, 8, 1, 10.0)])
+    second = fact_rows([(3, 20240102, 4, 7, 1, 5.0), (4, 20240120, 6, 7, 3, 12.0)])
+    with engine.begin() as conn:
+        etl.upsert_customer_features(MySQLUpsertConnection(conn), first)
+        conn.execute(text("UPDATE customer_features SET segment = 2"))
+        etl.upsert_customer_features(MySQLUpsertConnection(conn), second)
+
+    df = features(engine)
+    expected = etl.customer_feature_deltas(pd.concat([first, second])).set_index('customer_id')
+    for column in ['transactions', 'total_quantity', 'last_store_id']:
+        assert df[column].tolist() == expected[column].tolist()
+    assert df['total_revenue'].tolist() == pytest.approx(expected['total_revenue'].tolist())
+    assert df.loc[7, 'first_purchase_date'] == '2024-01-02'
+    assert df.loc[7, 'last_purchase_date'] == '2024-01-20'
+    # Changed customers wait for a new segment assignment
+    assert pd.isna(df.loc[7, 'segment'])
+    assert df.loc[8, 'segment'] == 2
+
+
+def test_late_sale_keeps_last_store(engine):
+    with engine.begin() as conn:
+        etl.upsert_customer_features(MySQLUpsertConnection(conn), fact_rows([(1, 20240110, 3, 7, 1, 10.0)]))
+        etl.upsert_customer_features(MySQLUpsertConnection(conn), fact_rows([(2, 20240101, 9, 7, 1, 10.0)]))
+    df = features(engine)
+    assert df.loc[7, 'last_store_id'] == 3
+    assert df.loc[7, 'last_purchase_date'] == '2024-01-10'
+
+
+def test_rerun_of_committed_chunk_is_not_counted_twice(engine):
+    chunk = fact_rows([(1, 20240105, 3, 7, 2, 20.0), (2, 20240106, 3, 7, 1, 10.0)])
+    no_dates = pd.DataFrame({'date_id': []})
+    for rerun_chunk in (chunk, pd.concat([chunk, fact_rows([(3, 20240107, 3, 7, 1, 5.0)])])):
+        with engine.begin() as conn:
+            df_new_sales = etl.load_sales_chunk(conn, no_dates, rerun_chunk)
+            etl.upsert_customer_features(MySQLUpsertConnection(conn), df_new_sales)
+
+    df = features(engine)
+    assert df.loc[7, 'transactions'] == 3
+    assert df.loc[7, 'total_revenue'] == pytest.approx(35.0)
+    assert df.loc[7, 'total_quantity'] == 4
+
+
+def test_no_new_sales_is_a_noop(engine):
+    with engine.begin() as conn:
+        assert etl.upsert_customer_features(MySQLUpsertConnection(conn), fact_rows([])) == 0
+    assert features(engine).empty
@@ -0,0 +1,71 @@
+"""
+Tests for /api/customer-segments on the trained-model path: read-only and not
+cached while customers wait for segment assignment
+"""
+
+import pandas as pd
+import pytest
+import app as bi
+from result_cache import ResultCache
+
+MODEL = {'n_clusters': 4, 'trained_at': '2024-06-01 02:00:00', 'reference_date': '2024-05-31'}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(bi.segment_models, 'get', lambda: MODEL)
+    monkeypatch.setattr(bi, 'table_exists', lambda table: True)
+    monkeypatch.setattr(bi, 'get_data_version', lambda: '1')
+    monkeypatch.setattr(bi, '_result_cache', ResultCache(1024 * 1024, 60))
+
+    def no_writes():
+        raise AssertionError('the endpoint must not open a write connection')
+
+    monkeypatch.setattr(bi, 'db_connection', no_writes)
+
+    client = bi.app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, role='admin', store_id=None)
+    return client
+
+
+def fake_queries(monkeypatch, pending):
+    queries = []
+
+    def fake_execute_query(query, params=None):
+        queries.append(query)
+        if 'segment IS NULL' in query:
+            return pd.DataFrame([{'pending': pending}])
+        if 'GROUP BY cf.segment' in query:
+            return pd.DataFrame([{'segment': 0, 'customers_count': 3, 'avg_transactions': 2.0, 'avg_revenue': 10.0,
+                                  'avg_order_value': 5.0, 'avg_quantity': 4.0}])
+        return pd.DataFrame([{'customer_id': 1, 'age_group': '25-34', 'gender': 'F', 'segment': 0}])
+
+    monkeypatch.setattr(bi, 'execute_query', fake_execute_query)
+    return queries
+
+
+def test_pending_customers_are_reported_and_not_cached(client, monkeypatch):
+    queries = fake_queries(monkeypatch, pending=7)
+    data = client.get('/api/customer-segments').get_json()
+    assert data['source'] == 'model'
+    assert data['model']['pending_customers'] == 7
+    assert not any(word in q for q in queries for word in ('INSERT', 'UPDATE'))
+
+    first = len(queries)
+    client.get('/api/customer-segments')
+    assert len(queries) == 2 * first
+
+
+def test_fully_assigned_segments_are_cached(client, monkeypatch):
+    queries = fake_queries(monkeypatch, pending=0)
+    client.get('/api/customer-segments')
+    first = len(queries)
+    assert client.get('/api/customer-segments').get_json()['model']['pending_customers'] == 0
+    assert len(queries) == first
+
+
+def test_clusters_must_match_the_trained_model(client, monkeypatch):
+    fake_queries(monkeypatch, pending=0)
+    assert client.get('/api/customer-segments?clusters=6').status_code == 400
+    assert client.get('/api/customer-segments?clusters=4').status_code == 200
@@ -0,0 +1,118 @@
+"""
+Tests for /api/dashboard: panels built from grouped SQL aggregates
+"""
+
+import pandas as pd
+import pytest
+import app as bi
+from dashboard_panels import build_dashboard_panels
+from result_cache import ResultCache
+
+SALES_GRAIN = ['year', 'quarter', 'quarter_name', 'month', 'month_name',
+               'store_id', 'store_name', 'city', 'region', 'category']
+
+
+def raw_sales():
+    """Sale-level rows across two years, two stores and two categories"""
+    rows = []
+    sale_id = 0
+    for year in (2023, 2024):
+        for month in (1, 2, 4):
+            for store_id, city in ((1, 'Haifa'), (2, 'Eilat')):
+                for category, revenue in (('Toys', 10.0), ('Food', 4.0)):
+                    for _ in range(store_id + month % 3):
+                        sale_id += 1
+                        rows.append({
+                            'sale_id': sale_id, 'year': year, 'quarter': (month - 1) // 3 + 1,
+                            'quarter_name': f'Q{(month - 1) // 3 + 1}', 'month': month, 'month_name': f'M{month}',
+                            'store_id': store_id, 'store_name': f'Store {store_id}', 'city': city,
+                            'region': 'North' if store_id == 1 else 'South', 'category': category,
+                            'quantity': 2, 'revenue': revenue * store_id + year - 2023, 'profit': revenue / 2
+                        })
+    return pd.DataFrame(rows)
+
+
+def grouped_sales(df):
+    """What the dashboard's grouped sales query returns for these rows"""
+    return df.groupby(SALES_GRAIN, as_index=False).agg(
+        quantity=('quantity', 'sum'), revenue=('revenue', 'sum'),
+        profit=('profit', 'sum'), transactions=('sale_id', 'count')
+    )
+
+
+def test_panels_from_grouped_sales_match_sale_level_totals():
+    df = raw_sales()
+    panels = build_dashboard_panels(grouped_sales(df), pd.DataFrame(), pd.DataFrame())
+
+    kpis = panels['kpis']
+    assert kpis['total_transactions'] == len(df)
+    assert kpis['total_revenue'] == pytest.approx(df['revenue'].sum())
+    assert kpis['avg_order_value'] == pytest.approx(df['revenue'].mean())
+    assert kpis['total_quantity'] == df['quantity'].sum()
+
+    trend = pd.DataFrame(panels['sales_trend'])
+    expected = df.groupby(['year', 'month']).agg(revenue=('revenue', 'sum'), transactions=('sale_id', 'count'))
+    assert list(zip(trend['year'], trend['month'])) == list(expected.index)
+    assert trend['revenue'].tolist() == pytest.approx(expected['revenue'].tolist())
+    assert trend['transactions'].tolist() == expected['transactions'].tolist()
+
+    stores = pd.DataFrame(panels['store_performance'])
+    assert stores['store_id'].tolist() == [2, 1]
+    assert stores['transactions'].tolist() == [int((df['store_id'] == 2).sum()), int((df['store_id'] == 1).sum())]
+
+    categories = pd.DataFrame(panels['category_revenue'])
+    assert categories['category'].tolist() == ['Toys', 'Food']
+    assert categories['revenue'].sum() == pytest.approx(df['revenue'].sum())
+
+    quarterly = pd.DataFrame(panels['seasonal_analysis']['quarterly'])
+    q1_2024 = df[(df['year'] == 2024) & (df['quarter'] == 1)]
+    row = quarterly[(quarterly['year'] == 2024) & (quarterly['quarter'] == 1)].iloc[0]
+    assert row['avg_revenue'] == pytest.approx(q1_2024['revenue'].mean())
+
+    monthly = pd.DataFrame(panels['seasonal_analysis']['monthly'])
+    assert monthly['year_count'].tolist() == [2, 2, 2]
+    january = df[df['month'] == 1].groupby('year')['revenue'].sum().mean()
+    assert monthly.loc[monthly['month'] == 1, 'avg_revenue'].iloc[0] == pytest.approx(january)
+
+
+def test_empty_slice():
+    panels = build_dashboard_panels(pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+    assert panels['kpis'] == {}
+    assert panels['seasonal_analysis'] == {'quarterly': [], 'monthly': [], 'insights': []}
+
+
+def test_dashboard_reads_rollup_and_fact_sales_only_for_customers(monkeypatch):
+    df = raw_sales()
+    queries = []
+
+    def fake_execute_query(query, params=None):
+        queries.append(query)
+        if 'c.age_group' in query:
+            return pd.DataFrame([{'age_group': '25-34', 'gender': 'F', 'customer_count': 3,
+                                  'revenue': 50.0, 'avg_revenue_per_customer': 12.5}])
+        if 'p.product_name' in query:
+            return pd.DataFrame([{'category': 'Toys', 'brand': 'B', 'product_name': 'Ball', 'total_quantity': 4,
+                                  'revenue': 40.0, 'profit': 20.0, 'sales_count': 2}])
+        return grouped_sales(df)
+
+    monkeypatch.setattr(bi, 'execute_query', fake_execute_query)
+    monkeypatch.setattr(bi, 'route_sales_source', lambda needs_sale_grain=False: {
+        'table': bi.SALES_ROLLUP_TABLE,
+        'transactions': 'SUM(f.transactions)',
+        'avg_revenue': 'SUM(f.revenue) / SUM(f.transactions)'
+    })
+    monkeypatch.setattr(bi, 'get_data_version', lambda: '1')
+    monkeypatch.setattr(bi, '_result_cache', ResultCache(1024 * 1024, 60))
+
+    client = bi.app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, role='admin', store_id=None)
+    data = client.get('/api/dashboard?date_start=2023-01-01&date_end=2024-12-31').get_json()
+
+    assert len(queries) == 3
+    fact_queries = [q for q in queries if 'FROM fact_sales' in q]
+    assert len(fact_queries) == 1 and 'COUNT(DISTINCT c.customer_id)' in fact_queries[0]
+    assert all('GROUP BY' in q for q in queries)
+    assert data['kpis']['total_transactions'] == len(df)
+    assert data['product_performance'][0]['product_name'] == 'Ball'
+    assert data['customer_insights'][0]['customer_count'] == 3
@@ -0,0 +1,161 @@
+"""
+Tests for loading sales into the partitioned fact table: sale_id dedupe and
+the partition layout helpers
+"""
+
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+import etl_pipeline as etl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def fact_rows(sale_ids, date_id=20240105, customer_id=1, store_id=1, revenue=10.0):
+    return pd.DataFrame({
+        'sale_id': sale_ids,
+        'date_id': date_id,
+        'store_id': store_id,
+        'product_id': 1,
+        'customer_id': customer_id,
+        'quantity': 1,
+        'revenue': revenue,
+        'cost': 6.0,
+        'profit': revenue - 6.0
+    })
+
+
+@pytest.fixture
+def engine():
+    """SQLite stand-in for the warehouse, keyed like the partitioned fact_sales"""
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            CREATE TABLE fact_sales (
+                {', '.join(f'{col} NUMERIC' for col in etl.FACT_COLUMNS)},
+                PRIMARY KEY (sale_id, date_id)
+            )
+        """))
+        conn.execute(text("CREATE TABLE dim_date (date_id INTEGER PRIMARY KEY)"))
+    yield engine
+    engine.dispose()
+
+
+def fact_sale_ids(engine):
+    with engine.connect() as conn:
+        return sorted(row[0] for row in conn.execute(text("SELECT sale_id FROM fact_sales")))
+
+
+def test_exclude_loaded_sales_matches_sale_id_only(engine):
+    with engine.begin() as conn:
+        fact_rows([1, 2]).to_sql('fact_sales', conn, if_exists='append', index=False)
+        # Same sale ids under another date: the (sale_id, date_id) key would accept them
+        new = etl.exclude_loaded_sales(conn, fact_rows([2, 3], date_id=20240210))
+    assert new['sale_id'].tolist() == [3]
+
+
+def test_exclude_loaded_sales_batches_lookups(engine, monkeypatch):
+    monkeypatch.setattr(etl, 'SALE_ID_LOOKUP_BATCH', 2)
+    with engine.begin() as conn:
+        fact_rows([1, 3, 5]).to_sql('fact_sales', conn, if_exists='append', index=False)
+        new = etl.exclude_loaded_sales(conn, fact_rows([1, 2, 3, 4, 5, 6]))
+    assert new['sale_id'].tolist() == [2, 4, 6]
+
+
+def test_rerun_of_loaded_chunk_inserts_nothing(engine):
+    chunk = fact_rows([10, 11, 12])
+    new_dates = pd.DataFrame({'date_id': [20240105]})
+    with engine.begin() as conn:
+        assert len(etl.load_sales_chunk(conn, new_dates, chunk)) == 3
+    with engine.begin() as conn:
+        inserted = etl.load_sales_chunk(conn, new_dates.iloc[:0], fact_rows([11, 12, 13], date_id=20240106))
+    assert inserted['sale_id'].tolist() == [13]
+    assert fact_sale_ids(engine) == [10, 11, 12, 13]
+
+
+def test_fact_sales_ddl_is_partitioned(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    ddl = etl.fact_sales_ddl('fact_sales__migrate')
+    assert ddl.startswith('CREATE TABLE fact_sales__migrate (')
+    assert 'PRIMARY KEY (sale_id, date_id)' in ddl
+    assert 'PARTITION BY RANGE (date_id)' in ddl
+    assert 'FOREIGN KEY' not in ddl
+
+
+def test_month_partitions_cover_range():
+    assert etl.month_partitions([20231215, 20240203]) == [
+        ('p202312', 20240101), ('p202401', 20240201), ('p202402', 20240301)
+    ]
+
+
+class FakeCursor:
+    def __init__(self, partitions):
+        self.partitions = partitions
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return (self.partitions,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, partitions):
+        self.partitions = partitions
+
+    def cursor(self):
+        return FakeCursor(self.partitions)
+
+
+def test_unpartitioned_fact_sales_stops_the_load():
+    with pytest.raises(RuntimeError, match='--migrate-partitions'):
+        etl.require_partitioned_fact_sales(FakeConnection(partitions=0))
+    etl.require_partitioned_fact_sales(FakeConnection(partitions=25))
+
+
+def test_schema_statements_split_cleanly(monkeypatch):
+    """load_sql_schema splits the schema on ';', so comments must not contain one"""
+    monkeypatch.chdir(ROOT)
+    with open('warehouse/star_schema.sql', 'r', encoding='utf-8') as f:
+        statements = [s.strip() for s in f.read().split(';') if s.strip()]
+    for statement in statements:
+        code = '\n'.join(line for line in statement.splitlines() if not line.strip().startswith('--')).strip()
+        assert code.split()[0].upper() in ('CREATE', 'DROP', 'ALTER', 'INSERT'), statement[:80]
+
+
+def test_fast_load_rebuilds_indexes_once_after_fallback(engine, monkeypatch):
+    calls = []
+    dropped = [('idx_fact_product', ['product_id'], False)]
+    monkeypatch.setattr(etl, 'drop_secondary_indexes', lambda table: calls.append('drop') or dropped)
+    monkeypatch.setattr(etl, 'rebuild_secondary_indexes', lambda table, indexes: calls.append(('rebuild', indexes)))
+
+    def failing_bulk_load(table, df):
+        calls.append('bulk')
+        raise etl.Error('local_infile is disabled')
+
+    monkeypatch.setattr(etl, 'bulk_load_table', failing_bulk_load)
+    etl.load_fact_table(engine, fact_rows([1, 2]), 'fact_sales', fast_load=True)
+
+    assert calls == ['drop', 'bulk', ('rebuild', dropped)]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM fact_sales")).scalar() == 2
+
+
+def test_run_etl_reports_unpartitioned_fact_sales(monkeypatch, capsys):
+    connection = FakeConnection(partitions=0)
+    closed = []
+    connection.close = lambda: closed.append(True)
+    monkeypatch.setattr(etl, 'create_database_if_not_exists', lambda: None)
+    monkeypatch.setattr(etl, 'create_database_connection', lambda: connection)
+    monkeypatch.setattr(etl, 'warehouse_is_loaded', lambda conn: True)
+    monkeypatch.setattr(etl, 'run_full_etl', lambda *args: pytest.fail('loaded into an unpartitioned fact_sales'))
+
+    etl.run_etl()
+    assert '--migrate-partitions' in capsys.readouterr().out
+    assert closed == [True]
@@ -0,0 +1,58 @@
+"""
+Tests for export job expiry: periodic sweep and files kept while downloaded
+"""
+
+import os
+import time
+
+from export_jobs import ExportJobManager
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def write_artifact(path, job_id):
+    with open(path, 'w') as f:
+        f.write('sale_id\n1\n')
+
+
+def test_download_keeps_file_until_finished(tmp_path):
+    jobs = ExportJobManager(str(tmp_path), max_workers=1, ttl_seconds=0.3, sweep_interval=3600)
+    job_id = jobs.submit(1, 'csv', 'sales.csv', write_artifact)['job_id']
+    wait_for(lambda: jobs.get(job_id, 1)['status'] == 'completed')
+
+    job = jobs.open_download(job_id, 1)
+    assert jobs.open_download(job_id, 2) is None
+    time.sleep(0.35)
+    jobs.cleanup_expired()
+    assert os.path.exists(job['path'])
+
+    jobs.finish_download(job_id)
+    jobs.cleanup_expired()
+    assert os.path.exists(job['path'])
+    time.sleep(0.35)
+    jobs.cleanup_expired()
+    assert not os.path.exists(job['path'])
+    assert jobs.get(job_id, 1) is None
+
+
+def test_sweeper_removes_expired_jobs_without_requests(tmp_path):
+    jobs = ExportJobManager(str(tmp_path), max_workers=1, ttl_seconds=0, sweep_interval=0.05)
+    job_id = jobs.submit(1, 'csv', 'sales.csv', write_artifact)['job_id']
+    wait_for(lambda: not os.listdir(tmp_path) and job_id not in jobs._jobs)
+
+
+def test_failed_job_removes_partial_file(tmp_path):
+    def failing_writer(path, job_id):
+        write_artifact(path, job_id)
+        raise ValueError('query failed')
+
+    jobs = ExportJobManager(str(tmp_path), max_workers=1, ttl_seconds=3600, sweep_interval=3600)
+    job_id = jobs.submit(1, 'csv', 'sales.csv', failing_writer)['job_id']
+    wait_for(lambda: jobs.get(job_id, 1)['status'] == 'failed')
+    assert jobs.get(job_id, 1)['error'] == 'query failed'
+    assert not os.listdir(tmp_path)
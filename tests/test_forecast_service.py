@@ -0,0 +1,135 @@
+"""
+Tests for the forecast model registry: one fit per model, disk reuse and
+cleanup of old data versions
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from forecast_service import ForecastService, predict_forecast
+
+
+def monthly_series(months=12):
+    return pd.DataFrame({
+        'year': [2023 + i // 12 for i in range(months)],
+        'month': [i % 12 + 1 for i in range(months)],
+        'month_name': ['m'] * months,
+        'revenue': [1000.0 + 50 * i for i in range(months)],
+        'profit': [200.0 + 10 * i for i in range(months)]
+    })
+
+
+class SlowLoader:
+    """Series loader that counts calls and holds each one open for a while"""
+
+    def __init__(self, months=12, delay=0.2):
+        self.months = months
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, spec):
+        self.calls += 1
+        time.sleep(self.delay)
+        return monthly_series(self.months)
+
+
+def spec(store='ALL'):
+    return {'query': f"SELECT ... store={store}", 'params': [], 'model_type': 'linear', 'order': None}
+
+
+@pytest.fixture
+def service_factory(tmp_path):
+    services = []
+
+    def create(loader):
+        service = ForecastService(str(tmp_path / 'models'), loader)
+        services.append(service)
+        return service
+
+    yield create
+    for service in services:
+        service._executor.shutdown(wait=True)
+
+
+def test_concurrent_requests_share_one_fit(service_factory):
+    loader = SlowLoader()
+    service = service_factory(loader)
+    results = []
+
+    def request():
+        results.append(service.get_model(spec(), '1'))
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loader.calls == 1
+    assert service.fits == 1
+    assert sorted(source for _, source in results) == ['fit'] + ['memory'] * 4
+    assert service.memory_hits == 4
+    assert len({id(bundle) for bundle, _ in results}) == 1
+    assert service._fit_locks == {}
+
+
+def test_different_models_fit_in_parallel(service_factory):
+    loader = SlowLoader(delay=0.3)
+    service = service_factory(loader)
+    threads = [threading.Thread(target=service.get_model, args=(spec(store), '1')) for store in (1, 2, 3)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loader.calls == 3
+    assert time.monotonic() - started < 0.3 * 3
+
+
+def test_fitted_model_is_reused_from_disk(service_factory):
+    first = service_factory(SlowLoader(delay=0))
+    bundle, source = first.get_model(spec(), '1')
+    assert source == 'fit'
+
+    loader = SlowLoader(delay=0)
+    second = service_factory(loader)
+    reloaded, source = second.get_model(spec(), '1')
+    assert source == 'disk'
+    assert loader.calls == 0
+    assert predict_forecast(reloaded, 3) == predict_forecast(bundle, 3)
+
+
+def test_short_series_has_no_model(service_factory):
+    service = service_factory(SlowLoader(months=2, delay=0))
+    assert service.get_model(spec(), '1') == (None, 'fit')
+
+
+def test_cleanup_drops_other_versions(service_factory, tmp_path):
+    service = service_factory(SlowLoader(delay=0))
+    service.get_model(spec(), '1')
+    service.get_model(spec(), '2')
+
+    service.cleanup(keep_version='2')
+    assert os.listdir(tmp_path / 'models') == ['v2']
+    assert [version for _, version in service._memory] == ['2']
+
+
+def test_new_data_version_refits_tracked_models(service_factory, tmp_path):
+    loader = SlowLoader(delay=0)
+    service = service_factory(loader)
+    service.on_data_version('1')
+    service.get_model(spec(1), '1')
+    service.get_model(spec(2), '1')
+
+    service.on_data_version('2')
+    service._executor.shutdown(wait=True)
+
+    assert loader.calls == 4
+    assert service.refits == 2
+    assert os.listdir(tmp_path / 'models') == ['v2']
+    assert {version for _, version in service._memory} == {'2'}
+    assert service.get_model(spec(1), '2')[1] == 'memory'
@@ -0,0 +1,49 @@
+"""
+Tests for the buffered NotificationWriter: dedupe against open notifications
+and automatic flushes every batch_size notifications
+"""
+
+from notifications import NotificationWriter
+
+
+def write_anomaly_notifications(connection, store_ids):
+    writer = NotificationWriter(connection, with_product_id=False)
+    for store_id in store_ids:
+        writer.add('anomaly', f'אנומליה במכירות - {store_id}', 'הודעה', 'warning', store_id)
+    return writer.flush()
+
+
+def test_open_chain_level_notifications_are_not_duplicated(notifications_db):
+    assert write_anomaly_notifications(notifications_db, [None, 3])['inserted'] == 2
+
+    stats = write_anomaly_notifications(notifications_db, [None, 3, 4])
+    assert stats['inserted'] == 1
+    assert stats['skipped_duplicates'] == 2
+    count = notifications_db.db.execute("SELECT COUNT(*) FROM notifications WHERE store_id IS NULL").fetchone()[0]
+    assert count == 1
+
+
+def test_chain_level_notifications_without_store_rows(notifications_db):
+    write_anomaly_notifications(notifications_db, [None])
+    assert write_anomaly_notifications(notifications_db, [None])['skipped_duplicates'] == 1
+
+
+def test_buffer_is_flushed_every_batch_size(notifications_db):
+    writer = NotificationWriter(notifications_db, batch_size=3, with_product_id=False)
+    for i in range(7):
+        writer.add('reorder', f'הזמנה אוטומטית - {i}', 'הודעה', 'warning', 1)
+        assert len(writer._pending) < 3
+    assert notifications_db.commits == 2
+    assert writer.stats() == {'queued': 7, 'inserted': 6, 'skipped_duplicates': 0}
+
+    assert writer.flush()['inserted'] == 7
+    assert notifications_db.db.execute("SELECT COUNT(*) FROM notifications").fetchone()[0] == 7
+
+
+def test_duplicates_are_skipped_across_flushes(notifications_db):
+    writer = NotificationWriter(notifications_db, batch_size=2, with_product_id=False)
+    for title in ('א', 'ב', 'א', 'ג', 'ב'):
+        writer.add('reorder', title, 'הודעה', 'warning', 1)
+    stats = writer.flush()
+    assert stats['inserted'] == 3
+    assert stats['skipped_duplicates'] == 2
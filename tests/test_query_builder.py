@@ -0,0 +1,167 @@
+"""
+Tests for the bound-parameter query builder and the per-connection prepared
+statement cache
+"""
+
+import pytest
+from mysql.connector import Error
+from mysql.connector.connection import MySQLConnection
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+import app as bi
+from query_builder import SqlConditions, PreparedStatementCache, in_list_size, prepared_statement_stats
+
+
+class FakeServerConnection(MySQLConnection):
+    """Real mysql.connector connection whose server round trips are answered in memory"""
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+        self.prepared = []
+        self.closed_statements = []
+
+    def is_connected(self):
+        return True
+
+    def cmd_stmt_prepare(self, statement, **kwargs):
+        self.prepared.append(statement)
+        return {
+            'statement_id': len(self.prepared),
+            'parameters': [('?', 253)] * statement.count(b'?'),
+            'columns': []
+        }
+
+    def cmd_stmt_reset(self, statement_id, **kwargs):
+        pass
+
+    def cmd_stmt_close(self, statement_id, **kwargs):
+        self.closed_statements.append(statement_id)
+
+    def cmd_stmt_execute(self, statement_id, data=(), parameters=(), flags=0, **kwargs):
+        self.last_params = tuple(data)
+        return (2, [('store_id', 3), ('revenue', 246)], {'status_flag': 0, 'warning_count': 0})
+
+    def get_rows(self, count=None, binary=False, columns=None, raw=None, prep_stmt=None, **kwargs):
+        self.unread_result = False
+        return list(self.rows), {'status_flag': 0, 'warning_count': 0}
+
+
+def pooled_connections(rows):
+    """Pool of fake connections configured with the app's own SQLAlchemy connect args"""
+    _, connect_args = bi._sqlalchemy_engine.dialect.create_connect_args(make_url(bi.SQLALCHEMY_DB_URI))
+    created = []
+
+    def creator():
+        connection = FakeServerConnection(rows)
+        connection.config(**connect_args)
+        created.append(connection)
+        return connection
+
+    return QueuePool(creator, pool_size=1, max_overflow=0, reset_on_return=None), created
+
+
+class FakeCursor:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.executed = []
+        self.closed = False
+
+    def execute(self, statement, params):
+        if self.fail:
+            raise Error('lost connection')
+        self.executed.append((statement, params))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeDbapiConnection:
+    def __init__(self):
+        self.cursors = []
+
+    def cursor(self, prepared=False, buffered=None):
+        cursor = FakeCursor()
+        self.cursors.append(cursor)
+        return cursor
+
+
+def test_in_list_size_rounds_up_to_bucket():
+    assert [in_list_size(n) for n in (1, 2, 3, 5, 9, 256)] == [1, 2, 4, 8, 16, 256]
+    assert in_list_size(300) == 300
+
+
+def test_add_in_pads_with_last_value():
+    where = SqlConditions().add("d.date >= %s", '2024-01-01').add_in("s.store_id", [3, 5, 7])
+    assert where.clause() == " AND d.date >= %s AND s.store_id IN (%s, %s, %s, %s)"
+    assert where.params == ['2024-01-01', 3, 5, 7, 7]
+
+
+def test_add_in_keeps_one_template_per_bucket():
+    three = SqlConditions().add_in("p.category", ['a', 'b', 'c'])
+    four = SqlConditions().add_in("p.category", ['a', 'b', 'c', 'd'])
+    assert three.clause() == four.clause()
+
+
+def test_empty_conditions_clause():
+    assert SqlConditions().clause() == ""
+
+
+def test_statement_cache_reuses_and_evicts_least_recent():
+    connection = FakeDbapiConnection()
+    cache = PreparedStatementCache(connection, max_statements=2)
+    first = cache.execute("SELECT 1 WHERE a = %s", [1])
+    cache.execute("SELECT 2")
+    assert cache.execute("SELECT 1 WHERE a = %s", [2]) is first
+
+    cache.execute("SELECT 3")
+    assert len(connection.cursors) == 3
+    assert connection.cursors[1].closed
+    assert not first.closed
+    assert list(cache._statements) == ["SELECT 1 WHERE a = %s", "SELECT 3"]
+
+
+def test_statement_cache_executes_original_sql_object():
+    cache = PreparedStatementCache(FakeDbapiConnection(), max_statements=4)
+    sql = "SELECT * FROM dim_store WHERE store_id = %s"
+    cursor = cache.execute(sql, [1])
+    cache.execute("".join(["SELECT * FROM dim_store ", "WHERE store_id = %s"]), [2])
+    assert all(statement is sql for statement, _ in cursor.executed)
+    assert [params for _, params in cursor.executed] == [(1,), (2,)]
+
+
+def test_statement_cache_drops_failed_statement():
+    connection = FakeDbapiConnection()
+    cache = PreparedStatementCache(connection, max_statements=4)
+    cursor = cache.execute("SELECT 1")
+    cursor.fail = True
+    with pytest.raises(Error):
+        cache.execute("SELECT 1")
+    assert cursor.closed
+    assert "SELECT 1" not in cache._statements
+
+
+def test_execute_query_on_pooled_connection(monkeypatch):
+    pool, created = pooled_connections([(1, 120.5), (2, 80.0)])
+    monkeypatch.setattr(bi, 'get_db_connection', pool.connect)
+    prepares = prepared_statement_stats['prepares']
+
+    query = "SELECT store_id, revenue FROM agg_sales_daily_store_product f WHERE f.date_id >= %s"
+    df = bi.execute_query(query, [20240101])
+    assert df.to_dict('records') == [{'store_id': 1, 'revenue': 120.5}, {'store_id': 2, 'revenue': 80.0}]
+
+    df = bi.execute_query(query, [20240102])
+    assert len(df) == 2
+    assert len(created) == 1
+    assert created[0]._buffered
+    assert created[0].prepared == [query.replace('%s', '?').encode()]
+    assert created[0].last_params == (20240102,)
+    assert prepared_statement_stats['prepares'] == prepares + 1
+
+
+def test_execute_query_propagates_programming_errors(monkeypatch):
+    pool, _ = pooled_connections([])
+    monkeypatch.setattr(bi, 'get_db_connection', pool.connect)
+    with pytest.raises(TypeError):
+        bi.execute_query("SELECT %s", 5)
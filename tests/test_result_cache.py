@@ -0,0 +1,60 @@
+"""
+Tests for caching analytical endpoint responses
+"""
+
+import pytest
+from flask import jsonify
+from sqlalchemy.exc import OperationalError
+
+import app as bi
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache(1024 * 1024, 60)
+    monkeypatch.setattr(bi, '_result_cache', cache)
+    monkeypatch.setattr(bi, 'get_data_version', lambda: '7')
+    return cache
+
+
+def cached_probe(query_ok):
+    calls = []
+
+    @bi.cached_endpoint('probe')
+    def probe():
+        calls.append(1)
+        if not query_ok:
+            bi.mark_query_failed()
+        return jsonify({'rows': []})
+
+    return probe, calls
+
+
+def test_successful_response_is_cached(cache):
+    probe, calls = cached_probe(query_ok=True)
+    for _ in range(2):
+        with bi.app.test_request_context('/api/probe?date_start=2024-01-01'):
+            assert probe().status_code == 200
+    assert len(calls) == 1
+
+
+def test_response_of_failed_query_is_not_cached(cache):
+    probe, calls = cached_probe(query_ok=False)
+    for _ in range(2):
+        with bi.app.test_request_context('/api/probe?date_start=2024-01-01'):
+            assert probe().status_code == 200
+    assert len(calls) == 2
+    assert cache.stats()['entries'] == 0
+
+
+class UnreachableEngine:
+    def raw_connection(self):
+        raise OperationalError("SELECT 1", None, Exception("Can't connect to MySQL server"))
+
+
+def test_unavailable_database_marks_request_failed(monkeypatch):
+    monkeypatch.setattr(bi, '_sqlalchemy_engine', UnreachableEngine())
+    with bi.app.test_request_context('/api/probe'):
+        assert bi.execute_query("SELECT 1").empty
+        assert bi.g.get('query_failed')
@@ -3,6 +3,7 @@
 -- =====================================================
 
 -- Drop existing tables if they exist
+DROP TABLE IF EXISTS agg_sales_daily_store_product;
 DROP TABLE IF EXISTS fact_sales;
 DROP TABLE IF EXISTS dim_date;
 DROP TABLE IF EXISTS dim_store;
@@ -25,7 +26,8 @@ CREATE TABLE dim_date (
     quarter_name VARCHAR(10),
     day_of_week VARCHAR(10),
     is_weekend BOOLEAN,
-    is_holiday BOOLEAN DEFAULT FALSE
+    is_holiday BOOLEAN DEFAULT FALSE,
+    INDEX idx_dim_date_date (date, date_id)
 );
 
 -- Store Dimension
@@ -35,7 +37,8 @@ CREATE TABLE dim_store (
     city VARCHAR(50) NOT NULL,
     region VARCHAR(50) NOT NULL,
     store_type VARCHAR(50) NOT NULL,
-    opening_date DATE
+    opening_date DATE,
+    INDEX idx_store_region (region, store_id)
 );
 
 -- Product Dimension
@@ -45,7 +48,8 @@ CREATE TABLE dim_product (
     category VARCHAR(50) NOT NULL,
     brand VARCHAR(50) NOT NULL,
     price DECIMAL(10, 2) NOT NULL,
-    cost DECIMAL(10, 2) NOT NULL
+    cost DECIMAL(10, 2) NOT NULL,
+    INDEX idx_product_category (category, product_id)
 );
 
 -- Customer Dimension
@@ -63,8 +67,13 @@ CREATE TABLE dim_customer (
 -- =====================================================
 
 -- Sales Fact Table
+-- RANGE partitioned by month of date_id (yyyymmdd), so date filters on
+-- f.date_id prune to the months they cover. The ETL adds monthly partitions
+-- for new months (ensure_fact_partitions). Partitioned InnoDB tables cannot
+-- have foreign keys and every unique key must include date_id, so the ETL
+-- checks the dimension keys and sale_id uniqueness before loading.
 CREATE TABLE fact_sales (
-    sale_id INT PRIMARY KEY,
+    sale_id INT NOT NULL,
     date_id INT NOT NULL,
     store_id INT NOT NULL,
     product_id INT NOT NULL,
@@ -73,23 +82,66 @@ CREATE TABLE fact_sales (
     revenue DECIMAL(10, 2) NOT NULL,
     cost DECIMAL(10, 2) NOT NULL,
     profit DECIMAL(10, 2) NOT NULL,
-    FOREIGN KEY (date_id) REFERENCES dim_date(date_id),
-    FOREIGN KEY (store_id) REFERENCES dim_store(store_id),
-    FOREIGN KEY (product_id) REFERENCES dim_product(product_id),
-    FOREIGN KEY (customer_id) REFERENCES dim_customer(customer_id),
-    INDEX idx_date (date_id),
-    INDEX idx_store (store_id),
-    INDEX idx_product (product_id),
-    INDEX idx_customer (customer_id)
+    PRIMARY KEY (sale_id, date_id),
+    -- Covering indexes for the dashboard filters (date range + store /
+    -- category / region), each also carrying the summed measures.
+    -- Date range first: admin dashboards, KPIs and trends
+    INDEX idx_fact_date_store (date_id, store_id, product_id, customer_id, quantity, revenue, profit),
+    -- Store first: store managers (restricted to one store) and store filters
+    INDEX idx_fact_store_date (store_id, date_id, product_id, quantity, revenue, profit),
+    -- Product first: category filters resolve to product ids via dim_product
+    INDEX idx_fact_product_date (product_id, date_id, store_id, quantity, revenue, profit),
+    -- Customer joins (segments, customer insights)
+    INDEX idx_fact_customer_date (customer_id, date_id)
+)
+PARTITION BY RANGE (date_id) (
+    PARTITION p202301 VALUES LESS THAN (20230201),
+    PARTITION p202302 VALUES LESS THAN (20230301),
+    PARTITION p202303 VALUES LESS THAN (20230401),
+    PARTITION p202304 VALUES LESS THAN (20230501),
+    PARTITION p202305 VALUES LESS THAN (20230601),
+    PARTITION p202306 VALUES LESS THAN (20230701),
+    PARTITION p202307 VALUES LESS THAN (20230801),
+    PARTITION p202308 VALUES LESS THAN (20230901),
+    PARTITION p202309 VALUES LESS THAN (20231001),
+    PARTITION p202310 VALUES LESS THAN (20231101),
+    PARTITION p202311 VALUES LESS THAN (20231201),
+    PARTITION p202312 VALUES LESS THAN (20240101),
+    PARTITION p202401 VALUES LESS THAN (20240201),
+    PARTITION p202402 VALUES LESS THAN (20240301),
+    PARTITION p202403 VALUES LESS THAN (20240401),
+    PARTITION p202404 VALUES LESS THAN (20240501),
+    PARTITION p202405 VALUES LESS THAN (20240601),
+    PARTITION p202406 VALUES LESS THAN (20240701),
+    PARTITION p202407 VALUES LESS THAN (20240801),
+    PARTITION p202408 VALUES LESS THAN (20240901),
+    PARTITION p202409 VALUES LESS THAN (20241001),
+    PARTITION p202410 VALUES LESS THAN (20241101),
+    PARTITION p202411 VALUES LESS THAN (20241201),
+    PARTITION p202412 VALUES LESS THAN (20250101),
+    PARTITION p_future VALUES LESS THAN MAXVALUE
 );
 
 -- =====================================================
--- INDEXES FOR PERFORMANCE
+-- AGGREGATE TABLES
 -- =====================================================
 
-CREATE INDEX idx_fact_sales_date ON fact_sales(date_id);
-CREATE INDEX idx_fact_sales_store ON fact_sales(store_id);
-CREATE INDEX idx_fact_sales_product ON fact_sales(product_id);
+-- Daily Store/Product Sales Rollup (rebuilt by the ETL after each load)
+-- Same keys and measures as fact_sales, so dashboard queries can read it
+-- with the same dimension joins and filters.
+CREATE TABLE agg_sales_daily_store_product (
+    date_id INT NOT NULL,
+    store_id INT NOT NULL,
+    product_id INT NOT NULL,
+    transactions INT NOT NULL,
+    quantity INT NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    cost DECIMAL(14, 2) NOT NULL,
+    profit DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (date_id, store_id, product_id),
+    INDEX idx_agg_store_date (store_id, date_id),
+    INDEX idx_agg_product_date (product_id, date_id)
+);
 
 -- =====================================================
 -- USERS TABLE FOR AUTHENTICATION
@@ -129,7 +181,8 @@ CREATE TABLE IF NOT EXISTS notifications (
     notification_id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT,
     store_id INT,
-    type VARCHAR(50) NOT NULL,  -- 'low_stock', 'high_sales', 'anomaly', 'forecast', 'system'
+    product_id INT,
+    type VARCHAR(50) NOT NULL,  -- 'low_stock', 'auto_order', 'high_sales', 'anomaly', 'forecast', 'system'
     title VARCHAR(255) NOT NULL,
     message TEXT NOT NULL,
     severity VARCHAR(20) DEFAULT 'info',  -- 'info', 'warning', 'critical'
@@ -140,7 +193,8 @@ CREATE TABLE IF NOT EXISTS notifications (
     INDEX idx_user_id (user_id),
     INDEX idx_store_id (store_id),
     INDEX idx_is_read (is_read),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_open_dedupe (type, store_id, product_id, is_read)
 );
 
 -- =====================================================
@@ -194,6 +248,112 @@ CREATE TABLE IF NOT EXISTS activity_log (
     INDEX idx_created_at (created_at)
 );
 
+-- =====================================================
+-- ETL STATE TABLES
+-- =====================================================
+
+-- Key/value state maintained by the ETL ('data_version' is bumped after every load)
+CREATE TABLE IF NOT EXISTS etl_state (
+    state_key VARCHAR(50) PRIMARY KEY,
+    state_value VARCHAR(255) NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Data quality report of every ETL run (per-rule counts, sample offending rows, score)
+CREATE TABLE IF NOT EXISTS etl_quality_runs (
+    run_id INT AUTO_INCREMENT PRIMARY KEY,
+    run_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    load_mode VARCHAR(20) NOT NULL,
+    quality_score DECIMAL(5, 2) NOT NULL,
+    rows_checked BIGINT NOT NULL,
+    rows_removed BIGINT NOT NULL,
+    report JSON NOT NULL,
+    INDEX idx_quality_run_at (run_at)
+);
+
+-- =====================================================
+-- FORECAST TABLES
+-- =====================================================
+
+-- Batch forecasts for every store x category (scripts/batch_forecast.py),
+-- history and forecast months of each series, read by /api/sales-forecast.
+-- store_id 0 = all stores, category 'ALL' = all categories.
+CREATE TABLE IF NOT EXISTS forecast_results (
+    store_id INT NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    model_type VARCHAR(20) NOT NULL,
+    arima_order VARCHAR(20) NOT NULL DEFAULT '',
+    year INT NOT NULL,
+    month INT NOT NULL,
+    month_name VARCHAR(20),
+    revenue DECIMAL(14, 2) NOT NULL,
+    profit DECIMAL(14, 2) NOT NULL,
+    is_forecast BOOLEAN NOT NULL,
+    revenue_r2 DOUBLE NULL,
+    profit_r2 DOUBLE NULL,
+    data_version VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (store_id, category, model_type, arima_order, year, month)
+);
+
+-- =====================================================
+-- CUSTOMER SEGMENTATION
+-- =====================================================
+
+-- Per-customer RFM features, rebuilt on full loads and updated with each
+-- incremental batch by the ETL. segment is assigned by
+-- scripts/train_customer_segments.py (NULL = features changed since then).
+CREATE TABLE IF NOT EXISTS customer_features (
+    customer_id INT PRIMARY KEY,
+    first_purchase_date DATE NULL,
+    last_purchase_date DATE NULL,
+    last_store_id INT NULL,
+    transactions INT NOT NULL DEFAULT 0,
+    total_revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_quantity INT NOT NULL DEFAULT 0,
+    segment INT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_customer_features_store (last_store_id, customer_id),
+    INDEX idx_customer_features_segment (segment)
+);
+
+-- =====================================================
+-- ANOMALY DETECTION
+-- =====================================================
+
+-- EWMA mean / variance of daily revenue per store x category x weekday
+-- (day_of_week 0 = Monday), updated by the ETL with every new day.
+-- store_id 0 = all stores, category 'ALL' = all categories.
+CREATE TABLE IF NOT EXISTS anomaly_baselines (
+    store_id INT NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    day_of_week TINYINT NOT NULL,
+    mean_revenue DOUBLE NOT NULL,
+    var_revenue DOUBLE NOT NULL,
+    observations INT NOT NULL,
+    last_date_id INT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (store_id, category, day_of_week)
+);
+
+-- Days whose revenue deviated from their baseline, read by /api/anomaly-detection
+CREATE TABLE IF NOT EXISTS sales_anomalies (
+    store_id INT NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    date_id INT NOT NULL,
+    sale_date DATE NOT NULL,
+    revenue DECIMAL(14, 2) NOT NULL,
+    expected_revenue DECIMAL(14, 2) NOT NULL,
+    std_revenue DECIMAL(14, 2) NOT NULL,
+    z_score DOUBLE NOT NULL,
+    deviation_pct DOUBLE NOT NULL,
+    anomaly_type VARCHAR(10) NOT NULL,  -- 'high', 'low'
+    severity VARCHAR(20) NOT NULL,      -- 'warning', 'critical'
+    detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (store_id, category, date_id),
+    INDEX idx_anomalies_date (date_id)
+);
+
 -- =====================================================
 -- VIEWS FOR COMMON QUERIES
 -- =====================================================